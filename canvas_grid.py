@@ -1,13 +1,14 @@
 # -*- coding: utf-*-
 # grid of images in a canvas object
+import collections
 import logging
 import threading
 import tkinter as tk
 import traceback
 from abc import ABC, abstractmethod
 from enum import Enum
-from typing import Any, Dict, List
-from id_threading_utils import Executor
+from typing import Any, Callable, Dict, List, Tuple
+from id_threading_utils import Executor, Future, LANE_BACKGROUND, LANE_NETWORK, LANE_RENDER
 from PIL import Image, ImageDraw, ImageTk, ImageFont
 
 DEFAULT_PADDING: int = 4
@@ -15,6 +16,14 @@ DEFAULT_CELL_WIDTH: int = 384
 DEFAULT_CELL_HEIGHT: int = 216
 DEFAULT_SELECTION_BORDER_WIDTH: int = 2
 DEFAULT_SELECTION_BORDER_COLOR: str = 'white'
+DEFAULT_CACHE_SIZE: int = 32 * 1024 * 1024
+DEFAULT_IMAGES_CACHE_SIZE: int = 16 * 1024 * 1024
+DEFAULT_CORNER_RADIUS: int = 8
+DEFAULT_PREFETCH_ROWS: int = 1
+DEFAULT_SCROLL_DURATION: int = 120
+# Tag of the canvas items moved by the scrolling animation, the images of the cells and the selection
+_CELL_TAG: str = 'cell'
+_FRAME_DELAY: int = 16
 _AVAILABLE_CELLS_MSG: str = 'Available cells: %s'
 _PREVENT_EVENT_PROPAGATION: str = 'break'
 _ROW_OUT_OF_BOUNDS_MSG: str = 'Row is out of bounds: %s'
@@ -32,6 +41,7 @@ class PadKey(Enum):
 
 
 class ImageEntry(object):
+    # Canvas item and PhotoImage of a visible position of the grid, they are reused for all the cells shown at this position
     def __init__(self, tk_id: Any = None, image: Image = None, image_tk: ImageTk.PhotoImage = None):
         self.__tk_id: Any = tk_id
         self.__image: Image = image
@@ -65,11 +75,6 @@ class CanvasGridCell(object):
         self.__y: int = -1
         self.__label: str = label
         self.__value: Any = value
-        # noinspection PyTypeChecker
-        self.__image_entry: ImageEntry = None
-
-    def get_image_entry(self) -> ImageEntry:
-        return self.__image_entry
 
     def get_label(self) -> str:
         return self.__label
@@ -89,9 +94,6 @@ class CanvasGridCell(object):
     def get_value(self) -> Any:
         return self.__value
 
-    def set_image_entry(self, value: ImageEntry) -> None:
-        self.__image_entry = value
-
     def set_label(self, value: str) -> None:
         self.__label = value
 
@@ -142,8 +144,138 @@ class DefaultCanvasGridListener(CanvasGridListener):
         DefaultCanvasGridListener.__logger.debug('Cell selection: %s', current)
 
 
+def scale_image(image: Image, width: int, height: int) -> Image:
+    """
+    Scale the image to fit the cell, the images larger than the cell are reduced keeping the ratio and the images
+    larger than the third of the cell are enlarged to fill it. Scaling an image already scaled has no effect.
+    :param image: the image, it is not modified
+    :param width: the width of the cell
+    :param height: the height of the cell
+    :return: the scaled image or the given one if not scaled
+    """
+    image_w, image_h = image.size
+    if image_w > width or image_h > height:
+        result: Image = image.copy()
+        result.thumbnail((width, height), Image.LANCZOS)
+        return result
+    if width / 3 < image_w < width and height / 3 < image_h < height:
+        return image.resize((width, height))
+    return image
+
+
+class ImageCache(object):
+    def __init__(self, max_size: int):
+        """
+        Initialize the cache of images, the least recently used images are evicted first.
+        :param max_size: the maximum size in bytes of the cached images, 0 to disable the cache
+        """
+        self.__lock: threading.Lock = threading.Lock()
+        # The values are kept with the images when their identity is part of the keys
+        self.__entries: collections.OrderedDict = collections.OrderedDict()
+        self.__max_size: int = max_size
+        self.__size: int = 0
+        self.__hits: int = 0
+        self.__misses: int = 0
+        self.__evictions: int = 0
+
+    @staticmethod
+    def __get_cost(image: Image) -> int:
+        width, height = image.size
+        return width * height * len(image.getbands())
+
+    def __evict(self) -> None:
+        while self.__size > self.__max_size and len(self.__entries) > 0:
+            key, (value, image) = self.__entries.popitem(last=False)
+            self.__size = self.__size - ImageCache.__get_cost(image)
+            self.__evictions = self.__evictions + 1
+
+    def get_max_size(self) -> int:
+        return self.__max_size
+
+    def set_max_size(self, value: int) -> None:
+        with self.__lock:
+            self.__max_size = max(0, value)
+            self.__evict()
+
+    def get_size(self) -> int:
+        return self.__size
+
+    def get_count(self) -> int:
+        return len(self.__entries)
+
+    def get_hits(self) -> int:
+        return self.__hits
+
+    def get_misses(self) -> int:
+        return self.__misses
+
+    def get_evictions(self) -> int:
+        return self.__evictions
+
+    def get(self, key: tuple, value: Any) -> Image:
+        """
+        Return the cached image.
+        :param key: the key, made of the identity of the value, the label, the size and the version for the cells
+        :param value: the value whose identity is part of the key or None
+        :return: the image or None
+        """
+        with self.__lock:
+            entry: tuple = self.__entries.get(key)
+            # The identifier of a value can be reused by another one after its removal
+            if entry and entry[0] is value:
+                self.__entries.move_to_end(key)
+                self.__hits = self.__hits + 1
+                return entry[1]
+            self.__misses = self.__misses + 1
+            return None
+
+    def contains(self, key: tuple, value: Any) -> bool:
+        """
+        Return true if the image is cached, the statistics and the order of eviction are not changed.
+        :param key: the key, made of the identity of the value, the label, the size and the version for the cells
+        :param value: the value whose identity is part of the key or None
+        :return: true if the image is cached
+        """
+        with self.__lock:
+            entry: tuple = self.__entries.get(key)
+            return entry is not None and entry[0] is value
+
+    def put(self, key: tuple, value: Any, image: Image) -> None:
+        """
+        Add the image, images larger than the cache are not added.
+        :param key: the key, made of the identity of the value, the label, the size and the version for the cells
+        :param value: the value whose identity is part of the key or None
+        :param image: the image, it must not be modified afterward
+        """
+        cost: int = ImageCache.__get_cost(image)
+        with self.__lock:
+            if cost > self.__max_size:
+                return
+            previous: tuple = self.__entries.pop(key, None)
+            if previous:
+                self.__size = self.__size - ImageCache.__get_cost(previous[1])
+            self.__entries[key] = (value, image)
+            self.__size = self.__size + cost
+            self.__evict()
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__entries.clear()
+            self.__size = 0
+
+    def __str__(self):
+        return 'images: %s, size: %s/%s bytes, hits: %s, misses: %s, evictions: %s' % (len(self.__entries), self.__size, self.__max_size, self.__hits, self.__misses, self.__evictions)
+
+
 class CanvasGridRenderer(ABC):
     __logger: logging.Logger = None
+    # Shared by all the renderers to bound the memory used by the rendered images
+    __cache: ImageCache = ImageCache(DEFAULT_CACHE_SIZE)
+    # Decoded and scaled images of the files and URLs, shared by all the renderers
+    __images: ImageCache = ImageCache(DEFAULT_IMAGES_CACHE_SIZE)
+    # Alpha masks of the rounded corners, all the cells of a grid have the same size
+    __masks: Dict[Tuple[int, int, int], Image.Image] = dict()
+    __masks_lock: threading.Lock = threading.Lock()
 
     def __init__(self, parent_logger: logging.Logger):
         if not CanvasGridRenderer.__logger:
@@ -157,75 +289,187 @@ class CanvasGridRenderer(ABC):
         self._border_color: str = 'lightgrey'
 
     @staticmethod
-    def __add_corners(image: Image, rad) -> Image:
+    def __create_mask(width: int, height: int, rad: int) -> Image:
         circle = Image.new('L', (rad * 2, rad * 2), 0)
         draw = ImageDraw.Draw(circle)
         draw.ellipse((0, 0, rad * 2, rad * 2), fill=255)
-        alpha = Image.new('L', image.size, 255)
-        w, h = image.size
+        alpha = Image.new('L', (width, height), 255)
         alpha.paste(circle.crop((0, 0, rad, rad)), (0, 0))
-        alpha.paste(circle.crop((0, rad, rad, rad * 2)), (0, h - rad))
-        alpha.paste(circle.crop((rad, 0, rad * 2, rad)), (w - rad, 0))
-        alpha.paste(circle.crop((rad, rad, rad * 2, rad * 2)), (w - rad, h - rad))
-        image.putalpha(alpha)
-        return image
+        alpha.paste(circle.crop((0, rad, rad, rad * 2)), (0, height - rad))
+        alpha.paste(circle.crop((rad, 0, rad * 2, rad)), (width - rad, 0))
+        alpha.paste(circle.crop((rad, rad, rad * 2, rad * 2)), (width - rad, height - rad))
+        return alpha
 
     @staticmethod
-    def __update_cell_image(canvas: tk.Canvas, cell: CanvasGridCell, image):
-        CanvasGrid.free_image(canvas, cell)
-        if not cell.get_image_entry():
-            cell.set_image_entry(ImageEntry(image=image))
-        else:
-            cell.get_image_entry().set_image(image)
-        entry: ImageEntry = cell.get_image_entry()
-        if entry.get_image():
-            image_tk: ImageTk.PhotoImage = ImageTk.PhotoImage(image=entry.get_image())
-            # PhotoImage reference is kept to avoid removal by the garbage collector
-            entry.set_image_tk(image_tk)
-            entry.set_tk_id(canvas.create_image(cell.get_x(), cell.get_y(), image=image_tk, anchor=tk.NW))
+    def get_mask(width: int, height: int, rad: int) -> Image:
+        """
+        Return the alpha mask rounding the corners of the cells, it is computed once per size.
+        :param width: the width of the cells
+        :param height: the height of the cells
+        :param rad: the radius of the corners
+        :return: the mask, it must not be modified
+        """
+        key: Tuple[int, int, int] = (width, height, rad)
+        with CanvasGridRenderer.__masks_lock:
+            result: Image = CanvasGridRenderer.__masks.get(key)
+            if not result:
+                result = CanvasGridRenderer.__create_mask(width, height, rad)
+                CanvasGridRenderer.__masks[key] = result
+            return result
+
+    @staticmethod
+    def get_cache() -> ImageCache:
+        return CanvasGridRenderer.__cache
+
+    @staticmethod
+    def get_images_cache() -> ImageCache:
+        return CanvasGridRenderer.__images
+
+    @staticmethod
+    def load_image(location: str, size: Tuple[int, int], opener: Callable[[], Any]) -> Image:
+        """
+        Return the decoded image scaled to the size of the cells, it is decoded only if not already cached.
+        :param location: the path or the URL of the image
+        :param size: the width and height of the cells, None to keep the original size
+        :param opener: the function returning the path or the file object given to PIL when the image is not cached
+        :return: the image, it must not be modified
+        """
+        key: tuple = (location, size)
+        result: Image = CanvasGridRenderer.__images.get(key, None)
+        if result:
+            return result
+        result = Image.open(opener())
+        if size:
+            # JPEG images are decoded at the lowest resolution still larger than the cells
+            result.draft('RGB', size)
+        result.load()
+        if size:
+            result = scale_image(result, size[0], size[1])
+        CanvasGridRenderer.__images.put(key, None, result)
+        return result
+
+    @staticmethod
+    def get_cached_image(location: str, size: Tuple[int, int]) -> Image:
+        """
+        Return the decoded image scaled to the size of the cells if it is cached, nothing is loaded otherwise.
+        :param location: the path or the URL of the image
+        :param size: the width and height of the cells, None for the original size
+        :return: the image or None, it must not be modified
+        """
+        return CanvasGridRenderer.__images.get((location, size), None)
+
+    @staticmethod
+    def is_image_cached(location: str, size: Tuple[int, int]) -> bool:
+        return CanvasGridRenderer.__images.contains((location, size), None)
+
+    def get_version(self, value: Any) -> Any:
+        """
+        Return the version of the content rendered for the value, the rendered image is cached until the version changes.
+        :param value: the value of the cell
+        :return: the version, None if the image must be rendered each time
+        """
+        return 0
+
+    def needs_fetch(self, value: Any, size: Tuple[int, int] = None) -> bool:
+        """
+        Return true if the data needed to render the value must be loaded by fetch before calling render_image.
+        :param value: the value of the cell
+        :param size: the width and height of the cell
+        :return: true if fetch must be called first
+        """
+        return False
+
+    def fetch(self, value: Any, size: Tuple[int, int] = None) -> None:
+        """
+        Load the data needed to render the value, it is called on the network lane so that the rendering does not wait for it.
+        :param value: the value of the cell
+        :param size: the width and height of the cell
+        """
+        pass
+
+    def prefetch_cell(self, cell: CanvasGridCell, cell_width: int, cell_height: int) -> None:
+        """
+        Load the data of the cell and render its image in the cache without showing it.
+        The image is not rendered if it cannot be cached, the data loaded by fetch is still kept for the next rendering.
+        :param cell: the cell
+        :param cell_width: the width of the cell
+        :param cell_height: the height of the cell
+        """
+        # noinspection PyBroadException
+        try:
+            if self.needs_fetch(cell.get_value(), (cell_width, cell_height)) and not self.is_cell_cached(cell, cell_width, cell_height):
+                # The version is often known only once the data is loaded
+                self.fetch(cell.get_value(), (cell_width, cell_height))
+            if self.get_version(cell.get_value()) is not None:
+                self.__render_cell_image(cell, cell_width, cell_height)
+        except:  # catch all
+            CanvasGridRenderer.__logger.error(traceback.format_exc())
+
+    def __get_key(self, cell: CanvasGridCell, cell_width: int, cell_height: int, version: Any) -> tuple:
+        return id(self), id(cell.get_value()), cell.get_label(), cell_width, cell_height, version
+
+    def is_cell_cached(self, cell: CanvasGridCell, cell_width: int, cell_height: int) -> bool:
+        """
+        Return true if the rendered image of the cell is cached for its current version.
+        :param cell: the cell
+        :param cell_width: the width of the cell
+        :param cell_height: the height of the cell
+        :return: true if the image is cached
+        """
+        version: Any = self.get_version(cell.get_value())
+        return version is not None and CanvasGridRenderer.__cache.contains(self.__get_key(cell, cell_width, cell_height, version), cell.get_value())
+
+    def __render_cell_image(self, cell: CanvasGridCell, cell_width: int, cell_height: int) -> Image:
+        version: Any = self.get_version(cell.get_value())
+        key: tuple = self.__get_key(cell, cell_width, cell_height, version)
+        if version is not None:
+            cached: Image = CanvasGridRenderer.__cache.get(key, cell.get_value())
+            if cached:
+                return cached
+        image: Image = self.render_image(cell.get_value(), (cell_width, cell_height))
+        # Create the cell background image
+        result: Image = Image.new('RGB', (cell_width, cell_height), color=self._background_color)
+        if image:
+            # Resize image to fill the cell keeping the ration, nothing is done if the renderer already scaled it
+            image = scale_image(image, cell_width, cell_height)
+            # Put the image on the center of the background image of the cell
+            image_w, image_h = image.size
+            cell_image_w, cell_image_h = result.size
+            result.paste(image, ((cell_image_w - image_w) // 2, (cell_image_h - image_h) // 2))
         else:
-            CanvasGridRenderer.__logger.warning('No image for cell: %s', cell)
+            CanvasGridRenderer.__logger.warning('No image loaded for cell: %s', cell)
+        draw: ImageDraw.Draw = ImageDraw.Draw(result)
+        if cell.get_label():
+            draw.text((4, 4), cell.get_label(), (255, 255, 255), font=self.__font)
+            draw.text((4, 4), cell.get_label(), (255, 255, 255))
+        # Drawing the outline is faster than pasting a transparent overlay of the border
+        draw.rounded_rectangle(((0, 0), (cell_width - 1, cell_height - 1)), radius=DEFAULT_CORNER_RADIUS,
+                               outline=self._border_color, width=1)
+        # Round corners
+        result.putalpha(CanvasGridRenderer.get_mask(cell_width, cell_height, DEFAULT_CORNER_RADIUS))
+        if version is not None:
+            CanvasGridRenderer.__cache.put(key, cell.get_value(), result)
+        return result
 
     def render_cell(self, grid, cell: CanvasGridCell, cell_width: int, cell_height: int, render_image: bool = True) -> None:
         # noinspection PyBroadException
         try:
             if render_image:
-                image: Image = None
-                if render_image:
-                    image = self.render_image(cell.get_value())
-                # Create the cell background image
-                result: Image = Image.new('RGB', (cell_width, cell_height), color=self._background_color)
-                if image:
-                    # Resize image to fill the cell keeping the ration
-                    image_w, image_h = image.size
-                    if image_w > cell_width or image_h > cell_height:
-                        image.thumbnail((cell_width, cell_height), Image.ANTIALIAS)
-                        # unused image = image.crop((0, 0, cell_width, cell_height))
-                    elif cell_width / 3 < image_w < cell_width and cell_height / 3 < image_h < cell_height:
-                        image = image.resize((cell_width, cell_height))
-                        #unused image = image.crop((0, 0, cell_width, cell_height))
-                    # Put the image on the center of the background image of the cell
-                    image_w, image_h = image.size
-                    cell_image_w, cell_image_h = result.size
-                    result.paste(image, ((cell_image_w - image_w) // 2, (cell_image_h - image_h) // 2))
-                else:
-                    CanvasGridRenderer.__logger.warning('No image loaded for cell: %s', cell)
-                draw: ImageDraw.Draw = ImageDraw.Draw(result)
-                if cell.get_label():
-                    draw.text((4, 4), cell.get_label(), (255, 255, 255), font=self.__font)
-                    draw.text((4, 4), cell.get_label(), (255, 255, 255))
-                draw.rounded_rectangle(((0, 0), (cell_width - 1, cell_height - 1)), radius=8,
-                                       outline=self._border_color, width=1)
-                # Round corners
-                CanvasGridRenderer.__add_corners(result, 8)
-                grid.get_canvas().after(1, CanvasGridRenderer.__update_cell_image, grid.get_canvas(), cell, result)
+                result: Image = self.__render_cell_image(cell, cell_width, cell_height)
+                grid.get_canvas().after(1, grid.update_cell_image, cell, result)
             else:
                 CanvasGridRenderer.__logger.warning('Invalid image to update on canvas for cell: %s', cell)
         except:  # catch all
             CanvasGridRenderer.__logger.error(traceback.format_exc())
 
     @abstractmethod
-    def render_image(self, value: Any) -> Image:
+    def render_image(self, value: Any, size: Tuple[int, int] = None) -> Image:
+        """
+        Return the image of the value.
+        :param value: the value of the cell
+        :param size: the width and height of the cell, images can be returned already scaled using load_image
+        :return: the image or None
+        """
         pass
 
 
@@ -233,7 +477,7 @@ class DefaultCanvasGridRenderer(CanvasGridRenderer):
     def __init__(self, parent_logger: logging.Logger):
         super().__init__(parent_logger)
 
-    def render_image(self, value: Any) -> Image:
+    def render_image(self, value: Any, size: Tuple[int, int] = None) -> Image:
         return None
 
 
@@ -253,26 +497,6 @@ class CanvasGrid(object):
             y1)
         return canvas.create_polygon(points, **kwargs, smooth=True, fill='')
 
-    @staticmethod
-    def free_image(canvas: tk.Canvas, cell: CanvasGridCell) -> None:
-        entry: ImageEntry = cell.get_image_entry()
-        # noinspection PyBroadException
-        try:
-            if entry:
-                tk_id: Any = entry.get_tk_id()
-                if tk_id and canvas.find_above(tk_id):
-                    CanvasGrid.__logger.debug('Deleting canvas image')
-                    canvas.delete(tk_id)
-        except:  # catch all
-            CanvasGrid.__logger.error(traceback.format_exc())
-        finally:
-            if entry:
-                # PhotoImage reference can be processed by the garbage collector
-                # noinspection PyTypeChecker
-                entry.set_image_tk(None)
-                # noinspection PyTypeChecker
-                entry.set_tk_id(None)
-
     def __init__(self, parent_logger: logging.Logger, window: tk.Tk, canvas: tk.Canvas, executor: Executor):
         if not CanvasGrid.__logger:
             CanvasGrid.__logger = logging.getLogger(self.__class__.__name__)
@@ -283,8 +507,14 @@ class CanvasGrid(object):
         # Locks
         self.__cells_lock: threading.RLock = threading.RLock()
         self.__selection_lock: threading.RLock = threading.RLock()
+        self.__render_lock: threading.RLock = threading.RLock()
         # Executor
         self.__executor: Executor = executor
+        # Pending render task of each cell, only the latest one is kept
+        self.__render_tasks: Dict[CanvasGridCell, Future] = dict()
+        # Pool of the canvas images of the visible positions and cells shown by them, used only by the Tk thread
+        self.__entries: List[ImageEntry] = list()
+        self.__displayed_cells: CanvasGridCells = list()
         # Fields
         self.__padding: int = DEFAULT_PADDING
         self.__cell_width: int = DEFAULT_CELL_WIDTH
@@ -300,6 +530,12 @@ class CanvasGrid(object):
         self.__selection_shape_id: Any = None
         self.__selection_border_width: int = DEFAULT_SELECTION_BORDER_WIDTH
         self.__selection_border_color: str = DEFAULT_SELECTION_BORDER_COLOR
+        self.__prefetch_rows: int = DEFAULT_PREFETCH_ROWS
+        # Scrolling animation, the images are shifted by the offset in pixels until it reaches 0
+        self.__scroll_duration: int = DEFAULT_SCROLL_DURATION
+        self.__scroll_offset: int = 0
+        self.__scroll_step: int = 0
+        self.__scroll_job: Any = None
         self.__window.bind('<Left>', lambda e: self.on_key(PadKey.LEFT))
         self.__window.bind('<Right>', lambda e: self.on_key(PadKey.RIGHT))
         self.__window.bind("<Up>", lambda e: self.on_key(PadKey.UP))
@@ -313,6 +549,7 @@ class CanvasGrid(object):
         self.__margin_x: int = (self.__canvas.winfo_width() - (self.__padding + self.__cell_width) * self.__columns) / 2
         self.__margin_y: int = (self.__canvas.winfo_height() - (self.__padding + self.__cell_height) * self.__rows) / 2
         CanvasGrid.__logger.debug('Grid size: %sx%s', self.__columns, self.__rows)
+        self.__reset_entries()
 
     def get_canvas(self) -> tk.Canvas:
         return self.__canvas
@@ -363,6 +600,18 @@ class CanvasGrid(object):
         if 16 < value <= 512:
             self.__cell_height = value
 
+    def get_prefetch_rows(self) -> int:
+        return self.__prefetch_rows
+
+    def set_prefetch_rows(self, value: int) -> None:
+        self.__prefetch_rows = max(0, value)
+
+    def get_scroll_duration(self) -> int:
+        return self.__scroll_duration
+
+    def set_scroll_duration(self, value: int) -> None:
+        self.__scroll_duration = max(0, value)
+
     def get_rows(self) -> int:
         return self.__rows
 
@@ -381,6 +630,153 @@ class CanvasGrid(object):
     def get_tk(self) -> tk.Tk:
         return self.__window
 
+    def is_visible(self, cell: CanvasGridCell) -> bool:
+        return self.__first_visible_row <= cell.get_row() < self.__first_visible_row + self.__rows
+
+    def __is_prefetched(self, cell: CanvasGridCell) -> bool:
+        return self.__first_visible_row - self.__prefetch_rows <= cell.get_row() < self.__first_visible_row + self.__rows + self.__prefetch_rows
+
+    def __reset_entries(self) -> None:
+        # noinspection PyTypeChecker
+        self.__entries = [None] * (self.__rows * self.__columns)
+        # noinspection PyTypeChecker
+        self.__displayed_cells = [None] * (self.__rows * self.__columns)
+
+    def __get_entry_index(self, position: int) -> int:
+        index: int = position - self.__first_visible_row * self.__columns
+        return index if 0 <= index < len(self.__entries) else -1
+
+    def __hide_entry(self, index: int) -> None:
+        entry: ImageEntry = self.__entries[index]
+        self.__displayed_cells[index] = None
+        if entry and entry.get_image():
+            # The PhotoImage and the canvas item are kept for the next cell shown at this position
+            # noinspection PyTypeChecker
+            entry.set_image(None)
+            self.__canvas.itemconfigure(entry.get_tk_id(), state=tk.HIDDEN)
+
+    def __show_entry(self, index: int, cell: CanvasGridCell, image: Image) -> None:
+        x: int = self.__margin_x + self.__padding + (index % self.__columns) * (self.__cell_width + self.__padding)
+        y: int = self.__margin_y + self.__padding + (index // self.__columns) * (self.__cell_height + self.__padding)
+        # The image follows the other ones if the scrolling animation is running
+        y += self.__scroll_offset
+        entry: ImageEntry = self.__entries[index]
+        if not entry:
+            image_tk: ImageTk.PhotoImage = ImageTk.PhotoImage(image=image)
+            # PhotoImage reference is kept to avoid removal by the garbage collector
+            entry = ImageEntry(self.__canvas.create_image(x, y, image=image_tk, anchor=tk.NW, tags=_CELL_TAG), image, image_tk)
+            self.__entries[index] = entry
+        elif (entry.get_image_tk().width(), entry.get_image_tk().height()) == image.size:
+            # Only the pixels are replaced, no Tk object is created
+            entry.get_image_tk().paste(image)
+            entry.set_image(image)
+            self.__canvas.coords(entry.get_tk_id(), x, y)
+            self.__canvas.itemconfigure(entry.get_tk_id(), state=tk.NORMAL)
+        else:
+            entry.set_image_tk(ImageTk.PhotoImage(image=image))
+            entry.set_image(image)
+            self.__canvas.coords(entry.get_tk_id(), x, y)
+            self.__canvas.itemconfigure(entry.get_tk_id(), image=entry.get_image_tk(), state=tk.NORMAL)
+        self.__displayed_cells[index] = cell
+
+    def update_cell_image(self, cell: CanvasGridCell, image: Image) -> None:
+        """
+        Show the rendered image of the cell, it must be called by the Tk thread.
+        :param cell: the cell
+        :param image: the image rendered for the cell
+        """
+        if not image:
+            CanvasGrid.__logger.warning('No image for cell: %s', cell)
+            return
+        position: int = self.__index_of(cell)
+        index: int = self.__get_entry_index(position) if position >= 0 else -1
+        if index < 0 or not self.is_visible(cell):
+            # Cell deleted or scrolled away meanwhile
+            return
+        self.__show_entry(index, cell, image)
+
+    def __render(self, cell: CanvasGridCell) -> None:
+        if not self.is_visible(cell):
+            CanvasGrid.__logger.debug('Rendering skipped, cell is no more visible: %s', cell)
+            return
+        self.__renderer.render_cell(self, cell, self.__cell_width, self.__cell_height, True)
+
+    def __prefetch(self, cell: CanvasGridCell) -> None:
+        if not self.__is_prefetched(cell):
+            CanvasGrid.__logger.debug('Prefetch skipped, cell is no more near the visible area: %s', cell)
+            return
+        self.__renderer.prefetch_cell(cell, self.__cell_width, self.__cell_height)
+
+    def __fetch(self, cell: CanvasGridCell) -> None:
+        if not self.is_visible(cell):
+            CanvasGrid.__logger.debug('Fetch skipped, cell is no more visible: %s', cell)
+            return
+        self.__renderer.fetch(cell.get_value(), (self.__cell_width, self.__cell_height))
+
+    def __on_render_done(self, cell: CanvasGridCell, future: Future) -> None:
+        with self.__render_lock:
+            if self.__render_tasks.get(cell) is future:
+                del self.__render_tasks[cell]
+
+    def __on_fetch_done(self, cell: CanvasGridCell, future: Future) -> None:
+        with self.__render_lock:
+            if self.__render_tasks.get(cell) is not future:
+                # Cancelled or replaced by a newer submission
+                return
+            del self.__render_tasks[cell]
+            if self.is_visible(cell) and self.__executor.is_ready():
+                # The data is loaded, the image is rendered without waiting for the network
+                self.__submit_task(cell, self.__render, LANE_RENDER, self.__on_render_done)
+
+    def __submit_task(self, cell: CanvasGridCell, fn: Callable[[CanvasGridCell], None], lane: str, on_done: Callable[[CanvasGridCell, Future], None]) -> None:
+        future: Future = self.__executor.submit(fn, cell, lane=lane)
+        self.__render_tasks[cell] = future
+        future.add_done_callback(lambda f: on_done(cell, f))
+
+    def __cancel_render(self, cell: CanvasGridCell) -> None:
+        with self.__render_lock:
+            future: Future = self.__render_tasks.pop(cell, None)
+        if future:
+            # Not interrupted if already started
+            future.cancel()
+
+    def __submit_render(self, cell: CanvasGridCell) -> None:
+        with self.__render_lock:
+            # The latest submission wins, the previous one is cancelled if not yet started
+            self.__cancel_render(cell)
+            if self.__renderer.needs_fetch(cell.get_value(), (self.__cell_width, self.__cell_height)) and not self.__renderer.is_cell_cached(cell, self.__cell_width, self.__cell_height):
+                # The data is loaded on the network lane before the image is rendered on the render lane
+                self.__submit_task(cell, self.__fetch, LANE_NETWORK, self.__on_fetch_done)
+            else:
+                self.__submit_task(cell, self.__render, LANE_RENDER, self.__on_render_done)
+
+    def __submit_prefetch(self, cell: CanvasGridCell) -> None:
+        with self.__render_lock:
+            if cell in self.__render_tasks:
+                # A render or a prefetch of the cell is already pending
+                return
+            self.__submit_task(cell, self.__prefetch, LANE_BACKGROUND, self.__on_render_done)
+
+    def __prefetch_rows_around(self) -> None:
+        # The rows above and below the visible area are rendered in the cache with a low priority
+        if self.__prefetch_rows <= 0 or not self.__window or not self.__executor.is_ready():
+            return
+        cells_count: int = self.get_size()
+        rows: List[int] = list(range(max(0, self.__first_visible_row - self.__prefetch_rows), self.__first_visible_row))
+        rows.extend(range(self.__first_visible_row + self.__rows, self.__first_visible_row + self.__rows + self.__prefetch_rows))
+        for row in rows:
+            for position in range(row * self.__columns, min(cells_count, (row + 1) * self.__columns)):
+                cell: CanvasGridCell = self.__get_cell(position)
+                if cell:
+                    cell.set_row(row)
+                    cell.set_column(position % self.__columns)
+                    cell.set_coordinates(-self.__cell_width, -self.__cell_height)
+                    self.__submit_prefetch(cell)
+
+    def get_pending_renders_count(self) -> int:
+        with self.__render_lock:
+            return len(self.__render_tasks)
+
     def redraw(self, cell: CanvasGridCell = None, first: int = -1) -> None:
         if not self.__executor.is_ready():
             return
@@ -389,6 +785,8 @@ class CanvasGrid(object):
         real_columns: int = min(cells_count, self.__columns)
         start: int = self.__first_visible_row * real_columns
         end: int = min(cells_count, start - 1 + self.__rows * real_columns)
+        # The rows around the visible area are prefetched only when all the visible cells are drawn
+        prefetch: bool = not cell and first < 0
         if cell:
             position: int = self.__cells.index(cell)
             if position >= 0 and start <= position <= end:
@@ -409,8 +807,6 @@ class CanvasGrid(object):
             if not cell:
                 CanvasGrid.__logger.warning('Redraw skipped, cell position is invalid: %s', position)
                 continue
-            if not cell.get_image_entry():
-                cell.set_image_entry(ImageEntry())
             cell.set_row(int(position / self.__columns))
             cell.set_column(position % self.__columns)
             if cell.get_row() < self.__first_visible_row or cell.get_row() >= self.__first_visible_row + self.__rows:
@@ -423,7 +819,9 @@ class CanvasGrid(object):
                             self.__cell_height + self.__padding)
             )
             if self.__window and self.__executor.is_ready():
-                self.__executor.submit(self.__renderer.render_cell, self, cell, self.__cell_width, self.__cell_height, True)
+                self.__submit_render(cell)
+        if prefetch:
+            self.__prefetch_rows_around()
 
     def get_selected_cell(self) -> CanvasGridCell:
         with self.__selection_lock:
@@ -557,11 +955,14 @@ class CanvasGrid(object):
                 x: int = cell.get_x()
                 y: int = cell.get_y()
                 if x > 0 and y > 0:
+                    # The selection follows the image of the cell if the scrolling animation is running
+                    y += self.__scroll_offset
                     self.__selection_shape_id = CanvasGrid.__round_rectangle(self.__canvas, x, y,
                                                                              x + self.__cell_width,
                                                                              y + self.__cell_height,
                                                                              width=self.__selection_border_width,
-                                                                             outline=self.__selection_border_color)
+                                                                             outline=self.__selection_border_color,
+                                                                             tags=_CELL_TAG)
 
     def __clear_row(self, row: int):
         if row < 0:
@@ -579,12 +980,62 @@ class CanvasGrid(object):
             CanvasGrid.__logger.debug('Row is not visible: %s (%s,%s)', row, self.__first_visible_row, last_visible_row)
             return
         CanvasGrid.__logger.debug('Clearing cells of row: %s', row)
-        # Delete images associated to the cells on the row and unbind events on cells
+        # Hide images associated to the cells on the row and unbind events on cells
         if first_position <= self.get_selected_position() <= first_position + real_columns:
             self.__delete_selection()
         for position in range(first_position, first_position + real_columns):
             CanvasGrid.__logger.debug('Clearing cell at position: %s', position)
-            CanvasGrid.free_image(self.__canvas, self.__cells[position])
+            self.__cancel_render(self.__cells[position])
+            index: int = self.__get_entry_index(position)
+            if index >= 0:
+                self.__hide_entry(index)
+
+    def __move_entries(self) -> None:
+        # The images of the cells still visible are copied to their new positions before being rendered again
+        images: Dict[CanvasGridCell, Image.Image] = dict()
+        for index, cell in enumerate(self.__displayed_cells):
+            if cell and self.__entries[index].get_image():
+                images[cell] = self.__entries[index].get_image()
+        for index in range(len(self.__entries)):
+            cell: CanvasGridCell = self.__get_cell(self.__first_visible_row * self.__columns + index)
+            image: Image = images.get(cell) if cell else None
+            if image:
+                if self.__displayed_cells[index] is not cell:
+                    self.__show_entry(index, cell, image)
+            else:
+                self.__hide_entry(index)
+
+    def __stop_scroll_animation(self) -> None:
+        if self.__scroll_job:
+            self.__canvas.after_cancel(self.__scroll_job)
+            # noinspection PyTypeChecker
+            self.__scroll_job = None
+        if self.__scroll_offset:
+            # The images are moved to their final positions
+            self.__canvas.move(_CELL_TAG, 0, -self.__scroll_offset)
+            self.__scroll_offset = 0
+
+    def __animate_scroll(self) -> None:
+        # noinspection PyTypeChecker
+        self.__scroll_job = None
+        if not self.__scroll_offset:
+            return
+        step: int = self.__scroll_step if abs(self.__scroll_step) < abs(self.__scroll_offset) else self.__scroll_offset
+        self.__canvas.move(_CELL_TAG, 0, -step)
+        self.__scroll_offset -= step
+        if self.__scroll_offset:
+            self.__scroll_job = self.__canvas.after(_FRAME_DELAY, self.__animate_scroll)
+
+    def __start_scroll_animation(self, rows: int) -> None:
+        if self.__scroll_duration <= 0 or rows == 0 or abs(rows) >= self.__rows:
+            # Nothing to animate if no image of the previous rows is still visible
+            return
+        # The moved images are shown at their previous positions and slide to their new ones
+        self.__scroll_offset = rows * (self.__cell_height + self.__padding)
+        frames: int = max(1, self.__scroll_duration // _FRAME_DELAY)
+        self.__scroll_step = -(-abs(self.__scroll_offset) // frames) * (1 if rows > 0 else -1)
+        self.__canvas.move(_CELL_TAG, 0, self.__scroll_offset)
+        self.__scroll_job = self.__canvas.after(_FRAME_DELAY, self.__animate_scroll)
 
     def __scroll_to(self, row: int) -> None:
         if row < 0:
@@ -604,7 +1055,11 @@ class CanvasGrid(object):
             if row <= visible_row <= row + self.__rows - 1:
                 continue
             self.__clear_row(visible_row)
+        self.__stop_scroll_animation()
+        previous_row: int = self.__first_visible_row
         self.__first_visible_row = row
+        self.__move_entries()
+        self.__start_scroll_animation(row - previous_row)
         self.redraw()
 
     def delete_cell(self, position: int) -> CanvasGridCell:
@@ -612,8 +1067,15 @@ class CanvasGrid(object):
             with self.__cells_lock:
                 CanvasGrid.__logger.debug('Deleting cell at position: %s', position)
                 cell: CanvasGridCell = self.__cells.pop(position)
-            # Delete image associated to the cell and unbind events on cell
-            CanvasGrid.free_image(self.__canvas, cell)
+            # Hide image associated to the cell and unbind events on cell
+            self.__cancel_render(cell)
+            for index, displayed_cell in enumerate(self.__displayed_cells):
+                if displayed_cell is cell:
+                    self.__hide_entry(index)
+            # The cells following the deleted one are rendered again, the last position becomes empty
+            index: int = self.__get_entry_index(self.get_size())
+            if index >= 0:
+                self.__hide_entry(index)
             if position == self.get_selected_position() and position >= self.get_size() - 1:
                 self.__select_position(position - 1)
             CanvasGrid.__logger.debug(_AVAILABLE_CELLS_MSG, str(self.get_size()))
@@ -622,7 +1084,11 @@ class CanvasGrid(object):
 
     def clear(self):
         with self.__cells_lock:
+            for cell in self.__cells:
+                self.__cancel_render(cell)
+            self.__stop_scroll_animation()
             self.__canvas.delete("all")
+            self.__reset_entries()
             self.__cells.clear()
             self.redraw()
 
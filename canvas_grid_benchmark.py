@@ -0,0 +1,154 @@
+#! /usr/bin/python3
+# -*- coding: utf-*-
+# Micro-benchmark of the rendering of the grid cells
+import argparse
+import logging
+import sys
+import time
+
+from typing import Any, Callable, List, Tuple
+from PIL import Image, ImageDraw
+from canvas_grid import CanvasGridCell, CanvasGridRenderer, DEFAULT_CELL_WIDTH, DEFAULT_CELL_HEIGHT, DEFAULT_CORNER_RADIUS
+
+
+class StubCanvas(object):
+    def __init__(self):
+        """
+        Initialize the canvas keeping the last image given by the renderer instead of displaying it.
+        """
+        self.image: Image = None
+
+    # noinspection PyUnusedLocal
+    def after(self, delay: int, fn: Callable, *args) -> None:
+        fn(*args)
+
+
+class StubGrid(object):
+    def __init__(self):
+        self.__canvas: StubCanvas = StubCanvas()
+
+    def get_canvas(self) -> StubCanvas:
+        return self.__canvas
+
+    # noinspection PyUnusedLocal
+    def update_cell_image(self, cell: CanvasGridCell, image: Image) -> None:
+        self.__canvas.image = image
+
+
+class StubRenderer(CanvasGridRenderer):
+    def __init__(self, parent_logger: logging.Logger, width: int, height: int):
+        """
+        Initialize the renderer returning the same picture for all the cells.
+        :param parent_logger: the main logger
+        :param width: the width of the picture
+        :param height: the height of the picture
+        """
+        super().__init__(parent_logger)
+        self.__image: Image = Image.new('RGB', (width, height), color='steelblue')
+
+    def get_version(self, value: Any) -> Any:
+        # The cache is not used to measure the rendering
+        return None
+
+    def render_image(self, value: Any, size: Tuple[int, int] = None) -> Image:
+        return self.__image.copy()
+
+
+def legacy_frame(image: Image, width: int, height: int, rad: int, color: str) -> Image:
+    """
+    Draw the border and round the corners as done for each cell before the masks were computed once per size.
+    :param image: the image of the cell
+    :param width: the width of the cell
+    :param height: the height of the cell
+    :param rad: the radius of the corners
+    :param color: the color of the border
+    :return: the image
+    """
+    ImageDraw.Draw(image).rounded_rectangle(((0, 0), (width - 1, height - 1)), radius=rad, outline=color, width=1)
+    circle = Image.new('L', (rad * 2, rad * 2), 0)
+    draw = ImageDraw.Draw(circle)
+    draw.ellipse((0, 0, rad * 2, rad * 2), fill=255)
+    alpha = Image.new('L', image.size, 255)
+    alpha.paste(circle.crop((0, 0, rad, rad)), (0, 0))
+    alpha.paste(circle.crop((0, rad, rad, rad * 2)), (0, height - rad))
+    alpha.paste(circle.crop((rad, 0, rad * 2, rad)), (width - rad, 0))
+    alpha.paste(circle.crop((rad, rad, rad * 2, rad * 2)), (width - rad, height - rad))
+    image.putalpha(alpha)
+    return image
+
+
+def overlay_frame(image: Image, width: int, height: int, rad: int, color: str) -> float:
+    """
+    Draw the border by pasting a transparent overlay and round the corners using the mask computed once per size.
+    :param image: the image of the cell
+    :param width: the width of the cell
+    :param height: the height of the cell
+    :param rad: the radius of the corners
+    :param color: the color of the border
+    :return: the duration in seconds of the paste of the overlay and of the mask
+    """
+    border: Image = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+    ImageDraw.Draw(border).rounded_rectangle(((0, 0), (width - 1, height - 1)), radius=rad, outline=color, width=1)
+    started: float = time.perf_counter()
+    image.paste(border, (0, 0), border)
+    image.putalpha(CanvasGridRenderer.get_mask(width, height, rad))
+    # Only the paste is measured as the overlay would also be computed once per size
+    return time.perf_counter() - started
+
+
+def frame(image: Image, width: int, height: int, rad: int, color: str) -> Image:
+    """
+    Draw the border and round the corners using the mask computed once per size.
+    :param image: the image of the cell
+    :param width: the width of the cell
+    :param height: the height of the cell
+    :param rad: the radius of the corners
+    :param color: the color of the border
+    :return: the image
+    """
+    ImageDraw.Draw(image).rounded_rectangle(((0, 0), (width - 1, height - 1)), radius=rad, outline=color, width=1)
+    image.putalpha(CanvasGridRenderer.get_mask(width, height, rad))
+    return image
+
+
+def measure(fn: Callable[[], Any], iterations: int) -> float:
+    """
+    Return the average duration of the function.
+    :param fn: the function
+    :param iterations: the number of calls
+    :return: the average duration in milliseconds
+    """
+    started: float = time.perf_counter()
+    for i in range(iterations):
+        fn()
+    return (time.perf_counter() - started) * 1000 / iterations
+
+
+if __name__ == '__main__':
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='Measure the rendering time of the grid cells.')
+    parser.add_argument('--width', type=int, default=DEFAULT_CELL_WIDTH, help='width of the cells')
+    parser.add_argument('--height', type=int, default=DEFAULT_CELL_HEIGHT, help='height of the cells')
+    parser.add_argument('--iterations', type=int, default=500, help='number of renderings measured')
+    args = parser.parse_args()
+    logger: logging.Logger = logging.getLogger('CanvasGridBenchmark')
+    logger.addHandler(logging.StreamHandler())
+    logger.setLevel(logging.WARNING)
+    color: str = 'lightgrey'
+    background: Image = Image.new('RGB', (args.width, args.height), color='black')
+    # Both methods must give the same image
+    if legacy_frame(background.copy(), args.width, args.height, DEFAULT_CORNER_RADIUS, color).tobytes() != frame(background.copy(), args.width, args.height, DEFAULT_CORNER_RADIUS, color).tobytes():
+        print('Images are different', file=sys.stderr)
+        sys.exit(1)
+    results: List[tuple] = list()
+    results.append(('Border and corners, per cell', measure(lambda: legacy_frame(background.copy(), args.width, args.height, DEFAULT_CORNER_RADIUS, color), args.iterations)))
+    results.append(('Border and corners, mask per size', measure(lambda: frame(background.copy(), args.width, args.height, DEFAULT_CORNER_RADIUS, color), args.iterations)))
+    results.append(('Border overlay and corners, per size', sum(overlay_frame(background.copy(), args.width, args.height, DEFAULT_CORNER_RADIUS, color) for i in range(args.iterations)) * 1000 / args.iterations))
+    grid: StubGrid = StubGrid()
+    renderer: StubRenderer = StubRenderer(logger, args.width * 2 // 3, args.height * 2 // 3)
+    cell: CanvasGridCell = CanvasGridCell('Cell 0')
+    results.append(('Complete cell', measure(lambda: renderer.render_cell(grid, cell, args.width, args.height), args.iterations)))
+    print('Cell size: %sx%s, iterations: %s' % (args.width, args.height, args.iterations))
+    for name, duration in results:
+        print('%s: %.3f ms' % (name, duration))
+    print('Gain: %.1f %%' % ((1 - results[1][1] / results[0][1]) * 100 if results[0][1] > 0 else 0))
+    sys.exit(0)
@@ -7,19 +7,21 @@ import media_api
 import os
 import pathlib
 import platform
-import pyautogui
 import sys
+import threading
+import time
 import traceback
 
 from abc import ABC
-from typing import Any, List
+from typing import Any, Dict, List, Tuple
 from PIL import Image
-from canvas_grid import CanvasGridRenderer
+from canvas_grid import CanvasGridRenderer, PadKey
 from id_classes_utils import subclasses_of, import_files_of_dir
-from media_api import RemoteControlEvent, ControllerListener, MediaSource, MediaSourceListener, InterfaceListener, MediaPlayerController, Media
+from media_api import RemoteControlEvent, ControllerListener, MediaSource, MediaSourceListener, InterfaceListener, MediaPlayerController, Media, CommandHandler
 from media_player_config import MediaPlayerConfig
 from media_player_interface import MediaPlayerInterface
-from id_threading_utils import Executor
+from media_player_state import PlayerState, StateBroadcaster
+from id_threading_utils import Executor, Future
 
 _STOPPING_EXECUTOR_MSG: str = 'Stopping executor'
 _STOPPING_CONTROLLER_MSG: str = 'Stopping controller'
@@ -28,6 +30,15 @@ _CLOSING_SOURCE_MSG: str = 'Closing source: %s'
 _NO_SOURCE_SELECTED_MSG: str = 'No source selected'
 _SOURCE_NOT_FOUND_MSG: str = 'Source: %s not found'
 _AN_ERROR_OCCURRED_MSG: str = 'An error occurred: %s'
+_PAD_KEYS: Dict[int, PadKey] = {
+    media_api.CODE_OK: PadKey.OK,
+    media_api.CODE_LEFT: PadKey.LEFT,
+    media_api.CODE_RIGHT: PadKey.RIGHT,
+    media_api.CODE_UP: PadKey.UP,
+    media_api.CODE_DOWN: PadKey.DOWN
+}
+# Commands having a textual argument, their numeric data must not be accumulated
+_TEXTUAL_CODES: set = {media_api.CODE_SEARCH, media_api.CODE_TEXT}
 
 available_sources: List[MediaSource] = list()
 import_files_of_dir(str(pathlib.Path(__file__).parent) + os.sep + 'sources')
@@ -45,24 +56,67 @@ class MediaSourceCellRenderer(CanvasGridRenderer):
             MediaSourceCellRenderer.__logger.setLevel(parent_logger.level)
         self.__config: MediaPlayerConfig = config
 
-    def render_image(self, value: Any) -> Image:
+    @staticmethod
+    def __read(path: str) -> io.BytesIO:
+        with open(path, 'rb') as fp:
+            return io.BytesIO(fp.read())
+
+    def render_image(self, value: Any, size: Tuple[int, int] = None) -> Image:
         if not isinstance(value, MediaSource):
             return
         source: MediaSource = value
         if source.get_image_path():
             MediaSourceCellRenderer.__logger.debug('Rendering image a: %s', source.get_image_path())
             image_path: str = self.__config.get_root_path() + os.sep + source.get_image_path()
-            with open(image_path, 'rb') as fp:
-                return Image.open(io.BytesIO(fp.read()))
+            return CanvasGridRenderer.load_image(image_path, size, lambda: MediaSourceCellRenderer.__read(image_path))
         return None
 
 
+class CommandStatistics(object):
+    def __init__(self, code: int):
+        self.__code: int = code
+        self.__count: int = 0
+        self.__errors: int = 0
+        self.__total_time: float = 0
+        self.__max_time: float = 0
+
+    def get_code(self) -> int:
+        return self.__code
+
+    def get_count(self) -> int:
+        return self.__count
+
+    def get_errors(self) -> int:
+        return self.__errors
+
+    def get_total_time(self) -> float:
+        return self.__total_time
+
+    def get_max_time(self) -> float:
+        return self.__max_time
+
+    def get_average_time(self) -> float:
+        if self.__count == 0:
+            return 0
+        return self.__total_time / self.__count
+
+    def add(self, duration: float, error: bool = False) -> None:
+        self.__count = self.__count + 1
+        if error:
+            self.__errors = self.__errors + 1
+        self.__total_time = self.__total_time + duration
+        self.__max_time = max(self.__max_time, duration)
+
+    def __str__(self):
+        return '0x%02X: %s call(s), %s error(s), average: %.2f ms, max: %.2f ms' % (self.__code, self.__count, self.__errors, self.get_average_time() * 1000, self.__max_time * 1000)
+
+
 class ControlEventHandler(ControllerListener, InterfaceListener, MediaSourceListener):
     __logger: logging.Logger = None
 
     @staticmethod
     def is_pad_event(event: RemoteControlEvent) -> bool:
-        return event.get_code() == media_api.CODE_OK or event.get_code() == media_api.CODE_LEFT or event.get_code() == media_api.CODE_RIGHT or event.get_code() == media_api.CODE_UP or event.get_code() == media_api.CODE_DOWN
+        return event.get_code() in _PAD_KEYS
 
     @staticmethod
     def is_raspberry_pi() -> bool:
@@ -83,10 +137,41 @@ class ControlEventHandler(ControllerListener, InterfaceListener, MediaSourceList
         self.__interface.set_listener(self)
         self.__controller: MediaPlayerController = controller
         self.__executor: Executor = executor
+        # Events can be received concurrently by the connections of the controller
+        self.__lock: threading.RLock = threading.RLock()
         # noinspection PyTypeChecker
         self.__pending_event: RemoteControlEvent = None
+        # Timeout applying the pending event, it is postponed by each new digit
+        # noinspection PyTypeChecker
+        self.__pending_future: Future = None
+        # Volume and channel changes accumulated during the coalescing delay and applied at once
+        self.__coalescing_delay: float = config.get_coalescing_delay() / 1000
+        self.__volume_delta: int = 0
+        self.__channel_delta: int = 0
+        self.__deltas_scheduled: bool = False
         # noinspection PyTypeChecker
         self.__source: MediaSource = None
+        # State returned to the remotes, it is updated by the callbacks of the sources
+        self.__state: PlayerState = PlayerState()
+        self.__broadcaster: StateBroadcaster = StateBroadcaster(self.__state)
+        # Handlers of the commands and statistics about their processing
+        self.__commands: Dict[int, CommandHandler] = dict()
+        self.__dispatch_table: Dict[int, CommandHandler] = dict()
+        self.__statistics: Dict[int, CommandStatistics] = dict()
+        self.register_command(media_api.CODE_POWER, self.__power)
+        self.register_command(media_api.CODE_SOURCE, self.__select_source)
+        self.register_command(media_api.CODE_BACK, self.__back)
+        for code in _PAD_KEYS.keys():
+            self.register_command(code, self.__press_pad_key)
+        self.register_command(media_api.CODE_STOP, self.__with_source(lambda e: self.__source.stop()))
+        self.register_command(media_api.CODE_CH, self.__with_source(self.__play_channel))
+        self.register_command(media_api.CODE_VOL, self.__with_source(self.__set_volume))
+        self.register_command(media_api.CODE_CH_UP, self.__with_source(lambda e: self.__accumulate(channel_delta=e.get_repeat())))
+        self.register_command(media_api.CODE_CH_DOWN, self.__with_source(lambda e: self.__accumulate(channel_delta=-e.get_repeat())))
+        self.register_command(media_api.CODE_NEXT, self.__with_source(lambda e: self.__source.play_next()))
+        self.register_command(media_api.CODE_PREVIOUS, self.__with_source(lambda e: self.__source.play_previous()))
+        self.register_command(media_api.CODE_VOL_UP, self.__with_source(lambda e: self.__accumulate(volume_delta=e.get_repeat())))
+        self.register_command(media_api.CODE_VOL_DOWN, self.__with_source(lambda e: self.__accumulate(volume_delta=-e.get_repeat())))
         self.__source_cell_renderer: CanvasGridRenderer = MediaSourceCellRenderer(parent_logger, config)
         try:
             for subclass in subclasses_of(MediaSource):
@@ -111,9 +196,55 @@ class ControlEventHandler(ControllerListener, InterfaceListener, MediaSourceList
             ControlEventHandler.__logger.info('Using source: %s', source.get_name())
             self.__interface.add_grid_cell(value=source, render=True)
 
+    def __set_source(self, source: MediaSource = None) -> None:
+        with self.__lock:
+            self.__source = source
+            self.__state.set_source(source.get_name() if source else None)
+            if not source:
+                self.__state.set_media(None)
+                self.__state.set_playing(False)
+            # Commands specific to the source take precedence over the common ones
+            dispatch_table: Dict[int, CommandHandler] = dict(self.__commands)
+            if source:
+                dispatch_table.update(source.get_commands())
+            self.__dispatch_table = dispatch_table
+
+    def get_command_statistics(self) -> List[CommandStatistics]:
+        """
+        Return the statistics about the processing of the commands.
+        :return: the statistics of each processed command
+        """
+        with self.__lock:
+            return list(self.__statistics.values())
+
+    def register_command(self, code: int, handler: CommandHandler) -> None:
+        """
+        Register the handler of a command, it replaces the existing one.
+        :param code: the code of the command
+        :param handler: the handler
+        """
+        with self.__lock:
+            self.__commands[code] = handler
+            self.__set_source(self.__source)
+
+    def unregister_command(self, code: int) -> None:
+        """
+        Unregister the handler of a command.
+        :param code: the code of the command
+        """
+        with self.__lock:
+            self.__commands.pop(code, None)
+            self.__set_source(self.__source)
+
     def get_controller(self) -> MediaPlayerController:
         return self.__controller
 
+    def get_state(self) -> PlayerState:
+        return self.__state
+
+    def get_state_broadcaster(self) -> StateBroadcaster:
+        return self.__broadcaster
+
     def get_interface(self) -> MediaPlayerInterface:
         return self.__interface
 
@@ -130,7 +261,7 @@ class ControlEventHandler(ControllerListener, InterfaceListener, MediaSourceList
                 self.__interface.set_grid_cells([])
                 if self.__source:
                     self.__source.close()
-                self.__source = source
+                self.__set_source(source)
                 self.__source.open()
             elif self.__source and isinstance(value, Media):
                 media: Media = value
@@ -160,7 +291,7 @@ class ControlEventHandler(ControllerListener, InterfaceListener, MediaSourceList
         if self.__source:
             ControlEventHandler.__logger.debug(_CLOSING_SOURCE_MSG, self.__source.get_name())
             self.__source.close()
-            self.__source = None
+            self.__set_source(None)
         if self.__interface:
             ControlEventHandler.__logger.debug(_STOPPING_INTERFACE_MSG)
             self.__interface.stop()
@@ -174,7 +305,7 @@ class ControlEventHandler(ControllerListener, InterfaceListener, MediaSourceList
         if self.__source:
             ControlEventHandler.__logger.debug(_CLOSING_SOURCE_MSG, self.__source.get_name())
             self.__source.close()
-            self.__source = None
+            self.__set_source(None)
         if self.__controller:
             ControlEventHandler.__logger.debug(_STOPPING_CONTROLLER_MSG)
             self.__controller.stop()
@@ -182,6 +313,10 @@ class ControlEventHandler(ControllerListener, InterfaceListener, MediaSourceList
 
     def on_source_opened(self, source: MediaSource, media: Media = None) -> None:
         ControlEventHandler.__logger.debug('Source opened: %s', source.get_name())
+        self.__state.set_media(media)
+        self.__state.set_playing(False)
+        self.__state.set_volume(source.get_volume())
+        self.__broadcaster.publish('source_opened')
         if self.__interface:
             self.__interface.set_playing(False)
             if media:
@@ -191,7 +326,8 @@ class ControlEventHandler(ControllerListener, InterfaceListener, MediaSourceList
 
     def on_source_close(self, source: MediaSource, media: Media = None) -> None:
         ControlEventHandler.__logger.debug('Source closed: %s', source.get_name())
-        self.__source = None
+        self.__set_source(None)
+        self.__broadcaster.publish('source_closed')
         if self.__interface:
             self.__interface.set_playing(False)
             self.__interface.set_grid_visible(True)
@@ -199,99 +335,172 @@ class ControlEventHandler(ControllerListener, InterfaceListener, MediaSourceList
             self.__interface.display_notice(_NO_SOURCE_SELECTED_MSG)
 
     def on_media_paused(self, source: MediaSource, media: Media) -> None:
+        self.__state.set_playing(False)
+        self.__broadcaster.publish('media_paused')
         if self.__interface and media:
             self.__interface.display_notice(media.get_name() + ' paused')
 
     def on_media_played(self, source: MediaSource, media: Media) -> None:
+        self.__state.set_media(media)
+        self.__state.set_playing(True)
+        self.__broadcaster.publish('media_played')
         self.__interface.set_playing(True)
         if self.__interface and media:
             self.__interface.display_notice('Playing ' + media.get_name())
 
     def on_media_stopped(self, source: MediaSource, media: Media) -> None:
+        self.__state.set_playing(False)
+        self.__broadcaster.publish('media_stopped')
         if self.__interface and media:
             self.__interface.set_playing(False)
             self.__interface.set_grid_visible(True)
             self.__interface.display_notice(media.get_name() + ' stopped')
 
+    def __accumulate(self, volume_delta: int = 0, channel_delta: int = 0) -> None:
+        with self.__lock:
+            self.__volume_delta = self.__volume_delta + volume_delta
+            self.__channel_delta = self.__channel_delta + channel_delta
+            if self.__coalescing_delay <= 0 or not self.__executor:
+                self.__apply_deltas()
+            elif not self.__deltas_scheduled:
+                self.__deltas_scheduled = True
+                self.__executor.schedule(self.__coalescing_delay, self.__apply_deltas)
+
+    def __apply_deltas(self) -> None:
+        with self.__lock:
+            volume_delta: int = self.__volume_delta
+            channel_delta: int = self.__channel_delta
+            self.__volume_delta = 0
+            self.__channel_delta = 0
+            self.__deltas_scheduled = False
+            if not self.__source:
+                return
+            ControlEventHandler.__logger.debug('Applying volume change: %s and channel change: %s', volume_delta, channel_delta)
+            try:
+                if volume_delta != 0:
+                    current_volume: int = self.__source.get_volume()
+                    volume: int = max(0, min(100, current_volume + volume_delta))
+                    if volume != current_volume:
+                        self.__source.set_volume(volume)
+                        self.__state.set_volume(volume)
+                        self.__broadcaster.publish('volume_changed')
+                    self.__interface.display_notice('Volume: %s' % volume)
+                if channel_delta != 0:
+                    media: Media = self.__source.get_media()
+                    if abs(channel_delta) > 1 and media and media.get_channel() >= 0:
+                        self.__source.play(media=media, channel=media.get_channel() + channel_delta)
+                    else:
+                        for i in range(abs(channel_delta)):
+                            if channel_delta > 0:
+                                self.__source.play_next()
+                            else:
+                                self.__source.play_previous()
+            except Exception as ex:
+                ControlEventHandler.__logger.warning('An error occurred while applying volume or channel change')
+                exc_type, exc_value, exc_traceback = sys.exc_info()
+                traceback.print_tb(exc_traceback, limit=6, file=sys.stderr)
+                ControlEventHandler.__logger.error(ex)
+                if self.__interface:
+                    self.__interface.display_error(_AN_ERROR_OCCURRED_MSG % repr(ex))
+
     def on_control_event(self, event: RemoteControlEvent) -> bytes:
+        if event.get_code() == media_api.CODE_STATUS:
+            # The state is cached, it is returned without waiting for the commands being processed
+            return self.__state.to_response()
+        with self.__lock:
+            return self.__process_control_event(event)
+
+    def __with_source(self, handler: CommandHandler) -> CommandHandler:
+        return lambda event: handler(event) if self.__source else self.__warn_no_source(event)
+
+    def __warn_no_source(self, event: RemoteControlEvent) -> None:
+        ControlEventHandler.__logger.debug(_NO_SOURCE_SELECTED_MSG)
+        if self.__interface:
+            self.__interface.display_warning('A source must be selected before sending commands.')
+
+    def __power(self, event: RemoteControlEvent) -> None:
+        if ControlEventHandler.is_raspberry_pi():
+            os.system("sudo shutdown now -fh")
+        elif self.__controller:
+            self.__controller.stop()
+
+    def __press_pad_key(self, event: RemoteControlEvent) -> None:
+        if self.__interface:
+            self.__interface.send_pad_key(_PAD_KEYS[event.get_code()])
+
+    def __back(self, event: RemoteControlEvent) -> None:
+        if not self.__source:
+            ControlEventHandler.__logger.debug(_NO_SOURCE_SELECTED_MSG)
+        elif self.__source.is_playing():
+            self.__source.stop()
+        else:
+            # Go to sources if no media is played
+            self.__select_source(event)
+
+    def __select_source(self, event: RemoteControlEvent) -> None:
+        self.__interface.set_cell_renderer(self.__source_cell_renderer)
+        if self.__source:
+            ControlEventHandler.__logger.debug(_CLOSING_SOURCE_MSG, self.__source.get_name())
+            self.__source.close()
+            self.__set_source(None)
+        if event.get_code() != media_api.CODE_BACK:
+            numeric_data: int = event.to_numeric()
+            if numeric_data and 0 <= numeric_data < len(available_sources):
+                self.__set_source(available_sources[int(event.get_data())])
+                ControlEventHandler.__logger.debug('Opening source: %s', self.__source.get_name())
+                self.__source.open()
+            else:
+                ControlEventHandler.__logger.warning(_SOURCE_NOT_FOUND_MSG, event.get_data())
+                if self.__interface:
+                    self.__interface.display_warning(_SOURCE_NOT_FOUND_MSG % event.get_data())
+
+    def __play_channel(self, event: RemoteControlEvent) -> None:
+        if event.get_data():
+            self.__source.play(channel=event.to_numeric())
+
+    def __set_volume(self, event: RemoteControlEvent) -> None:
+        if event.get_data():
+            self.__source.set_volume(event.to_numeric())
+            self.__state.set_volume(self.__source.get_volume())
+            self.__broadcaster.publish('volume_changed')
+
+    def __process_control_event(self, event: RemoteControlEvent) -> bytes:
         result: bytes = media_api.RESPONSE_ACK
         ControlEventHandler.__logger.debug('Event received: %s', event)
+        code: int = event.get_code()
+        start: float = time.perf_counter()
+        error: bool = False
         try:
             # Accumulate numeric values and set the new event with accumulated value as the pending one
             numeric_data: int = event.to_numeric()
-            if event != self.__pending_event and numeric_data and numeric_data >= 0:
+            if event != self.__pending_event and numeric_data and numeric_data >= 0 and code not in _TEXTUAL_CODES:
                 ControlEventHandler.__logger.debug('Accumulating numeric value described by the event')
                 if self.__pending_event is None:
                     self.__pending_event = event
                     self.__pending_event.set_data(numeric_data)
                 else:
                     self.__pending_event.set_data(numeric_data + self.__pending_event.get_data() * 10)
-                self.__executor.schedule(3, self.on_control_event, self.__pending_event)
+                if self.__pending_future:
+                    self.__pending_future.cancel()
+                self.__pending_future = self.__executor.schedule(3, self.on_control_event, self.__pending_event)
                 return result
             # Event is the accumulated (pending) one, it must be cleared
             if event == self.__pending_event:
                 self.__pending_event = None
+                # noinspection PyTypeChecker
+                self.__pending_future = None
             ControlEventHandler.__logger.debug('Processing received: %s', event)
-            # Power or return from the main screen
-            if not self.__source and event.get_code() == media_api.CODE_BACK:
-                ControlEventHandler.__logger.debug(_NO_SOURCE_SELECTED_MSG)
-            elif event.get_code() == media_api.CODE_POWER:
-                if ControlEventHandler.is_raspberry_pi():
-                    os.system("sudo shutdown now -fh")
-                elif self.__controller:
-                    self.__controller.stop()
-            elif event.get_code() == media_api.CODE_OK:
-                pyautogui.press('enter')
-            elif event.get_code() == media_api.CODE_LEFT:
-                pyautogui.press('left')
-            elif event.get_code() == media_api.CODE_RIGHT:
-                pyautogui.press('right')
-            elif event.get_code() == media_api.CODE_UP:
-                pyautogui.press('up')
-            elif event.get_code() == media_api.CODE_DOWN:
-                pyautogui.press('down')
-            # Go to source if no media is played
-            elif event.get_code() == media_api.CODE_SOURCE or (self.__source and event.get_code() == media_api.CODE_BACK and not self.__source.is_playing()):
-                self.__interface.set_cell_renderer(self.__source_cell_renderer)
-                if self.__source:
-                    ControlEventHandler.__logger.debug(_CLOSING_SOURCE_MSG, self.__source.get_name())
-                    self.__source.close()
-                    self.__source = None
-                if event.get_code() != media_api.CODE_BACK:
-                    if numeric_data and 0 <= numeric_data < len(available_sources):
-                        self.__source = available_sources[int(event.get_data())]
-                        ControlEventHandler.__logger.debug('Opening source: %s', self.__source.get_name())
-                        self.__source.open()
-                    else:
-                        ControlEventHandler.__logger.warning(_SOURCE_NOT_FOUND_MSG, event.get_data())
-                        if self.__interface:
-                            self.__interface.display_warning(_SOURCE_NOT_FOUND_MSG % event.get_data())
+            handler: CommandHandler = self.__dispatch_table.get(code)
+            if handler:
+                response: bytes = handler(event)
+                if response:
+                    result = response
             elif self.__source:
-                if event.get_code() == media_api.CODE_BACK or event.get_code() == media_api.CODE_STOP:
-                    self.__source.stop()
-                elif event.get_code() == media_api.CODE_CH and event.get_data():
-                    self.__source.play(channel=numeric_data)
-                elif event.get_code() == media_api.CODE_VOL and event.get_data():
-                    self.__source.set_volume(numeric_data)
-                elif event.get_code() == media_api.CODE_CH_UP or event.get_code() == media_api.CODE_NEXT:
-                    self.__source.play_next()
-                elif event.get_code() == media_api.CODE_CH_DOWN or event.get_code() == media_api.CODE_PREVIOUS:
-                    self.__source.play_previous()
-                elif event.get_code() == media_api.CODE_VOL_UP:
-                    current_volume: int = self.__source.get_volume()
-                    if current_volume < 100:
-                        self.__source.set_volume(current_volume + 1)
-                    self.__interface.display_notice('Volume: %s' % self.__source.get_volume())
-                elif event.get_code() == media_api.CODE_VOL_DOWN:
-                    current_volume: int = self.__source.get_volume()
-                    if current_volume > 0:
-                        self.__source.set_volume(current_volume - 1)
-                    self.__interface.display_notice('Volume: %s' % self.__source.get_volume())
+                ControlEventHandler.__logger.debug('Command not handled: %s', event)
             else:
-                ControlEventHandler.__logger.debug(_NO_SOURCE_SELECTED_MSG)
-                if self.__interface:
-                    self.__interface.display_warning('A source must be selected before sending commands.')
+                self.__warn_no_source(event)
         except Exception as ex:
+            error = True
             ControlEventHandler.__logger.warning('An error occurred while dispatching event: %s', event)
             exc_type, exc_value, exc_traceback = sys.exc_info()
             traceback.print_tb(exc_traceback, limit=6, file=sys.stderr)
@@ -299,4 +508,12 @@ class ControlEventHandler(ControllerListener, InterfaceListener, MediaSourceList
             if self.__interface:
                 self.__interface.display_error(_AN_ERROR_OCCURRED_MSG % repr(ex))
             return media_api.RESPONSE_NACK
+        finally:
+            if self.__pending_event is not event:
+                statistics: CommandStatistics = self.__statistics.get(code)
+                if not statistics:
+                    statistics = CommandStatistics(code)
+                    self.__statistics[code] = statistics
+                statistics.add(time.perf_counter() - start, error)
+                ControlEventHandler.__logger.debug('Command statistics: %s', statistics)
         return result
@@ -0,0 +1,124 @@
+# -*- coding: utf-*-
+# Asynchronous dispatch of the control events
+import heapq
+import logging
+import media_api
+import sys
+import threading
+import traceback
+
+from typing import Any, List
+from media_api import RemoteControlEvent, ControllerListener
+from media_player_config import MediaPlayerConfig
+
+PRIORITY_HIGH: int = 0
+PRIORITY_NORMAL: int = 1
+# Events processed before the ones already queued
+_PRIORITY_CODES: set = {media_api.CODE_POWER, media_api.CODE_STOP}
+# Events merged with the last queued one when they have the same code
+_COALESCING_CODES: set = {media_api.CODE_VOL_UP, media_api.CODE_VOL_DOWN, media_api.CODE_CH_UP, media_api.CODE_CH_DOWN}
+# Events answered by the listener without being queued, their responses are expected by the remotes
+_SYNCHRONOUS_CODES: set = {media_api.CODE_STATUS}
+
+
+class ControlEventQueue(ControllerListener):
+    __logger: logging.Logger = None
+
+    @staticmethod
+    def get_priority(event: RemoteControlEvent) -> int:
+        if event.get_code() in _PRIORITY_CODES:
+            return PRIORITY_HIGH
+        return PRIORITY_NORMAL
+
+    def __init__(self, parent_logger: logging.Logger, config: MediaPlayerConfig, listener: ControllerListener):
+        """
+        Initialize the queue and start the dispatcher thread.
+        :param parent_logger: the main logger
+        :param config: the configuration object
+        :param listener: the listener receiving the events from the dispatcher thread
+        """
+        super().__init__()
+        if not ControlEventQueue.__logger:
+            ControlEventQueue.__logger = logging.getLogger(self.__class__.__name__)
+            for handler in parent_logger.handlers:
+                ControlEventQueue.__logger.addHandler(handler)
+            ControlEventQueue.__logger.setLevel(parent_logger.level)
+        ControlEventQueue.__logger.info('Initializing %s', self.__class__.__name__)
+        self.__listener: ControllerListener = listener
+        self.__max_size: int = config.get_event_queue_size()
+        self.__condition: threading.Condition = threading.Condition()
+        # Entries are lists of priority, sequence number and event, the sequence number keeps the order of the events of same priority
+        self.__entries: List[List[Any]] = list()
+        self.__sequence: int = 0
+        # noinspection PyTypeChecker
+        self.__last_entry: List[Any] = None
+        self.__active: bool = True
+        self.__dropped: int = 0
+        self.__worker: threading.Thread = threading.Thread(target=self.__work, name=self.__class__.__name__, daemon=True)
+        self.__worker.start()
+
+    def get_listener(self) -> ControllerListener:
+        return self.__listener
+
+    def get_state_broadcaster(self) -> Any:
+        return self.__listener.get_state_broadcaster()
+
+    def get_dropped_count(self) -> int:
+        return self.__dropped
+
+    def get_size(self) -> int:
+        with self.__condition:
+            return len(self.__entries)
+
+    def __work(self) -> None:
+        while True:
+            with self.__condition:
+                while self.__active and len(self.__entries) == 0:
+                    self.__condition.wait()
+                if not self.__active:
+                    return
+                entry: List[Any] = heapq.heappop(self.__entries)
+                if entry is self.__last_entry:
+                    self.__last_entry = None
+            event: RemoteControlEvent = entry[2]
+            # noinspection PyBroadException
+            try:
+                ControlEventQueue.__logger.debug('Dispatching control event: %s', event)
+                if self.__listener.on_control_event(event) != media_api.RESPONSE_ACK:
+                    ControlEventQueue.__logger.warning('Control event not processed: %s', event)
+            except Exception as ex:
+                ControlEventQueue.__logger.warning('An error occurred while dispatching event: %s', event)
+                exc_type, exc_value, exc_traceback = sys.exc_info()
+                traceback.print_tb(exc_traceback, limit=6, file=sys.stderr)
+                ControlEventQueue.__logger.error(ex)
+
+    def on_controller_stop(self) -> None:
+        with self.__condition:
+            self.__active = False
+            self.__entries.clear()
+            self.__last_entry = None
+            self.__condition.notify_all()
+        self.__listener.on_controller_stop()
+
+    def on_control_event(self, event: RemoteControlEvent) -> bytes:
+        if event.get_code() in _SYNCHRONOUS_CODES:
+            return self.__listener.on_control_event(event)
+        priority: int = ControlEventQueue.get_priority(event)
+        with self.__condition:
+            if not self.__active:
+                return media_api.RESPONSE_NACK
+            last: List[Any] = self.__last_entry
+            if last and event.get_code() in _COALESCING_CODES and last[2].get_code() == event.get_code() and last[2].get_data() is None and event.get_data() is None:
+                last[2].set_repeat(last[2].get_repeat() + event.get_repeat())
+                ControlEventQueue.__logger.debug('Control event coalesced: %s', last[2])
+                return media_api.RESPONSE_ACK
+            # Events of high priority are always accepted
+            if priority != PRIORITY_HIGH and len(self.__entries) >= self.__max_size:
+                self.__dropped = self.__dropped + 1
+                ControlEventQueue.__logger.warning('Queue is full, control event rejected: %s (%s dropped)', event, self.__dropped)
+                return media_api.RESPONSE_BUSY
+            self.__sequence = self.__sequence + 1
+            self.__last_entry = [priority, self.__sequence, event]
+            heapq.heappush(self.__entries, self.__last_entry)
+            self.__condition.notify()
+        return media_api.RESPONSE_ACK
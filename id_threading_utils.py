@@ -1,72 +1,415 @@
 # -*- coding: utf-*-
 # utilities
+import bisect
 import concurrent.futures
+import heapq
 import logging
 import threading
 import time
 
+from typing import Any, Callable, Dict, List
+
+# Lanes of the executor, by decreasing priority
+LANE_INTERACTIVE: str = 'interactive'
+LANE_RENDER: str = 'render'
+LANE_NETWORK: str = 'network'
+LANE_BACKGROUND: str = 'background'
+LANES: List[str] = [LANE_INTERACTIVE, LANE_RENDER, LANE_NETWORK, LANE_BACKGROUND]
+
+
+class Histogram(object):
+    # Upper bounds in milliseconds of the buckets, the last bucket is not bounded
+    BOUNDS: List[float] = [1, 5, 10, 50, 100, 500, 1000, 5000]
+
+    def __init__(self):
+        """
+        Initialize the histogram of durations.
+        """
+        self.__counts: List[int] = [0] * (len(Histogram.BOUNDS) + 1)
+        self.__count: int = 0
+        self.__total: float = 0
+        self.__max: float = 0
+
+    def add(self, value: float) -> None:
+        """
+        Add the duration.
+        :param value: the duration in milliseconds
+        """
+        self.__counts[bisect.bisect_left(Histogram.BOUNDS, value)] += 1
+        self.__count = self.__count + 1
+        self.__total = self.__total + value
+        if value > self.__max:
+            self.__max = value
+
+    def get_count(self) -> int:
+        return self.__count
+
+    def get_average(self) -> float:
+        return self.__total / self.__count if self.__count > 0 else 0
+
+    def get_max(self) -> float:
+        return self.__max
+
+    def get_counts(self) -> List[int]:
+        return list(self.__counts)
+
+    def get_percentile(self, rank: float) -> float:
+        """
+        Return the upper bound of the bucket containing the percentile.
+        :param rank: the rank between 0 and 100
+        :return: the upper bound in milliseconds, the maximum for the last bucket
+        """
+        expected: float = rank / 100 * self.__count
+        count: int = 0
+        for i, value in enumerate(self.__counts):
+            count = count + value
+            if value > 0 and count >= expected:
+                return Histogram.BOUNDS[i] if i < len(Histogram.BOUNDS) else self.__max
+        return 0
+
+    def __str__(self):
+        return 'average %.1f ms, p95 <= %.0f ms, max %.1f ms' % (self.get_average(), self.get_percentile(95), self.__max)
+
+
+class TaskStatistics(object):
+    def __init__(self):
+        """
+        Initialize the statistics of the tasks sharing the same function.
+        """
+        self.wait: Histogram = Histogram()
+        self.run: Histogram = Histogram()
+        self.errors: int = 0
+
+    def __str__(self):
+        return 'count: %s, errors: %s, wait: %s, run: %s' % (self.run.get_count(), self.errors, self.wait, self.run)
+
+
+class ExecutorStatistics(object):
+    def __init__(self):
+        """
+        Initialize the statistics of the executor, the tasks are grouped by lane and by name of their function.
+        """
+        self.__lock: threading.Lock = threading.Lock()
+        self.__queued: Dict[str, int] = {lane: 0 for lane in LANES}
+        self.__active: Dict[str, int] = {lane: 0 for lane in LANES}
+        self.__tasks: Dict[str, TaskStatistics] = dict()
+
+    @staticmethod
+    def get_name(fn) -> str:
+        return getattr(fn, '__qualname__', None) or getattr(fn, '__name__', None) or str(fn)
+
+    def get_queued_count(self, lane: str) -> int:
+        with self.__lock:
+            return self.__queued.get(lane, 0)
+
+    def get_active_count(self, lane: str) -> int:
+        with self.__lock:
+            return self.__active.get(lane, 0)
+
+    def get_tasks(self) -> Dict[str, TaskStatistics]:
+        with self.__lock:
+            return dict(self.__tasks)
+
+    def on_submitted(self, lane: str) -> None:
+        with self.__lock:
+            self.__queued[lane] = self.__queued[lane] + 1
+
+    def on_cancelled(self, lane: str) -> None:
+        with self.__lock:
+            self.__queued[lane] = self.__queued[lane] - 1
+
+    def on_started(self, lane: str, name: str, wait: float) -> None:
+        with self.__lock:
+            self.__queued[lane] = self.__queued[lane] - 1
+            self.__active[lane] = self.__active[lane] + 1
+            statistics: TaskStatistics = self.__tasks.get(name)
+            if not statistics:
+                statistics = TaskStatistics()
+                self.__tasks[name] = statistics
+            statistics.wait.add(wait)
+
+    def on_finished(self, lane: str, name: str, duration: float, failed: bool) -> None:
+        with self.__lock:
+            self.__active[lane] = self.__active[lane] - 1
+            statistics: TaskStatistics = self.__tasks[name]
+            statistics.run.add(duration)
+            if failed:
+                statistics.errors = statistics.errors + 1
+
+    def __str__(self):
+        with self.__lock:
+            lines: List[str] = ['%s: queued: %s, active: %s' % (lane, self.__queued[lane], self.__active[lane]) for lane in LANES]
+            for name in sorted(self.__tasks.keys()):
+                lines.append('%s: %s' % (name, self.__tasks[name]))
+            return '\n'.join(lines)
+
+
+class ScheduledTask(object):
+    def __init__(self, deadline: float, fn, *args):
+        """
+        Initialize the task executed by the scheduler.
+        :param deadline: the monotonic time of the execution
+        :param fn: the function
+        :param args: the arguments of the function
+        """
+        self.deadline: float = deadline
+        self.__fn = fn
+        self.__args = args
+        self.__cancelled: bool = False
+
+    def __lt__(self, other) -> bool:
+        return self.deadline < other.deadline
+
+    def cancel(self) -> None:
+        # The task is removed from the heap when due or when the heap is compacted
+        self.__cancelled = True
+
+    def is_cancelled(self) -> bool:
+        return self.__cancelled
+
+    def run(self) -> None:
+        if not self.__cancelled:
+            self.__fn(*self.__args)
+
+
+class Scheduler(object):
+    # Number of cancelled tasks triggering the compaction of the heap
+    COMPACTION_THRESHOLD: int = 64
+
+    def __init__(self, logger: logging.Logger, name: str):
+        """
+        Initialize the scheduler, a single thread waits for the next due task instead of one timer thread per task.
+        The tasks must be short, the long ones must be submitted to an executor.
+        :param logger: the logger
+        :param name: the name of the thread
+        """
+        self.__logger: logging.Logger = logger
+        self.__name: str = name
+        self.__condition: threading.Condition = threading.Condition()
+        self.__tasks: List[ScheduledTask] = list()
+        self.__active: bool = True
+        # noinspection PyTypeChecker
+        self.__thread: threading.Thread = None
+
+    def get_pending_count(self) -> int:
+        with self.__condition:
+            return len(self.__tasks)
+
+    def schedule(self, delay: float, fn, *args) -> ScheduledTask:
+        """
+        Schedule the function.
+        :param delay: the delay in seconds
+        :param fn: the function
+        :param args: the arguments of the function
+        :return: the task which can be cancelled
+        """
+        result: ScheduledTask = ScheduledTask(time.monotonic() + max(0.0, delay), fn, *args)
+        with self.__condition:
+            if not self.__active:
+                result.cancel()
+                return result
+            if not self.__thread:
+                # The thread is started on first use
+                self.__thread = threading.Thread(target=self.__run, name=self.__name, daemon=True)
+                self.__thread.start()
+            cancelled: int = sum(1 for task in self.__tasks if task.is_cancelled()) if len(self.__tasks) >= Scheduler.COMPACTION_THRESHOLD else 0
+            if cancelled >= Scheduler.COMPACTION_THRESHOLD:
+                self.__tasks = [task for task in self.__tasks if not task.is_cancelled()]
+                heapq.heapify(self.__tasks)
+            heapq.heappush(self.__tasks, result)
+            # Only the thread waits on the condition and only an earlier deadline changes its wait
+            if self.__tasks[0] is result:
+                self.__condition.notify()
+        return result
+
+    def __run(self) -> None:
+        while True:
+            with self.__condition:
+                while self.__active and (not self.__tasks or self.__tasks[0].deadline > time.monotonic()):
+                    self.__condition.wait(self.__tasks[0].deadline - time.monotonic() if self.__tasks else None)
+                if not self.__active:
+                    return
+                task: ScheduledTask = heapq.heappop(self.__tasks)
+            # noinspection PyBroadException
+            try:
+                task.run()
+            except Exception as ex:
+                self.__logger.error('Error in scheduled task: %s', ex)
+
+    def shutdown(self) -> None:
+        with self.__condition:
+            self.__active = False
+            for task in self.__tasks:
+                task.cancel()
+            self.__tasks = list()
+            self.__condition.notify()
+
 
 class Future(object):
-    def __init__(self, logger: logging.Logger, executor):
+    def __init__(self, logger: logging.Logger, executor, lane: str = LANE_INTERACTIVE):
         self.__logger: logging.Logger = logger
         self.__executor: Executor = executor
+        self.__lane: str = lane
+        # The condition is notified when the delegate is submitted or when the future is cancelled
+        self.__condition: threading.Condition = threading.Condition()
         # noinspection PyTypeChecker
         self.__delegate: concurrent.futures.Future = None
         # noinspection PyTypeChecker
-        self.__timer: threading.Timer = None
+        self.__timer: ScheduledTask = None
+        self.__cancelled: bool = False
+        self.__periodic: bool = False
+        self.__callbacks: List[Callable[[Any], None]] = list()
+        self.__completed: bool = False
         self.__fn = None
         self.__args = None
         self.__kwargs = None
 
-    def cancel(self):
-        if self.__timer:
-            self.__timer.cancel()
-        if self.__delegate:
-            self.__delegate.cancel()
-
-    def running(self):
-        return self.__delegate and self.__delegate.running()
-
-    def done(self):
-        return self.__delegate and self.__delegate.done()
-
-    def cancelled(self):
-        return not self.__timer and self.__delegate and self.__delegate.cancelled()
-
-    def result(self, timeout=None):
-        remaining: float = timeout
-        while not self.__delegate:
-            time.sleep(0.1)
-            remaining = remaining - 0.1
-        if self.__delegate:
-            if remaining:
-                return self.__delegate.result(round(remaining))
-            return self.__delegate.result()
-        return None
-
-    def exception(self, timeout=None):
-        remaining: float = timeout
-        while not self.__delegate:
-            time.sleep(0.1)
-            remaining = remaining - 0.1
-        if self.__delegate:
-            if remaining:
-                return self.__delegate.exception(round(remaining))
-            return self.__delegate.exception()
-        return None
+    def __complete(self) -> None:
+        with self.__condition:
+            if self.__completed:
+                return
+            self.__completed = True
+            callbacks: List[Callable[[Any], None]] = self.__callbacks
+            self.__callbacks = list()
+        for callback in callbacks:
+            self.__invoke(callback)
+
+    def __invoke(self, callback: Callable[[Any], None]) -> None:
+        # noinspection PyBroadException
+        try:
+            callback(self)
+        except Exception as ex:
+            self.__logger.error('Error in done callback of %s: %s', self.__fn, ex)
+
+    # noinspection PyUnusedLocal
+    def __on_delegate_done(self, delegate: concurrent.futures.Future) -> None:
+        self.__complete()
+
+    def __wait_delegate(self, timeout: float = None) -> concurrent.futures.Future:
+        # Returns the delegate or raises the errors of the concurrent futures, the remaining time is applied to the delegate by the caller
+        with self.__condition:
+            if not self.__condition.wait_for(lambda: self.__delegate or self.__cancelled, timeout):
+                raise concurrent.futures.TimeoutError()
+            if self.__cancelled and not self.__delegate:
+                raise concurrent.futures.CancelledError()
+            return self.__delegate
+
+    def cancel(self) -> bool:
+        """
+        Cancel the future, the scheduled executions are cancelled and the pending execution is cancelled if not yet started.
+        :return: true if the future is cancelled
+        """
+        with self.__condition:
+            self.__cancelled = True
+            if self.__timer:
+                self.__timer.cancel()
+                self.__timer = None
+            delegate: concurrent.futures.Future = self.__delegate
+            self.__condition.notify_all()
+        if delegate and not delegate.cancel() and not self.__periodic:
+            # Already running, the callbacks are invoked when the execution ends
+            return False
+        if not delegate or self.__periodic:
+            self.__complete()
+        return True
+
+    def running(self) -> bool:
+        delegate: concurrent.futures.Future = self.__delegate
+        return delegate is not None and delegate.running()
+
+    def done(self) -> bool:
+        delegate: concurrent.futures.Future = self.__delegate
+        return (self.__cancelled and not self.running()) or (delegate is not None and delegate.done())
+
+    def cancelled(self) -> bool:
+        delegate: concurrent.futures.Future = self.__delegate
+        return self.__cancelled and (delegate is None or self.__periodic or delegate.cancelled())
+
+    def add_done_callback(self, fn: Callable[[Any], None]) -> None:
+        """
+        Add the function invoked with this future when it is done or cancelled.
+        The function is invoked immediately if the future is already done, and once for periodic futures when they are cancelled.
+        :param fn: the function
+        """
+        with self.__condition:
+            if not self.__completed:
+                self.__callbacks.append(fn)
+                return
+        self.__invoke(fn)
+
+    def result(self, timeout: float = None):
+        """
+        Wait for the end of the execution and return its result.
+        :param timeout: the maximum time to wait in seconds, None to wait without limit
+        :return: the result of the execution
+        """
+        deadline: float = None if timeout is None else time.monotonic() + timeout
+        delegate: concurrent.futures.Future = self.__wait_delegate(timeout)
+        return delegate.result(None if deadline is None else max(0.0, deadline - time.monotonic()))
+
+    def exception(self, timeout: float = None):
+        """
+        Wait for the end of the execution and return the exception raised by the execution.
+        :param timeout: the maximum time to wait in seconds, None to wait without limit
+        :return: the exception or None
+        """
+        deadline: float = None if timeout is None else time.monotonic() + timeout
+        delegate: concurrent.futures.Future = self.__wait_delegate(timeout)
+        return delegate.exception(None if deadline is None else max(0.0, deadline - time.monotonic()))
 
     def __submit(self, duration: float):
-        if not self.__executor.is_ready() and self.__timer:
-            self.__timer.cancel()
-        if duration <= 0:
-            self.__timer = None
-        elif self.__executor.is_ready():
-            self.__logger.debug('Rescheduling next execution of %s', self.__fn)
-            self.__timer = threading.Timer(duration, self.__submit, [duration])
-            self.__timer.start()
-        if self.__executor.is_ready():
-            self.__logger.debug('Execution of %s', self.__fn)
-            self.__delegate = self.__executor._get_delegate().submit(self.__fn, *self.__args, **self.__kwargs)
+        with self.__condition:
+            if self.__cancelled:
+                return
+            if not self.__executor.is_ready():
+                # The executor is stopped, the waiting threads must not wait for a delegate
+                self.__logger.debug('Executor stopped, execution of %s cancelled', self.__fn)
+                self.__cancelled = True
+                self.__timer = None
+                self.__condition.notify_all()
+            else:
+                if duration <= 0:
+                    self.__timer = None
+                else:
+                    self.__logger.debug('Rescheduling next execution of %s', self.__fn)
+                    self.__timer = self.__executor._get_scheduler().schedule(duration, self.__submit, duration)
+                self.__logger.debug('Execution of %s', self.__fn)
+                self.__executor.get_statistics().on_submitted(self.__lane)
+                try:
+                    self.__delegate = self.__executor._get_delegate(self.__lane).submit(self.__run, time.monotonic())
+                    self.__delegate.add_done_callback(self.__on_executed)
+                except RuntimeError:
+                    self.__executor.get_statistics().on_cancelled(self.__lane)
+                    # The delegate has been shut down meanwhile
+                    self.__cancelled = True
+                    if self.__timer:
+                        self.__timer.cancel()
+                        self.__timer = None
+                self.__condition.notify_all()
+            delegate: concurrent.futures.Future = self.__delegate
+            cancelled: bool = self.__cancelled
+        if cancelled:
+            self.__complete()
+        elif not self.__periodic:
+            delegate.add_done_callback(self.__on_delegate_done)
+
+    def __run(self, submitted: float):
+        statistics: ExecutorStatistics = self.__executor.get_statistics()
+        name: str = ExecutorStatistics.get_name(self.__fn)
+        started: float = time.monotonic()
+        statistics.on_started(self.__lane, name, (started - submitted) * 1000)
+        failed: bool = True
+        try:
+            result = self.__fn(*self.__args, **self.__kwargs)
+            failed = False
+            return result
+        finally:
+            statistics.on_finished(self.__lane, name, (time.monotonic() - started) * 1000, failed)
+
+    def __on_executed(self, delegate: concurrent.futures.Future) -> None:
+        if delegate.cancelled():
+            # Cancelled tasks never start and must be removed from the queued ones
+            self.__executor.get_statistics().on_cancelled(self.__lane)
 
     def submit(self, duration: float, fn, *args, **kwargs):
         self.__fn = fn
@@ -78,54 +421,110 @@ class Future(object):
         self.__fn = fn
         self.__args = args
         self.__kwargs = kwargs
-        self.__timer = threading.Timer(delay, self.__submit, [-1])
-        self.__timer.start()
+        with self.__condition:
+            self.__timer = self.__executor._get_scheduler().schedule(delay, self.__submit, -1)
+        if self.__timer.is_cancelled():
+            # The scheduler is stopped, the future is cancelled as the executor is not ready
+            self.__submit(-1)
 
     def schedule_at_rate(self, delay: float, duration: float, fn, *args, **kwargs) -> None:
         self.__fn = fn
         self.__args = args
         self.__kwargs = kwargs
-        self.__timer = threading.Timer(delay, self.__submit, [duration])
-        self.__timer.start()
+        self.__periodic = duration > 0
+        with self.__condition:
+            self.__timer = self.__executor._get_scheduler().schedule(delay, self.__submit, duration)
+        if self.__timer.is_cancelled():
+            # The scheduler is stopped, the future is cancelled as the executor is not ready
+            self.__submit(-1)
 
 
 class Executor(object):
     __logger: logging.Logger = None
 
-    def __init__(self, parent_logger: logging.Logger, thread_name_prefix: str, max_workers: int):
+    def __init__(self, parent_logger: logging.Logger, thread_name_prefix: str, max_workers: int, lanes: Dict[str, int] = None):
+        """
+        Initialize the executor, each lane has its own threads so that slow tasks never delay the tasks of the other lanes.
+        :param parent_logger: the main logger
+        :param thread_name_prefix: the prefix of the names of the threads
+        :param max_workers: the number of threads of the lanes not specified in the given mapping
+        :param lanes: the number of threads of each lane
+        """
         if not Executor.__logger:
             Executor.__logger = logging.getLogger(self.__class__.__name__)
             for handler in parent_logger.handlers:
                 Executor.__logger.addHandler(handler)
             Executor.__logger.setLevel(parent_logger.level)
         Executor.__logger.info('Initializing %s', self.__class__.__name__)
-        self.__executor: concurrent.futures.ThreadPoolExecutor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+        self.__executors: Dict[str, concurrent.futures.ThreadPoolExecutor] = dict()
+        for lane in LANES:
+            workers: int = lanes.get(lane, max_workers) if lanes else max_workers
+            Executor.__logger.debug('Lane %s uses %s thread(s)', lane, workers)
+            self.__executors[lane] = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix=thread_name_prefix + '-' + lane)
+        # The delays of all the futures are handled by a single thread
+        self.__scheduler: Scheduler = Scheduler(Executor.__logger, thread_name_prefix + '-scheduler')
+        self.__statistics: ExecutorStatistics = ExecutorStatistics()
+        # noinspection PyTypeChecker
+        self.__statistics_future: Future = None
         self.__ready: bool = True
 
-    def _get_delegate(self):
-        return self.__executor
+    def _get_delegate(self, lane: str = LANE_INTERACTIVE):
+        return self.__executors[lane]
+
+    def _get_scheduler(self) -> Scheduler:
+        return self.__scheduler
 
     def is_ready(self) -> bool:
         return self.__ready
 
-    def submit(self, fn, *args, **kwargs) -> Future:
-        Executor.__logger.debug('Submitting: %s', fn)
-        future: Future = Future(Executor.__logger, self)
+    def get_statistics(self) -> ExecutorStatistics:
+        return self.__statistics
+
+    def log_statistics(self) -> None:
+        Executor.__logger.info('Statistics:\n%s', self.__statistics)
+
+    def log_statistics_at_rate(self, interval: float) -> None:
+        """
+        Log the statistics periodically.
+        :param interval: the interval in seconds, 0 to stop logging the statistics
+        """
+        if self.__statistics_future:
+            self.__statistics_future.cancel()
+            # noinspection PyTypeChecker
+            self.__statistics_future = None
+        if interval > 0:
+            self.__statistics_future = self.schedule_at_rate(interval, interval, self.log_statistics, lane=LANE_BACKGROUND)
+
+    @staticmethod
+    def __check_lane(lane: str) -> None:
+        if lane not in LANES:
+            raise ValueError('Invalid lane: ' + str(lane))
+
+    def submit(self, fn, *args, lane: str = LANE_INTERACTIVE, **kwargs) -> Future:
+        Executor.__check_lane(lane)
+        Executor.__logger.debug('Submitting: %s on lane: %s', fn, lane)
+        future: Future = Future(Executor.__logger, self, lane)
         future.submit(-1, fn, *args, **kwargs)
         return future
 
-    def schedule(self, delay: float, fn, *args, **kwargs) -> Future:
-        Executor.__logger.debug('Scheduling: %s with delay: %s', fn, str(delay))
-        future: Future = Future(Executor.__logger, self)
+    def schedule(self, delay: float, fn, *args, lane: str = LANE_INTERACTIVE, **kwargs) -> Future:
+        Executor.__check_lane(lane)
+        Executor.__logger.debug('Scheduling: %s with delay: %s on lane: %s', fn, str(delay), lane)
+        future: Future = Future(Executor.__logger, self, lane)
         future.schedule(delay, fn, *args, **kwargs)
         return future
 
-    def schedule_at_rate(self, delay: float, duration: float, fn, *args, **kwargs) -> Future:
-        Executor.__logger.debug('Scheduling at fixed rate: %s with delay: %s and rate: %s', fn, str(delay), str(duration))
-        future: Future = Future(Executor.__logger, self)
+    def schedule_at_rate(self, delay: float, duration: float, fn, *args, lane: str = LANE_INTERACTIVE, **kwargs) -> Future:
+        Executor.__check_lane(lane)
+        Executor.__logger.debug('Scheduling at fixed rate: %s with delay: %s and rate: %s on lane: %s', fn, str(delay), str(duration), lane)
+        future: Future = Future(Executor.__logger, self, lane)
         future.schedule_at_rate(delay, duration, fn, *args, **kwargs)
         return future
 
     def shutdown(self, wait=False):
+        if self.__ready:
+            self.log_statistics()
         self.__ready = False
-        self.__executor.shutdown(wait=wait)
+        self.__scheduler.shutdown()
+        for executor in self.__executors.values():
+            executor.shutdown(wait=wait)
@@ -4,9 +4,9 @@ import atexit
 import logging
 import signal
 from abc import ABC, abstractmethod
-from typing import List, Any, Callable, Type
+from typing import List, Any, Callable, Dict, Type
 from media_player_config import MediaPlayerConfig
-from canvas_grid import CanvasGridRenderer
+from canvas_grid import CanvasGridRenderer, PadKey
 from id_threading_utils import Executor
 from PIL import Image
 
@@ -33,9 +33,20 @@ CODE_VOL: int = 0x19
 CODE_CH: int = 0x1C
 CODE_SEARCH: int = 0xA0
 CODE_TEXT: int = 0xA1
+# Answered by the controllers to keep the connections alive, never dispatched
+CODE_PING: int = 0xA2
+# Answered with the query byte followed by the state of the player in JSON
+CODE_STATUS: int = 0xA3
+# Start and stop the notifications of the changes of the state on the connection
+CODE_SUBSCRIBE: int = 0xA4
+CODE_UNSUBSCRIBE: int = 0xA5
 RESPONSE_ACK: bytes = bytes([0x06, 0x0A, 0x0D])
 RESPONSE_QRY: bytes = bytes([0x05, 0x0A, 0x0D])
 RESPONSE_NACK: bytes = bytes([0x15, 0x0A, 0x0D])
+# Event rejected because too many events are received, it can be sent again later
+RESPONSE_BUSY: bytes = bytes([0x16, 0x0A, 0x0D])
+# First byte of the notifications pushed to the subscribed remotes
+NOTIFICATION: int = 0x07
 CONTROLLER_EOM: bytes = bytes([0x0A, 0x0D])
 
 SOURCE_NOT_OPENED: str = 'Source not opened'
@@ -50,10 +61,15 @@ class RemoteControlEvent(object):
         self.__data: Any = data
         # noinspection PyTypeChecker
         self.__data_type: Type = None
+        # Number of identical events represented by this one when events are coalesced
+        self.__repeat: int = 1
 
     def get_code(self) -> int:
         return self.__code
 
+    def get_repeat(self) -> int:
+        return self.__repeat
+
     def get_data(self) -> Any:
         return self.__data
 
@@ -73,6 +89,9 @@ class RemoteControlEvent(object):
         self.__data = value
         self.__data_type = type(value)
 
+    def set_repeat(self, value: int) -> None:
+        self.__repeat = value
+
     def to_numeric(self) -> int:
         if self.is_numeric_data():
             return self.get_data()
@@ -81,6 +100,8 @@ class RemoteControlEvent(object):
         return 0
 
     def __str__(self):
+        if self.__repeat > 1:
+            return super().__str__() + ',' + str(self.__code) + ':' + str(self.__data) + ' x' + str(self.__repeat)
         return super().__str__() + ',' + str(self.__code) + ':' + str(self.__data)
 
 
@@ -155,6 +176,8 @@ class Media(object):
 
 
 MediaList = List[Media]
+# Handler of a command, it returns the response or None when the command is acknowledged
+CommandHandler = Callable[[RemoteControlEvent], Any]
 
 
 class ControllerListener(ABC):
@@ -172,6 +195,13 @@ class ControllerListener(ABC):
         """
         pass
 
+    def get_state_broadcaster(self) -> Any:
+        """
+        Return the broadcaster of the changes of the state used by the subscribed remotes.
+        :return: the broadcaster or None if notifications are not supported
+        """
+        return None
+
 
 class MediaPlayerController(ABC):
     def __init__(self, config: MediaPlayerConfig, listener: ControllerListener):
@@ -437,6 +467,15 @@ class MediaPlayerInterface:
         """
         pass
 
+    @abstractmethod
+    def send_pad_key(self, key: PadKey) -> None:
+        """
+        Send the key to the grid, it can be invoked from any thread
+        :param key: the key
+        :return:
+        """
+        pass
+
     @abstractmethod
     def set_grid_visible(self, flag: bool) -> None:
         """
@@ -544,6 +583,22 @@ class MediaSource:
         self._media_list: MediaList = list()
         # noinspection PyTypeChecker
         self._media: Media = None
+        self._commands: Dict[int, CommandHandler] = dict()
+
+    def get_commands(self) -> Dict[int, CommandHandler]:
+        """
+        Returns the handlers of the commands specific to the source
+        :return: the handlers by command code
+        """
+        return self._commands
+
+    def register_command(self, code: int, handler: CommandHandler) -> None:
+        """
+        Register the handler of a command specific to the source
+        :param code: the code of the command
+        :param handler: the handler
+        """
+        self._commands[code] = handler
 
     def get_interface(self) -> MediaPlayerInterface:
         return self._interface
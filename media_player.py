@@ -13,12 +13,15 @@ import sys
 import traceback
 
 from logging.handlers import RotatingFileHandler
-from media_player_config import MediaPlayerConfig
+from media_player_config import MediaPlayerConfig, ASYNC_CONTROLLER
 from media_player_interface import MediaPlayerInterface, MediaPlayerInterfaceImpl
 from media_player_tcp_server import MediaPlayerTcpController
+from media_player_async_server import MediaPlayerAsyncController
+from media_player_http_server import MediaPlayerHttpController
 from control_event_handler import ControlEventHandler
+from control_event_queue import ControlEventQueue
 from media_api import MediaPlayerController
-from id_threading_utils import Executor
+from id_threading_utils import Executor, LANE_INTERACTIVE, LANE_RENDER, LANE_NETWORK, LANE_BACKGROUND
 
 VERSION: str = '1.0'
 # noinspection PyTypeChecker
@@ -30,8 +33,12 @@ interface: MediaPlayerInterface = None
 # noinspection PyTypeChecker
 controller: MediaPlayerController = None
 # noinspection PyTypeChecker
+gateway: MediaPlayerController = None
+# noinspection PyTypeChecker
 event_dispatcher: ControlEventHandler = None
 # noinspection PyTypeChecker
+event_queue: ControlEventQueue = None
+# noinspection PyTypeChecker
 executor: Executor = None
 
 if platform.machine() not in ('armv7l', 'armv6l'):
@@ -96,6 +103,14 @@ def shutdown():
         except Exception as ex1:
             logger.error('Error when shutting down the controller: %s' % ex1, file=sys.stderr)
             logger.error(ex1)
+    if globals().get('gateway'):
+        try:
+            if gateway and gateway.is_running():
+                logger.info('Stopping gateway...')
+                gateway.stop()
+        except Exception as ex5:
+            logger.error('Error when shutting down the gateway: %s' % ex5, file=sys.stderr)
+            logger.error(ex5)
     if globals().get('interface'):
         try:
             if interface and interface.is_running():
@@ -114,7 +129,7 @@ def configure():
     Configure the application by creating the logger, the authentication cache, registering the signal hooks.
     :return:
     """
-    global CONFIG_PATH, config, logger, interface, controller, event_dispatcher, executor
+    global CONFIG_PATH, config, logger, interface, controller, gateway, event_dispatcher, event_queue, executor
     config = MediaPlayerConfig()
     config.read(CONFIG_PATH)
     # noinspection PyUnresolvedReferences
@@ -125,7 +140,14 @@ def configure():
     atexit.register(shutdown)
     signal.signal(signal.SIGINT, shutdown)
     signal.signal(signal.SIGTERM, shutdown)
-    executor = Executor(logger, max_workers=2, thread_name_prefix='MediaPlayer')
+    # Interactive tasks must not wait for the rendering of the cells or the network requests
+    executor = Executor(logger, max_workers=2, thread_name_prefix='MediaPlayer', lanes={
+        LANE_INTERACTIVE: config.get_interactive_workers(),
+        LANE_RENDER: config.get_render_workers(),
+        LANE_NETWORK: config.get_network_workers(),
+        LANE_BACKGROUND: config.get_background_workers()
+    })
+    executor.log_statistics_at_rate(config.get_statistics_interval())
     try:
         interface = MediaPlayerInterfaceImpl(logger, config, executor)
     except Exception as ex4:
@@ -135,8 +157,16 @@ def configure():
         sys.exit(1)
     try:
         event_dispatcher = ControlEventHandler(logger, config, interface, executor)
-        controller = MediaPlayerTcpController(logger, config, event_dispatcher)
+        # Events are acknowledged when queued, slow processing does not delay the responses to the remotes
+        event_queue = ControlEventQueue(logger, config, event_dispatcher)
+        if config.get_controller() == ASYNC_CONTROLLER:
+            controller = MediaPlayerAsyncController(logger, config, event_queue)
+        else:
+            controller = MediaPlayerTcpController(logger, config, event_queue)
         event_dispatcher.set_controller(controller)
+        if config.get_http_port() > 0:
+            # The gateway shares the queue and the rate limits with the controller, the remotes can use any of them
+            gateway = MediaPlayerHttpController(logger, config, event_queue, controller.get_rate_limiter())
     except Exception as ex3:
         exc_type3, exc_value3, exc_traceback3 = sys.exc_info()
         traceback.print_tb(exc_traceback3, limit=6, file=sys.stderr)
@@ -151,6 +181,8 @@ if __name__ == '__main__':
     try:
         if controller:
             controller.start()
+        if gateway:
+            gateway.start()
         interface.start()
     except TypeError as ex:
         exc_type, exc_value, exc_traceback = sys.exc_info()
@@ -0,0 +1,331 @@
+#!/usr/bin/python
+# -*- coding: utf-*-
+# Media player asyncio server
+
+import asyncio
+import atexit
+import logging
+import signal
+import sys
+import threading
+import time
+import traceback
+
+from typing import Any, List, Tuple
+
+import media_api
+from media_player_config import MediaPlayerConfig
+from media_api import MediaPlayerController, ControllerListener, RemoteControlEvent
+from media_player_state import Subscription
+from media_player_protocol import DEFAULT_BUFFER_SIZE, PROTOCOL_V2, ConnectionRegistry, ConnectionStatistics, FrameParser, RateLimiter, create_parser, is_ping, set_keep_alive
+
+# Size of the data waiting to be sent above which notifications are kept by the subscriptions
+PUSH_BUFFER_LIMIT: int = 65536
+PUSH_RETRY_DELAY: float = 0.2
+
+
+class MediaPlayerAsyncController(MediaPlayerController):
+    __logger: logging.Logger = None
+
+    def __init__(self, parent_logger: logging.Logger, config: MediaPlayerConfig, listener: ControllerListener):
+        """
+        Initialize the media player controller.
+        :param parent_logger: the main logger
+        :param config: the configuration object
+        """
+        super().__init__(config, listener)
+        if not MediaPlayerAsyncController.__logger:
+            MediaPlayerAsyncController.__logger = logging.getLogger(self.__class__.__name__)
+            for handler in parent_logger.handlers:
+                MediaPlayerAsyncController.__logger.addHandler(handler)
+            MediaPlayerAsyncController.__logger.setLevel(parent_logger.level)
+        MediaPlayerAsyncController.__logger.info('Initializing %s', self.__class__.__name__)
+        # Status flags
+        self.__active: bool = False
+        # Locks
+        self.__lock: threading.RLock = threading.RLock()
+        self.__start_lock: threading.RLock = threading.RLock()
+        self.__stop_lock: threading.RLock = threading.RLock()
+        # Tasks
+        # noinspection PyTypeChecker
+        self.__main_task: threading.Thread = None
+        # Hooks
+        atexit.register(self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        # noinspection PyTypeChecker
+        self.__loop: asyncio.AbstractEventLoop = None
+        # noinspection PyTypeChecker
+        self.__server: asyncio.AbstractServer = None
+        # noinspection PyTypeChecker
+        self.__connections: ConnectionRegistry = None
+        # Created once to be shared with the other controllers and kept when restarting
+        self.__rate_limiter: RateLimiter = RateLimiter(self._config.get_tcp_client_rate(), self._config.get_tcp_client_burst(), self._config.get_tcp_global_rate(), self._config.get_tcp_global_burst())
+
+    def get_rate_limiter(self) -> RateLimiter:
+        return self.__rate_limiter
+
+    def __dispatch(self, events: List[Any]) -> List[bytes]:
+        result: List[bytes] = list()
+        for event in events:
+            if isinstance(event, bytes):
+                result.append(event)
+                continue
+            response: bytes = media_api.RESPONSE_NACK
+            # noinspection PyBroadException
+            try:
+                if self._listener:
+                    MediaPlayerAsyncController.__logger.debug('Dispatching control event: %s', event)
+                    response = self._listener.on_control_event(event)
+                else:
+                    MediaPlayerAsyncController.__logger.warning('No listener, control event not processed')
+            except Exception as ex:
+                MediaPlayerAsyncController.__logger.error('Error: %s' % ex)
+                exc_type, exc_value, exc_traceback = sys.exc_info()
+                traceback.print_tb(exc_traceback, limit=6, file=sys.stderr)
+                MediaPlayerAsyncController.__logger.error(ex)
+            if not response:
+                response = media_api.RESPONSE_NACK
+            result.append(response)
+        return result
+
+    def __wake(self, wake: asyncio.Event) -> None:
+        loop: asyncio.AbstractEventLoop = self.__loop
+        try:
+            if loop and not loop.is_closed():
+                loop.call_soon_threadsafe(wake.set)
+        except RuntimeError:
+            # The loop has been closed meanwhile
+            pass
+
+    def __subscribe(self, writer: asyncio.StreamWriter, parser: FrameParser, address: str) -> Subscription:
+        broadcaster = self._listener.get_state_broadcaster() if self._listener else None
+        if not broadcaster:
+            MediaPlayerAsyncController.__logger.warning('Notifications not supported by the listener')
+            return None
+        MediaPlayerAsyncController.__logger.debug('Subscription of: %s', address)
+        wake: asyncio.Event = asyncio.Event()
+        result: Subscription = broadcaster.subscribe(self._config.get_subscription_buffer_size(), lambda: self.__wake(wake))
+        asyncio.ensure_future(self.__push(result, wake, writer, parser, address))
+        return result
+
+    def __unsubscribe(self, subscription: Subscription, address: str) -> None:
+        if not subscription:
+            return
+        MediaPlayerAsyncController.__logger.debug('End of subscription of: %s', address)
+        broadcaster = self._listener.get_state_broadcaster() if self._listener else None
+        if broadcaster:
+            broadcaster.unsubscribe(subscription)
+        else:
+            subscription.close()
+
+    async def __push(self, subscription: Subscription, wake: asyncio.Event, writer: asyncio.StreamWriter, parser: FrameParser, address: str) -> None:
+        while subscription.is_active() and not writer.is_closing():
+            await wake.wait()
+            wake.clear()
+            # A slow remote does not make the data to send grow, the notifications are dropped by its subscription when it is full
+            if writer.transport.get_write_buffer_size() > PUSH_BUFFER_LIMIT:
+                await asyncio.sleep(PUSH_RETRY_DELAY)
+                wake.set()
+                continue
+            notifications: List[bytes] = subscription.poll()
+            if len(notifications) > 0 and not writer.is_closing():
+                writer.write(b''.join(parser.encode(0, notification) for notification in notifications))
+                # A remote receiving notifications is active even if it does not send anything
+                self.__connections.touch(writer)
+        if subscription.get_dropped_count() > 0:
+            MediaPlayerAsyncController.__logger.info('Notifications dropped for: %s: %s', address, subscription.get_dropped_count())
+
+    async def __handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        address: str = writer.get_extra_info('peername')[0]
+        # noinspection PyBroadException
+        try:
+            set_keep_alive(writer.get_extra_info('socket'), self._config.get_tcp_keep_alive())
+        except Exception as ex:
+            MediaPlayerAsyncController.__logger.warning('Cannot configure the connection with: %s: %s', address, ex)
+        evicted: asyncio.StreamWriter = self.__connections.add(writer)
+        if evicted:
+            MediaPlayerAsyncController.__logger.warning('Limit reached: %s, closing the connection idle for the longest time', self._config.get_tcp_max_connections())
+            evicted.close()
+        MediaPlayerAsyncController.__logger.debug('Connection started with: %s (%s active)', address, self.__connections.get_count())
+        idle_timeout: int = self._config.get_tcp_idle_timeout()
+        # The parser is created when the version of the protocol is known
+        # noinspection PyTypeChecker
+        parser: FrameParser = None
+        statistics: ConnectionStatistics = ConnectionStatistics()
+        # noinspection PyTypeChecker
+        pending: asyncio.Future = None
+        # noinspection PyTypeChecker
+        subscription: Subscription = None
+        try:
+            while self.__active:
+                try:
+                    data: bytes = await asyncio.wait_for(reader.read(DEFAULT_BUFFER_SIZE), idle_timeout if idle_timeout > 0 else None)
+                except asyncio.TimeoutError:
+                    if subscription:
+                        # The subscribed remotes only receive data
+                        continue
+                    MediaPlayerAsyncController.__logger.info('Closing idle connection with: %s', address)
+                    return
+                if not data:
+                    MediaPlayerAsyncController.__logger.debug('Client connection closed')
+                    return
+                received: float = time.perf_counter()
+                self.__connections.touch(writer)
+                if not parser:
+                    parser, used = create_parser(data)
+                    if used > 0:
+                        writer.write(bytes([PROTOCOL_V2]))
+                        data = data[used:]
+                        MediaPlayerAsyncController.__logger.debug('Binary frames used by: %s', address)
+                try:
+                    parser.feed(data)
+                    frames: List[memoryview] = parser.frames()
+                except ValueError as ex:
+                    MediaPlayerAsyncController.__logger.warning('Invalid data received from %s: %s', address, ex)
+                    writer.write(parser.encode(0, media_api.RESPONSE_NACK))
+                    await writer.drain()
+                    continue
+                # Frames answered without being dispatched are associated to their responses instead of their events
+                items: List[Tuple[int, Any]] = list()
+                for frame in frames:
+                    request_id: int = parser.get_request_id(frame)
+                    # noinspection PyBroadException
+                    try:
+                        request_id, event = parser.decode(frame)
+                        MediaPlayerAsyncController.__logger.debug('Control event received from %s: %s', address, event)
+                        if is_ping(event):
+                            items.append((request_id, media_api.RESPONSE_ACK))
+                        elif event.get_code() == media_api.CODE_SUBSCRIBE:
+                            if not subscription:
+                                subscription = self.__subscribe(writer, parser, address)
+                            items.append((request_id, media_api.RESPONSE_ACK if subscription else media_api.RESPONSE_NACK))
+                        elif event.get_code() == media_api.CODE_UNSUBSCRIBE:
+                            self.__unsubscribe(subscription, address)
+                            subscription = None
+                            items.append((request_id, media_api.RESPONSE_ACK))
+                        elif self.__rate_limiter.acquire(address):
+                            items.append((request_id, event))
+                        else:
+                            MediaPlayerAsyncController.__logger.debug('Too many events received from %s, control event rejected: %s', address, event)
+                            items.append((request_id, media_api.RESPONSE_BUSY))
+                            statistics.add_throttled()
+                    except Exception as ex:
+                        MediaPlayerAsyncController.__logger.warning('Invalid frame received from %s: %s', address, ex)
+                        items.append((request_id, media_api.RESPONSE_NACK))
+                if len(items) == 0:
+                    continue
+                if parser.is_binary():
+                    # Responses are identified by the requests, the ones not requiring a dispatch are sent immediately
+                    # and the next frames are read while the events are dispatched
+                    immediate: List[bytes] = [parser.encode(request_id, item) for request_id, item in items if isinstance(item, bytes)]
+                    events: List[Tuple[int, RemoteControlEvent]] = [(request_id, item) for request_id, item in items if not isinstance(item, bytes)]
+                    if len(immediate) > 0:
+                        writer.write(b''.join(immediate))
+                        statistics.record(received, len(immediate))
+                    if len(events) > 0:
+                        pending = asyncio.ensure_future(self.__dispatch_after(pending, writer, parser, events, received, statistics))
+                else:
+                    # All the frames received in a single read are dispatched in order and answered with a single write
+                    responses: List[Any] = [item for request_id, item in items]
+                    if any(isinstance(item, RemoteControlEvent) for item in responses):
+                        # The listener is blocking, it must not be invoked on the thread of the event loop
+                        responses = await self.__loop.run_in_executor(None, self.__dispatch, responses)
+                    MediaPlayerAsyncController.__logger.debug('Sending %s response(s): %s', len(responses), responses)
+                    writer.write(b''.join(responses))
+                    MediaPlayerAsyncController.__logger.debug('Events processed for %s in %.2f ms', address, statistics.record(received, len(responses)))
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            MediaPlayerAsyncController.__logger.debug('Client connection closed')
+        finally:
+            self.__unsubscribe(subscription, address)
+            self.__connections.remove(writer)
+            writer.close()
+            if statistics.get_events_count() > 0:
+                MediaPlayerAsyncController.__logger.info('Connection closed with: %s, %s', address, statistics)
+
+    async def __dispatch_after(self, previous: asyncio.Future, writer: asyncio.StreamWriter, parser: FrameParser, events: List[Tuple[int, RemoteControlEvent]], received: float, statistics: ConnectionStatistics) -> None:
+        # The events received before are dispatched first to keep the order of the commands
+        if previous:
+            await previous
+        # The listener is blocking, it must not be invoked on the thread of the event loop
+        responses: List[bytes] = await self.__loop.run_in_executor(None, self.__dispatch, [event for request_id, event in events])
+        if writer.is_closing():
+            return
+        writer.write(b''.join(parser.encode(events[i][0], responses[i]) for i in range(len(events))))
+        MediaPlayerAsyncController.__logger.debug('Events processed in %.2f ms', statistics.record(received, len(responses)))
+
+    async def __serve(self) -> None:
+        self.__loop = asyncio.get_running_loop()
+        self.__connections = ConnectionRegistry(self._config.get_tcp_max_connections())
+        self.__server = await asyncio.start_server(self.__handle_connection, '0.0.0.0', self._config.get_tcp_port(), backlog=max(5, self._config.get_tcp_max_connections()))
+        if not self.__active:
+            # Stop requested before the server was ready, the close scheduled by stop may have been missed
+            MediaPlayerAsyncController.__logger.debug('Stop requested during startup')
+            self.__close_server()
+            return
+        async with self.__server:
+            await self.__server.serve_forever()
+
+    def __close_server(self) -> None:
+        if self.__server:
+            self.__server.close()
+        for writer in self.__connections.get_connections():
+            writer.close()
+
+    def __main(self):
+        MediaPlayerAsyncController.__logger.info('Starting on port: %s', self._config.get_tcp_port())
+        try:
+            asyncio.run(self.__serve())
+        except asyncio.CancelledError:
+            MediaPlayerAsyncController.__logger.debug('Server closed')
+        except Exception as ex:
+            MediaPlayerAsyncController.__logger.error('Error: %s' % ex)
+            exc_type, exc_value, exc_traceback = sys.exc_info()
+            traceback.print_tb(exc_traceback, limit=6, file=sys.stderr)
+            MediaPlayerAsyncController.__logger.error(ex)
+        finally:
+            self.__server = None
+            self.__loop = None
+            self.__active = False
+            MediaPlayerAsyncController.__logger.info('Stopped, events accepted: %s, throttled: %s', self.__rate_limiter.get_accepted_count(), self.__rate_limiter.get_throttled_count())
+
+    def is_running(self) -> bool:
+        return self.__active
+
+    def start(self) -> None:
+        with self.__lock:
+            if self.__active:
+                return
+        with self.__start_lock:
+            MediaPlayerAsyncController.__logger.debug('Starting...')
+            self.__active = True
+            self.__main_task = threading.Thread(target=self.__main, name=self.__class__.__name__)
+            self.__main_task.start()
+            MediaPlayerAsyncController.__logger.debug('Started (%s)', self.__active)
+
+    def stop(self) -> None:
+        with self.__lock:
+            if not self.__active:
+                return
+        with self.__stop_lock:
+            MediaPlayerAsyncController.__logger.debug('Stopping...')
+            self.__active = False
+            try:
+                loop: asyncio.AbstractEventLoop = self.__loop
+                if loop and not loop.is_closed():
+                    # Closing the server ends serve_forever immediately, no polling is required
+                    loop.call_soon_threadsafe(self.__close_server)
+                self.__main_task = None
+            except Exception as ex:
+                MediaPlayerAsyncController.__logger.error('Cannot stop main task: %s' % ex)
+                exc_type, exc_value, exc_traceback = sys.exc_info()
+                traceback.print_tb(exc_traceback, limit=6, file=sys.stderr)
+                MediaPlayerAsyncController.__logger.error(ex)
+            finally:
+                if self._listener:
+                    self._listener.on_controller_stop()
+
+    def restart(self):
+        self.stop()
+        time.sleep(1)
+        self.start()
@@ -0,0 +1,236 @@
+#! /usr/bin/python3
+# -*- coding: utf-*-
+# Load generator measuring the latency of the control protocol
+import argparse
+import logging
+import signal
+import socket
+import sys
+import threading
+import time
+
+from typing import Dict, List, Tuple
+
+import media_api
+from media_api import ControllerListener, MediaPlayerController, RemoteControlEvent
+from media_player_config import MediaPlayerConfig, ASYNC_CONTROLLER, TCP_CONTROLLER
+from media_player_async_server import MediaPlayerAsyncController
+from media_player_tcp_server import MediaPlayerTcpController
+from media_player_protocol import FRAME_SEPARATOR, PAYLOAD_NONE, PAYLOAD_TEXT, PROTOCOL_V2, V2_HEADER, V2_LENGTH
+
+DEFAULT_PORT: int = 20160
+CONNECT_TIMEOUT: int = 5
+RESPONSE_LENGTH: int = len(media_api.RESPONSE_ACK)
+RESPONSE_NAMES: Dict[bytes, str] = {
+    media_api.RESPONSE_ACK: 'ACK',
+    media_api.RESPONSE_NACK: 'NACK',
+    media_api.RESPONSE_QRY: 'QRY',
+    media_api.RESPONSE_BUSY: 'BUSY'
+}
+# Traces are lists of frames and delays in seconds to wait after the response
+TRACES: Dict[str, List[Tuple[bytes, float]]] = {
+    # Channel number typed digit by digit
+    'digits': [(b'1', 0.2), (b'2', 0.2), (b'5', 0.5)],
+    # Volume key kept pressed, remotes repeat the key every 50 ms
+    'volume': [(bytes([media_api.CODE_VOL_UP]), 0.05)] * 10 + [(bytes([media_api.CODE_VOL_DOWN]), 0.05)] * 5,
+    # Selection of another source in the grid
+    'source': [(bytes([media_api.CODE_SOURCE]), 0.3), (bytes([media_api.CODE_RIGHT]), 0.15), (bytes([media_api.CODE_DOWN]), 0.15), (bytes([media_api.CODE_OK]), 0.5)]
+}
+# noinspection PyTypeChecker
+controller: MediaPlayerController = None
+
+
+class StubListener(ControllerListener):
+    def __init__(self, delay: float):
+        """
+        Initialize the listener acknowledging all the events.
+        :param delay: the processing time in seconds simulated for each event
+        """
+        super().__init__()
+        self.__delay: float = delay
+
+    def on_controller_stop(self) -> None:
+        pass
+
+    def on_control_event(self, event: RemoteControlEvent) -> bytes:
+        if self.__delay > 0:
+            time.sleep(self.__delay)
+        return media_api.RESPONSE_ACK
+
+
+class Client(threading.Thread):
+    def __init__(self, host: str, port: int, trace: List[Tuple[bytes, float]], iterations: int, speed: float, binary: bool):
+        """
+        Initialize the client replaying the trace.
+        :param host: the address of the player
+        :param port: the port of the controller
+        :param trace: the frames to send and the delays following them
+        :param iterations: the number of times the trace is replayed
+        :param speed: the factor applied to the delays of the trace, 0 to send the frames without waiting
+        :param binary: true to use the binary frames (version 2 of the protocol)
+        """
+        super().__init__(daemon=True)
+        self.__host: str = host
+        self.__port: int = port
+        self.__trace: List[Tuple[bytes, float]] = trace
+        self.__iterations: int = iterations
+        self.__speed: float = speed
+        self.__binary: bool = binary
+        self.latencies: List[float] = list()
+        self.responses: Dict[str, int] = dict()
+        self.errors: int = 0
+
+    @staticmethod
+    def __receive(sock: socket.socket, length: int) -> bytes:
+        result: bytes = b''
+        while len(result) < length:
+            data: bytes = sock.recv(length - len(result))
+            if not data:
+                raise ConnectionError('Connection closed by the player')
+            result = result + data
+        return result
+
+    def __encode(self, frame: bytes, request_id: int) -> bytes:
+        if not self.__binary:
+            return frame + FRAME_SEPARATOR
+        # The frames of the traces are made of the code and an optional text
+        payload: bytes = frame[1:]
+        if len(frame) == 1 and 0x20 <= frame[0] <= 0x7E:
+            payload = frame
+        return V2_HEADER.pack(V2_HEADER.size - V2_LENGTH.size + len(payload), request_id, frame[0], PAYLOAD_TEXT if len(payload) > 0 else PAYLOAD_NONE) + payload
+
+    def __receive_response(self, sock: socket.socket, request_id: int) -> bytes:
+        if not self.__binary:
+            return Client.__receive(sock, RESPONSE_LENGTH)
+        data: bytes = Client.__receive(sock, V2_LENGTH.size)
+        data = data + Client.__receive(sock, V2_LENGTH.unpack(data)[0])
+        if V2_HEADER.unpack_from(data)[1] != request_id:
+            raise ValueError('Unexpected response identifier: %s' % V2_HEADER.unpack_from(data)[1])
+        # The status is converted to the legacy response to be counted
+        return bytes([data[V2_HEADER.size - 2]]) + media_api.CONTROLLER_EOM
+
+    def run(self) -> None:
+        try:
+            with socket.create_connection((self.__host, self.__port), timeout=CONNECT_TIMEOUT) as sock:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                if self.__binary:
+                    sock.sendall(bytes([PROTOCOL_V2]))
+                    if Client.__receive(sock, 1)[0] != PROTOCOL_V2:
+                        raise ValueError('Binary frames not supported by the player')
+                request_id: int = 0
+                for i in range(self.__iterations):
+                    for frame, delay in self.__trace:
+                        request_id = (request_id + 1) % 65536
+                        start: float = time.perf_counter()
+                        sock.sendall(self.__encode(frame, request_id))
+                        response: bytes = self.__receive_response(sock, request_id)
+                        self.latencies.append((time.perf_counter() - start) * 1000)
+                        name: str = RESPONSE_NAMES.get(response, 'OTHER')
+                        self.responses[name] = self.responses.get(name, 0) + 1
+                        if delay * self.__speed > 0:
+                            time.sleep(delay * self.__speed)
+        except Exception as ex:
+            print('Client error: %s' % ex, file=sys.stderr)
+            self.errors = self.errors + 1
+
+
+def percentile(values: List[float], rank: float) -> float:
+    """
+    Return the percentile using the nearest rank method.
+    :param values: the sorted values
+    :param rank: the rank between 0 and 100
+    :return: the value
+    """
+    if len(values) == 0:
+        return 0
+    return values[max(0, min(len(values) - 1, int(round(rank / 100 * len(values) + 0.5)) - 1))]
+
+
+def start_controller(kind: str, port: int, listener: ControllerListener, rate_limit: bool) -> MediaPlayerController:
+    """
+    Start a controller on the local host.
+    :param kind: the type of controller (tcp, async)
+    :param port: the port
+    :param listener: the listener of the controller
+    :param rate_limit: true to keep the default limits of the events rate
+    :return: the controller
+    """
+    logger: logging.Logger = logging.getLogger('MediaPlayerBenchmark')
+    logger.addHandler(logging.StreamHandler())
+    logger.setLevel(logging.WARNING)
+    config: MediaPlayerConfig = MediaPlayerConfig()
+    config.set_tcp_port(port)
+    config.set_tcp_max_connections(1024)
+    if not rate_limit:
+        config.set_tcp_client_rate(0)
+        config.set_tcp_global_rate(0)
+    if kind == ASYNC_CONTROLLER:
+        result: MediaPlayerController = MediaPlayerAsyncController(logger, config, listener)
+    else:
+        result: MediaPlayerController = MediaPlayerTcpController(logger, config, listener)
+    result.start()
+    # Wait for the server to accept the connections
+    deadline: float = time.monotonic() + CONNECT_TIMEOUT
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return result
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError('Controller not started on port: %s' % port)
+
+
+# noinspection PyUnusedLocal
+def signal_handler(sig=None, frame=None):
+    if controller:
+        controller.stop()
+    print('Benchmark interrupted')
+    sys.exit(1)
+
+
+if __name__ == '__main__':
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='Measure the latency of the control protocol of the media player.')
+    parser.add_argument('--host', help='address of a running player, a local controller is started if not specified')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='port of the controller')
+    parser.add_argument('--controller', choices=[TCP_CONTROLLER, ASYNC_CONTROLLER], default=TCP_CONTROLLER, help='type of the local controller')
+    parser.add_argument('--clients', type=int, default=8, help='number of concurrent clients')
+    parser.add_argument('--iterations', type=int, default=10, help='number of times each client replays its trace')
+    parser.add_argument('--traces', default=','.join(TRACES.keys()), help='comma separated traces assigned to the clients in turn: ' + ', '.join(TRACES.keys()))
+    parser.add_argument('--speed', type=float, default=1, help='factor applied to the delays of the traces, 0 to send as fast as possible')
+    parser.add_argument('--delay', type=float, default=0, help='processing time in milliseconds simulated by the local listener')
+    parser.add_argument('--rate-limit', action='store_true', help='keep the rate limits of the local controller')
+    parser.add_argument('--binary', action='store_true', help='use the binary frames (version 2 of the protocol)')
+    args = parser.parse_args()
+    names: List[str] = [name.strip() for name in args.traces.split(',') if name.strip()]
+    for name in names:
+        if name not in TRACES:
+            parser.error('Unknown trace: %s' % name)
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+    host: str = args.host
+    stub: StubListener = StubListener(args.delay / 1000)
+    if not host:
+        host = '127.0.0.1'
+        controller = start_controller(args.controller, args.port, stub, args.rate_limit)
+    try:
+        clients: List[Client] = [Client(host, args.port, TRACES[names[i % len(names)]], args.iterations, args.speed, args.binary) for i in range(args.clients)]
+        started: float = time.perf_counter()
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        elapsed: float = time.perf_counter() - started
+    finally:
+        if controller:
+            controller.stop()
+    latencies: List[float] = sorted(latency for client in clients for latency in client.latencies)
+    responses: Dict[str, int] = dict()
+    for client in clients:
+        for name, count in client.responses.items():
+            responses[name] = responses.get(name, 0) + count
+    print('Clients: %s, traces: %s, iterations: %s, duration: %.2f s' % (args.clients, ', '.join(names), args.iterations, elapsed))
+    print('Events: %s, throughput: %.1f events/s, errors: %s' % (len(latencies), len(latencies) / elapsed if elapsed > 0 else 0, sum(client.errors for client in clients)))
+    print('Responses: %s' % ', '.join('%s: %s' % (name, count) for name, count in sorted(responses.items())))
+    if len(latencies) > 0:
+        print('Latency (ms): p50: %.3f, p95: %.3f, p99: %.3f, max: %.3f, average: %.3f' % (percentile(latencies, 50), percentile(latencies, 95), percentile(latencies, 99), latencies[-1], sum(latencies) / len(latencies)))
+    sys.exit(0)
@@ -11,10 +11,56 @@ from id_setting import Setting, Settings
 TIME_FORMAT: str = '%H:%M'
 TEMP_DIR_KEY: str = 'temp_dir'
 TCP_PORT_KEY: str = 'tcp_port'
+HTTP_PORT_KEY: str = 'http_port'
+HTTP_ALLOWED_ORIGINS_KEY: str = 'http_allowed_origins'
+TCP_MAX_CONNECTIONS_KEY: str = 'tcp_max_connections'
+TCP_IDLE_TIMEOUT_KEY: str = 'tcp_idle_timeout'
+TCP_KEEP_ALIVE_KEY: str = 'tcp_keep_alive'
+TCP_CLIENT_RATE_KEY: str = 'tcp_client_rate'
+TCP_CLIENT_BURST_KEY: str = 'tcp_client_burst'
+TCP_GLOBAL_RATE_KEY: str = 'tcp_global_rate'
+TCP_GLOBAL_BURST_KEY: str = 'tcp_global_burst'
+CONTROLLER_KEY: str = 'controller'
+EVENT_QUEUE_SIZE_KEY: str = 'event_queue_size'
+COALESCING_DELAY_KEY: str = 'coalescing_delay'
+SUBSCRIPTION_BUFFER_SIZE_KEY: str = 'subscription_buffer_size'
+INTERACTIVE_WORKERS_KEY: str = 'interactive_workers'
+RENDER_WORKERS_KEY: str = 'render_workers'
+NETWORK_WORKERS_KEY: str = 'network_workers'
+BACKGROUND_WORKERS_KEY: str = 'background_workers'
+STATISTICS_INTERVAL_KEY: str = 'statistics_interval'
+CELL_CACHE_SIZE_KEY: str = 'cell_cache_size'
+IMAGE_CACHE_SIZE_KEY: str = 'image_cache_size'
+PREFETCH_ROWS_KEY: str = 'prefetch_rows'
+SCROLL_DURATION_KEY: str = 'scroll_duration'
 LOG_LEVEL_KEY: str = 'log_level'
 TEST_KEY: str = 'test_enabled'
 DEFAULT_LOG_LEVEL: str = 'INFO'
 DEFAULT_TCP_PORT: int = 20060
+DEFAULT_HTTP_PORT: int = 0
+DEFAULT_HTTP_ALLOWED_ORIGINS: str = ''
+DEFAULT_TCP_MAX_CONNECTIONS: int = 16
+DEFAULT_TCP_IDLE_TIMEOUT: int = 300
+DEFAULT_TCP_KEEP_ALIVE: int = 60
+DEFAULT_TCP_CLIENT_RATE: int = 20
+DEFAULT_TCP_CLIENT_BURST: int = 20
+DEFAULT_TCP_GLOBAL_RATE: int = 50
+DEFAULT_TCP_GLOBAL_BURST: int = 100
+TCP_CONTROLLER: str = 'tcp'
+ASYNC_CONTROLLER: str = 'async'
+DEFAULT_CONTROLLER: str = TCP_CONTROLLER
+DEFAULT_EVENT_QUEUE_SIZE: int = 32
+DEFAULT_COALESCING_DELAY: int = 50
+DEFAULT_SUBSCRIPTION_BUFFER_SIZE: int = 16
+DEFAULT_INTERACTIVE_WORKERS: int = 2
+DEFAULT_RENDER_WORKERS: int = 2
+DEFAULT_NETWORK_WORKERS: int = 2
+DEFAULT_BACKGROUND_WORKERS: int = 1
+DEFAULT_STATISTICS_INTERVAL: int = 600
+DEFAULT_CELL_CACHE_SIZE: int = 32
+DEFAULT_IMAGE_CACHE_SIZE: int = 16
+DEFAULT_PREFETCH_ROWS: int = 1
+DEFAULT_SCROLL_DURATION: int = 120
 DEFAULT_TEMP_DIR: str = tempfile.gettempdir() + os.sep + 'Media_player'
 
 
@@ -31,6 +77,28 @@ class MediaPlayerConfig(object):
         self._settings: Settings = Settings()
         self._settings[TEMP_DIR_KEY]: Setting[str] = Setting(DEFAULT_TEMP_DIR)
         self._settings[TCP_PORT_KEY]: Setting[int] = Setting(DEFAULT_TCP_PORT, 1, 65535)
+        self._settings[HTTP_PORT_KEY]: Setting[int] = Setting(DEFAULT_HTTP_PORT, 0, 65535)
+        self._settings[HTTP_ALLOWED_ORIGINS_KEY]: Setting[str] = Setting(DEFAULT_HTTP_ALLOWED_ORIGINS)
+        self._settings[TCP_MAX_CONNECTIONS_KEY]: Setting[int] = Setting(DEFAULT_TCP_MAX_CONNECTIONS, 1, 1024)
+        self._settings[TCP_IDLE_TIMEOUT_KEY]: Setting[int] = Setting(DEFAULT_TCP_IDLE_TIMEOUT, 0, 86400)
+        self._settings[TCP_KEEP_ALIVE_KEY]: Setting[int] = Setting(DEFAULT_TCP_KEEP_ALIVE, 0, 3600)
+        self._settings[TCP_CLIENT_RATE_KEY]: Setting[int] = Setting(DEFAULT_TCP_CLIENT_RATE, 0, 1000)
+        self._settings[TCP_CLIENT_BURST_KEY]: Setting[int] = Setting(DEFAULT_TCP_CLIENT_BURST, 1, 1000)
+        self._settings[TCP_GLOBAL_RATE_KEY]: Setting[int] = Setting(DEFAULT_TCP_GLOBAL_RATE, 0, 10000)
+        self._settings[TCP_GLOBAL_BURST_KEY]: Setting[int] = Setting(DEFAULT_TCP_GLOBAL_BURST, 1, 10000)
+        self._settings[CONTROLLER_KEY]: Setting[str] = Setting(DEFAULT_CONTROLLER)
+        self._settings[EVENT_QUEUE_SIZE_KEY]: Setting[int] = Setting(DEFAULT_EVENT_QUEUE_SIZE, 1, 1024)
+        self._settings[COALESCING_DELAY_KEY]: Setting[int] = Setting(DEFAULT_COALESCING_DELAY, 0, 1000)
+        self._settings[SUBSCRIPTION_BUFFER_SIZE_KEY]: Setting[int] = Setting(DEFAULT_SUBSCRIPTION_BUFFER_SIZE, 1, 1024)
+        self._settings[INTERACTIVE_WORKERS_KEY]: Setting[int] = Setting(DEFAULT_INTERACTIVE_WORKERS, 1, 16)
+        self._settings[RENDER_WORKERS_KEY]: Setting[int] = Setting(DEFAULT_RENDER_WORKERS, 1, 16)
+        self._settings[NETWORK_WORKERS_KEY]: Setting[int] = Setting(DEFAULT_NETWORK_WORKERS, 1, 16)
+        self._settings[BACKGROUND_WORKERS_KEY]: Setting[int] = Setting(DEFAULT_BACKGROUND_WORKERS, 1, 16)
+        self._settings[STATISTICS_INTERVAL_KEY]: Setting[int] = Setting(DEFAULT_STATISTICS_INTERVAL, 0, 86400)
+        self._settings[CELL_CACHE_SIZE_KEY]: Setting[int] = Setting(DEFAULT_CELL_CACHE_SIZE, 0, 1024)
+        self._settings[IMAGE_CACHE_SIZE_KEY]: Setting[int] = Setting(DEFAULT_IMAGE_CACHE_SIZE, 0, 1024)
+        self._settings[PREFETCH_ROWS_KEY]: Setting[int] = Setting(DEFAULT_PREFETCH_ROWS, 0, 16)
+        self._settings[SCROLL_DURATION_KEY]: Setting[int] = Setting(DEFAULT_SCROLL_DURATION, 0, 1000)
         self._settings[LOG_LEVEL_KEY]: Setting[str] = Setting(DEFAULT_LOG_LEVEL)
         self._settings[TEST_KEY]: Setting[bool] = Setting(False)
 
@@ -40,6 +108,28 @@ class MediaPlayerConfig(object):
         r._settings = self._settings.clone()
         r._settings[TEMP_DIR_KEY]: Setting[str] = self._settings[TEMP_DIR_KEY].clone()
         r._settings[TCP_PORT_KEY]: Setting[int] = self._settings[TCP_PORT_KEY].clone()
+        r._settings[HTTP_PORT_KEY]: Setting[int] = self._settings[HTTP_PORT_KEY].clone()
+        r._settings[HTTP_ALLOWED_ORIGINS_KEY]: Setting[str] = self._settings[HTTP_ALLOWED_ORIGINS_KEY].clone()
+        r._settings[TCP_MAX_CONNECTIONS_KEY]: Setting[int] = self._settings[TCP_MAX_CONNECTIONS_KEY].clone()
+        r._settings[TCP_IDLE_TIMEOUT_KEY]: Setting[int] = self._settings[TCP_IDLE_TIMEOUT_KEY].clone()
+        r._settings[TCP_KEEP_ALIVE_KEY]: Setting[int] = self._settings[TCP_KEEP_ALIVE_KEY].clone()
+        r._settings[TCP_CLIENT_RATE_KEY]: Setting[int] = self._settings[TCP_CLIENT_RATE_KEY].clone()
+        r._settings[TCP_CLIENT_BURST_KEY]: Setting[int] = self._settings[TCP_CLIENT_BURST_KEY].clone()
+        r._settings[TCP_GLOBAL_RATE_KEY]: Setting[int] = self._settings[TCP_GLOBAL_RATE_KEY].clone()
+        r._settings[TCP_GLOBAL_BURST_KEY]: Setting[int] = self._settings[TCP_GLOBAL_BURST_KEY].clone()
+        r._settings[CONTROLLER_KEY]: Setting[str] = self._settings[CONTROLLER_KEY].clone()
+        r._settings[EVENT_QUEUE_SIZE_KEY]: Setting[int] = self._settings[EVENT_QUEUE_SIZE_KEY].clone()
+        r._settings[COALESCING_DELAY_KEY]: Setting[int] = self._settings[COALESCING_DELAY_KEY].clone()
+        r._settings[SUBSCRIPTION_BUFFER_SIZE_KEY]: Setting[int] = self._settings[SUBSCRIPTION_BUFFER_SIZE_KEY].clone()
+        r._settings[INTERACTIVE_WORKERS_KEY]: Setting[int] = self._settings[INTERACTIVE_WORKERS_KEY].clone()
+        r._settings[RENDER_WORKERS_KEY]: Setting[int] = self._settings[RENDER_WORKERS_KEY].clone()
+        r._settings[NETWORK_WORKERS_KEY]: Setting[int] = self._settings[NETWORK_WORKERS_KEY].clone()
+        r._settings[BACKGROUND_WORKERS_KEY]: Setting[int] = self._settings[BACKGROUND_WORKERS_KEY].clone()
+        r._settings[STATISTICS_INTERVAL_KEY]: Setting[int] = self._settings[STATISTICS_INTERVAL_KEY].clone()
+        r._settings[CELL_CACHE_SIZE_KEY]: Setting[int] = self._settings[CELL_CACHE_SIZE_KEY].clone()
+        r._settings[IMAGE_CACHE_SIZE_KEY]: Setting[int] = self._settings[IMAGE_CACHE_SIZE_KEY].clone()
+        r._settings[PREFETCH_ROWS_KEY]: Setting[int] = self._settings[PREFETCH_ROWS_KEY].clone()
+        r._settings[SCROLL_DURATION_KEY]: Setting[int] = self._settings[SCROLL_DURATION_KEY].clone()
         r._settings[LOG_LEVEL_KEY]: Setting[str] = self._settings[LOG_LEVEL_KEY].clone()
         r._settings[TEST_KEY]: Setting[bool] = self._settings[TEST_KEY].clone()
         return r
@@ -65,6 +155,160 @@ class MediaPlayerConfig(object):
         """
         return self._settings[TCP_PORT_KEY].get_value()
 
+    def get_http_port(self) -> int:
+        """
+        Return the TCP port of the HTTP and WebSocket gateway.
+        :return: the TCP port, 0 if the gateway is disabled
+        """
+        return self._settings[HTTP_PORT_KEY].get_value()
+
+    def get_http_allowed_origins(self) -> str:
+        """
+        Return the origins of the web pages allowed to use the HTTP and WebSocket gateway, separated by commas.
+        :return: the origins like http://host:port, empty if no web page is allowed
+        """
+        return self._settings[HTTP_ALLOWED_ORIGINS_KEY].get_value()
+
+    def get_tcp_max_connections(self) -> int:
+        """
+        Return the maximum number of simultaneous connections accepted by the controller.
+        :return: the maximum number of connections
+        """
+        return self._settings[TCP_MAX_CONNECTIONS_KEY].get_value()
+
+    def get_tcp_idle_timeout(self) -> int:
+        """
+        Return the delay in seconds after which an idle connection is closed.
+        :return: the delay in seconds, 0 if idle connections are never closed
+        """
+        return self._settings[TCP_IDLE_TIMEOUT_KEY].get_value()
+
+    def get_tcp_keep_alive(self) -> int:
+        """
+        Return the delay in seconds of inactivity before the keep-alive probes are sent on the connections.
+        :return: the delay in seconds, 0 if keep-alive is disabled
+        """
+        return self._settings[TCP_KEEP_ALIVE_KEY].get_value()
+
+    def get_tcp_client_rate(self) -> int:
+        """
+        Return the maximum number of control events per second accepted from a client.
+        :return: the number of events per second, 0 if not limited
+        """
+        return self._settings[TCP_CLIENT_RATE_KEY].get_value()
+
+    def get_tcp_client_burst(self) -> int:
+        """
+        Return the number of control events a client can send in a burst above its rate.
+        :return: the number of events
+        """
+        return self._settings[TCP_CLIENT_BURST_KEY].get_value()
+
+    def get_tcp_global_rate(self) -> int:
+        """
+        Return the maximum number of control events per second accepted from all the clients.
+        :return: the number of events per second, 0 if not limited
+        """
+        return self._settings[TCP_GLOBAL_RATE_KEY].get_value()
+
+    def get_tcp_global_burst(self) -> int:
+        """
+        Return the number of control events all the clients can send in a burst above the global rate.
+        :return: the number of events
+        """
+        return self._settings[TCP_GLOBAL_BURST_KEY].get_value()
+
+    def get_controller(self) -> str:
+        """
+        Return the type of controller (tcp, async)
+        :return: the type of controller
+        """
+        return self._settings[CONTROLLER_KEY].get_value()
+
+    def get_event_queue_size(self) -> int:
+        """
+        Return the maximum number of control events waiting to be dispatched.
+        :return: the size of the queue
+        """
+        return self._settings[EVENT_QUEUE_SIZE_KEY].get_value()
+
+    def get_coalescing_delay(self) -> int:
+        """
+        Return the delay in milliseconds during which the volume and channel changes are accumulated before being applied.
+        :return: the delay in milliseconds, 0 if changes are applied immediately
+        """
+        return self._settings[COALESCING_DELAY_KEY].get_value()
+
+    def get_subscription_buffer_size(self) -> int:
+        """
+        Return the maximum number of notifications kept for a subscribed remote, the oldest ones are dropped when a remote is too slow.
+        :return: the number of notifications
+        """
+        return self._settings[SUBSCRIPTION_BUFFER_SIZE_KEY].get_value()
+
+    def get_interactive_workers(self) -> int:
+        """
+        Return the number of threads executing the interactive tasks (control events, timeouts of the digits).
+        :return: the number of threads
+        """
+        return self._settings[INTERACTIVE_WORKERS_KEY].get_value()
+
+    def get_render_workers(self) -> int:
+        """
+        Return the number of threads rendering the cells of the grid.
+        :return: the number of threads
+        """
+        return self._settings[RENDER_WORKERS_KEY].get_value()
+
+    def get_network_workers(self) -> int:
+        """
+        Return the number of threads executing the network requests of the sources.
+        :return: the number of threads
+        """
+        return self._settings[NETWORK_WORKERS_KEY].get_value()
+
+    def get_background_workers(self) -> int:
+        """
+        Return the number of threads executing the background tasks (refresh of the interface).
+        :return: the number of threads
+        """
+        return self._settings[BACKGROUND_WORKERS_KEY].get_value()
+
+    def get_statistics_interval(self) -> int:
+        """
+        Return the interval in seconds between the logs of the statistics of the executor.
+        :return: the interval in seconds, 0 if the statistics are not logged
+        """
+        return self._settings[STATISTICS_INTERVAL_KEY].get_value()
+
+    def get_cell_cache_size(self) -> int:
+        """
+        Return the maximum size in megabytes of the rendered images of the cells kept in memory.
+        :return: the size in megabytes, 0 if the images are not cached
+        """
+        return self._settings[CELL_CACHE_SIZE_KEY].get_value()
+
+    def get_image_cache_size(self) -> int:
+        """
+        Return the maximum size in megabytes of the decoded and scaled images of the files and URLs kept in memory.
+        :return: the size in megabytes, 0 if the images are not cached
+        """
+        return self._settings[IMAGE_CACHE_SIZE_KEY].get_value()
+
+    def get_prefetch_rows(self) -> int:
+        """
+        Return the number of rows rendered in advance above and below the visible rows of the grid.
+        :return: the number of rows, 0 if no row is rendered in advance
+        """
+        return self._settings[PREFETCH_ROWS_KEY].get_value()
+
+    def get_scroll_duration(self) -> int:
+        """
+        Return the duration in milliseconds of the scrolling animation of the grid, 0 to disable it.
+        :return: the duration in milliseconds
+        """
+        return self._settings[SCROLL_DURATION_KEY].get_value()
+
     def get_log_level(self) -> str:
         """
         Return the log level (debug, info, warning, error)
@@ -113,6 +357,226 @@ class MediaPlayerConfig(object):
             raise ValueError('Invalid TCP port: ' + str(value))
         self._settings[TCP_PORT_KEY].set_value(value)
 
+    def set_http_port(self, value: int) -> None:
+        """
+        Set the TCP port of the HTTP and WebSocket gateway.
+        :param value: the TCP port, 0 to disable the gateway
+        :return:
+        """
+        if value is None or value < 0:
+            raise ValueError('Invalid HTTP port: ' + str(value))
+        self._settings[HTTP_PORT_KEY].set_value(value)
+
+    def set_http_allowed_origins(self, value: str) -> None:
+        """
+        Set the origins of the web pages allowed to use the HTTP and WebSocket gateway, separated by commas.
+        :param value: the origins like http://host:port, empty if no web page is allowed
+        :return:
+        """
+        if value is None:
+            raise ValueError('Invalid allowed origins: ' + str(value))
+        self._settings[HTTP_ALLOWED_ORIGINS_KEY].set_value(value)
+
+    def set_tcp_max_connections(self, value: int) -> None:
+        """
+        Set the maximum number of simultaneous connections accepted by the controller.
+        :param value: the maximum number of connections
+        :return:
+        """
+        if value is None or value < 1:
+            raise ValueError('Invalid maximum number of connections: ' + str(value))
+        self._settings[TCP_MAX_CONNECTIONS_KEY].set_value(value)
+
+    def set_tcp_idle_timeout(self, value: int) -> None:
+        """
+        Set the delay in seconds after which an idle connection is closed.
+        :param value: the delay in seconds, 0 to never close idle connections
+        :return:
+        """
+        if value is None or value < 0:
+            raise ValueError('Invalid idle timeout: ' + str(value))
+        self._settings[TCP_IDLE_TIMEOUT_KEY].set_value(value)
+
+    def set_tcp_keep_alive(self, value: int) -> None:
+        """
+        Set the delay in seconds of inactivity before the keep-alive probes are sent on the connections.
+        :param value: the delay in seconds, 0 to disable keep-alive
+        :return:
+        """
+        if value is None or value < 0:
+            raise ValueError('Invalid keep-alive delay: ' + str(value))
+        self._settings[TCP_KEEP_ALIVE_KEY].set_value(value)
+
+    def set_tcp_client_rate(self, value: int) -> None:
+        """
+        Set the maximum number of control events per second accepted from a client.
+        :param value: the number of events per second, 0 to disable the limit
+        :return:
+        """
+        if value is None or value < 0:
+            raise ValueError('Invalid client rate: ' + str(value))
+        self._settings[TCP_CLIENT_RATE_KEY].set_value(value)
+
+    def set_tcp_client_burst(self, value: int) -> None:
+        """
+        Set the number of control events a client can send in a burst above its rate.
+        :param value: the number of events
+        :return:
+        """
+        if value is None or value < 1:
+            raise ValueError('Invalid client burst: ' + str(value))
+        self._settings[TCP_CLIENT_BURST_KEY].set_value(value)
+
+    def set_tcp_global_rate(self, value: int) -> None:
+        """
+        Set the maximum number of control events per second accepted from all the clients.
+        :param value: the number of events per second, 0 to disable the limit
+        :return:
+        """
+        if value is None or value < 0:
+            raise ValueError('Invalid global rate: ' + str(value))
+        self._settings[TCP_GLOBAL_RATE_KEY].set_value(value)
+
+    def set_tcp_global_burst(self, value: int) -> None:
+        """
+        Set the number of control events all the clients can send in a burst above the global rate.
+        :param value: the number of events
+        :return:
+        """
+        if value is None or value < 1:
+            raise ValueError('Invalid global burst: ' + str(value))
+        self._settings[TCP_GLOBAL_BURST_KEY].set_value(value)
+
+    def set_controller(self, value: str) -> None:
+        """
+        Set the type of controller (tcp, async)
+        :param value: the type of controller
+        :return:
+        """
+        if not (value == TCP_CONTROLLER or value == ASYNC_CONTROLLER):
+            raise ValueError('Invalid controller: ' + str(value))
+        self._settings[CONTROLLER_KEY].set_value(value)
+
+    def set_event_queue_size(self, value: int) -> None:
+        """
+        Set the maximum number of control events waiting to be dispatched.
+        :param value: the size of the queue
+        :return:
+        """
+        if value is None or value < 1:
+            raise ValueError('Invalid size of event queue: ' + str(value))
+        self._settings[EVENT_QUEUE_SIZE_KEY].set_value(value)
+
+    def set_coalescing_delay(self, value: int) -> None:
+        """
+        Set the delay in milliseconds during which the volume and channel changes are accumulated before being applied.
+        :param value: the delay in milliseconds, 0 to apply changes immediately
+        :return:
+        """
+        if value is None or value < 0:
+            raise ValueError('Invalid coalescing delay: ' + str(value))
+        self._settings[COALESCING_DELAY_KEY].set_value(value)
+
+    def set_subscription_buffer_size(self, value: int) -> None:
+        """
+        Set the maximum number of notifications kept for a subscribed remote, the oldest ones are dropped when a remote is too slow.
+        :param value: the number of notifications
+        :return:
+        """
+        if value is None or value < 1:
+            raise ValueError('Invalid size of subscription buffer: ' + str(value))
+        self._settings[SUBSCRIPTION_BUFFER_SIZE_KEY].set_value(value)
+
+    def set_interactive_workers(self, value: int) -> None:
+        """
+        Set the number of threads executing the interactive tasks (control events, timeouts of the digits).
+        :param value: the number of threads
+        :return:
+        """
+        if value is None or value < 1:
+            raise ValueError('Invalid number of interactive workers: ' + str(value))
+        self._settings[INTERACTIVE_WORKERS_KEY].set_value(value)
+
+    def set_render_workers(self, value: int) -> None:
+        """
+        Set the number of threads rendering the cells of the grid.
+        :param value: the number of threads
+        :return:
+        """
+        if value is None or value < 1:
+            raise ValueError('Invalid number of render workers: ' + str(value))
+        self._settings[RENDER_WORKERS_KEY].set_value(value)
+
+    def set_network_workers(self, value: int) -> None:
+        """
+        Set the number of threads executing the network requests of the sources.
+        :param value: the number of threads
+        :return:
+        """
+        if value is None or value < 1:
+            raise ValueError('Invalid number of network workers: ' + str(value))
+        self._settings[NETWORK_WORKERS_KEY].set_value(value)
+
+    def set_background_workers(self, value: int) -> None:
+        """
+        Set the number of threads executing the background tasks (refresh of the interface).
+        :param value: the number of threads
+        :return:
+        """
+        if value is None or value < 1:
+            raise ValueError('Invalid number of background workers: ' + str(value))
+        self._settings[BACKGROUND_WORKERS_KEY].set_value(value)
+
+    def set_statistics_interval(self, value: int) -> None:
+        """
+        Set the interval in seconds between the logs of the statistics of the executor.
+        :param value: the interval in seconds, 0 if the statistics are not logged
+        :return:
+        """
+        if value is None or value < 0:
+            raise ValueError('Invalid interval of statistics: ' + str(value))
+        self._settings[STATISTICS_INTERVAL_KEY].set_value(value)
+
+    def set_cell_cache_size(self, value: int) -> None:
+        """
+        Set the maximum size in megabytes of the rendered images of the cells kept in memory.
+        :param value: the size in megabytes, 0 if the images are not cached
+        :return:
+        """
+        if value is None or value < 0:
+            raise ValueError('Invalid size of cell cache: ' + str(value))
+        self._settings[CELL_CACHE_SIZE_KEY].set_value(value)
+
+    def set_image_cache_size(self, value: int) -> None:
+        """
+        Set the maximum size in megabytes of the decoded and scaled images of the files and URLs kept in memory.
+        :param value: the size in megabytes, 0 if the images are not cached
+        :return:
+        """
+        if value is None or value < 0:
+            raise ValueError('Invalid size of image cache: ' + str(value))
+        self._settings[IMAGE_CACHE_SIZE_KEY].set_value(value)
+
+    def set_prefetch_rows(self, value: int) -> None:
+        """
+        Set the number of rows rendered in advance above and below the visible rows of the grid.
+        :param value: the number of rows, 0 if no row is rendered in advance
+        :return:
+        """
+        if value is None or value < 0:
+            raise ValueError('Invalid number of prefetched rows: ' + str(value))
+        self._settings[PREFETCH_ROWS_KEY].set_value(value)
+
+    def set_scroll_duration(self, value: int) -> None:
+        """
+        Set the duration in milliseconds of the scrolling animation of the grid, 0 to disable it.
+        :param value: the duration in milliseconds
+        :return:
+        """
+        if value is None or value < 0:
+            raise ValueError('Invalid duration of the scrolling: ' + str(value))
+        self._settings[SCROLL_DURATION_KEY].set_value(value)
+
     def set_log_level(self, value: str) -> None:
         """
         Set the log level (debug, info, warning, error)
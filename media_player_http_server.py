@@ -0,0 +1,474 @@
+#!/usr/bin/python
+# -*- coding: utf-*-
+# Media player HTTP and WebSocket gateway
+import asyncio
+import atexit
+import base64
+import hashlib
+import json
+import logging
+import struct
+import sys
+import threading
+import time
+import traceback
+
+from typing import Any, Dict, List, Tuple
+
+import media_api
+from media_player_config import MediaPlayerConfig
+from media_api import MediaPlayerController, ControllerListener, RemoteControlEvent
+from media_player_protocol import RateLimiter, is_ping
+from media_player_state import Subscription
+
+MAX_HEADERS_LENGTH: int = 8192
+MAX_BODY_LENGTH: int = 65536
+PUSH_BUFFER_LIMIT: int = 65536
+WEBSOCKET_GUID: str = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+WEBSOCKET_CONTINUATION: int = 0x0
+WEBSOCKET_TEXT: int = 0x1
+WEBSOCKET_BINARY: int = 0x2
+WEBSOCKET_CLOSE: int = 0x8
+WEBSOCKET_PING: int = 0x9
+WEBSOCKET_PONG: int = 0xA
+RESPONSE_NAMES: Dict[int, str] = {
+    media_api.RESPONSE_ACK[0]: 'ACK',
+    media_api.RESPONSE_NACK[0]: 'NACK',
+    media_api.RESPONSE_QRY[0]: 'QRY',
+    media_api.RESPONSE_BUSY[0]: 'BUSY',
+    media_api.NOTIFICATION: 'NOTIFICATION'
+}
+HTTP_REASONS: Dict[int, str] = {
+    200: 'OK',
+    204: 'No Content',
+    400: 'Bad Request',
+    403: 'Forbidden',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    413: 'Payload Too Large',
+    415: 'Unsupported Media Type',
+    429: 'Too Many Requests'
+}
+_INVALID_EVENT_MSG: str = 'Invalid event: %s'
+
+
+def to_json_object(response: bytes) -> Dict[str, Any]:
+    """
+    Convert the response of the listener or a notification to the object sent to the HTTP and WebSocket clients.
+    :param response: the response given by the listener or the notification
+    :return: the object with the name of the response and its decoded JSON data if any
+    """
+    if not response:
+        response = media_api.RESPONSE_NACK
+    result: Dict[str, Any] = {'response': RESPONSE_NAMES.get(response[0], 'NACK')}
+    payload: bytes = response[1:]
+    if payload.endswith(media_api.CONTROLLER_EOM):
+        payload = payload[:-len(media_api.CONTROLLER_EOM)]
+    if len(payload) > 0:
+        result['data'] = json.loads(payload.decode('ascii'))
+    return result
+
+
+def to_event(value: Any) -> RemoteControlEvent:
+    """
+    Build the event described by the object received from a HTTP or WebSocket client.
+    :param value: the object with the code of the event and its optional data
+    :return: the event
+    """
+    if not isinstance(value, dict) or not isinstance(value.get('code'), int) or not 0 <= value.get('code') <= 0xFF:
+        raise ValueError(_INVALID_EVENT_MSG % value)
+    result: RemoteControlEvent = RemoteControlEvent(value.get('code'))
+    data: Any = value.get('data')
+    if data is not None:
+        if not isinstance(data, (int, str)) or isinstance(data, bool):
+            raise ValueError(_INVALID_EVENT_MSG % value)
+        result.set_data(data)
+    return result
+
+
+class _HttpRequest(object):
+    def __init__(self, method: str, path: str, headers: Dict[str, str], body: bytes):
+        self.method: str = method
+        self.path: str = path
+        self.headers: Dict[str, str] = headers
+        self.body: bytes = body
+
+
+class MediaPlayerHttpController(MediaPlayerController):
+    """
+    Gateway giving access to the listener through HTTP requests and WebSocket messages.
+    The events are described by JSON objects: {"code": 24, "data": "..."}.
+    POST /events accepts an object or a list of objects, GET /status returns the state of the player and
+    GET /ws opens a WebSocket where each message is an event, optionally identified by an "id" member.
+    Requests sent by web pages are rejected unless their origin is allowed by the configuration and POST /events
+    requires a JSON content type, so that a browser cannot send events without a CORS preflight.
+    Unlike the other controllers, stopping the gateway does not notify the listener.
+    """
+    __logger: logging.Logger = None
+
+    def __init__(self, parent_logger: logging.Logger, config: MediaPlayerConfig, listener: ControllerListener, rate_limiter: RateLimiter = None):
+        """
+        Initialize the gateway.
+        :param parent_logger: the main logger
+        :param config: the configuration object
+        :param listener: the listener shared with the main controller
+        :param rate_limiter: the rate limiter shared with the main controller, a new one is used if not specified
+        """
+        super().__init__(config, listener)
+        if not MediaPlayerHttpController.__logger:
+            MediaPlayerHttpController.__logger = logging.getLogger(self.__class__.__name__)
+            for handler in parent_logger.handlers:
+                MediaPlayerHttpController.__logger.addHandler(handler)
+            MediaPlayerHttpController.__logger.setLevel(parent_logger.level)
+        MediaPlayerHttpController.__logger.info('Initializing %s', self.__class__.__name__)
+        # Status flags
+        self.__active: bool = False
+        # Locks
+        self.__lock: threading.RLock = threading.RLock()
+        # Tasks
+        # noinspection PyTypeChecker
+        self.__main_task: threading.Thread = None
+        # Hooks
+        atexit.register(self.stop)
+        # noinspection PyTypeChecker
+        self.__loop: asyncio.AbstractEventLoop = None
+        # noinspection PyTypeChecker
+        self.__server: asyncio.AbstractServer = None
+        self.__writers: set = set()
+        # The limits apply to all the events of a remote, whatever the controller it uses
+        self.__rate_limiter: RateLimiter = rate_limiter if rate_limiter else RateLimiter(self._config.get_tcp_client_rate(), self._config.get_tcp_client_burst(), self._config.get_tcp_global_rate(), self._config.get_tcp_global_burst())
+        self.__allowed_origins: set = set()
+
+    def __dispatch(self, event: RemoteControlEvent) -> bytes:
+        # noinspection PyBroadException
+        try:
+            if self._listener:
+                MediaPlayerHttpController.__logger.debug('Dispatching control event: %s', event)
+                return self._listener.on_control_event(event)
+            MediaPlayerHttpController.__logger.warning('No listener, control event not processed')
+        except Exception as ex:
+            MediaPlayerHttpController.__logger.error('Error: %s' % ex)
+            exc_type, exc_value, exc_traceback = sys.exc_info()
+            traceback.print_tb(exc_traceback, limit=6, file=sys.stderr)
+            MediaPlayerHttpController.__logger.error(ex)
+        return media_api.RESPONSE_NACK
+
+    async def __process(self, event: RemoteControlEvent, address: str) -> Dict[str, Any]:
+        MediaPlayerHttpController.__logger.debug('Control event received from %s: %s', address, event)
+        if is_ping(event):
+            return to_json_object(media_api.RESPONSE_ACK)
+        if not self.__rate_limiter.acquire(address):
+            MediaPlayerHttpController.__logger.debug('Too many events received from %s, control event rejected: %s', address, event)
+            return to_json_object(media_api.RESPONSE_BUSY)
+        # The listener is blocking, it must not be invoked on the thread of the event loop
+        return to_json_object(await self.__loop.run_in_executor(None, self.__dispatch, event))
+
+    @staticmethod
+    async def __read_request(reader: asyncio.StreamReader) -> _HttpRequest:
+        data: bytes = await reader.readuntil(b'\r\n\r\n')
+        if len(data) > MAX_HEADERS_LENGTH:
+            raise ValueError('Headers too long')
+        lines: List[str] = data.decode('iso-8859-1').split('\r\n')
+        parts: List[str] = lines[0].split(' ')
+        if len(parts) != 3:
+            raise ValueError('Invalid request line: %s' % lines[0])
+        headers: Dict[str, str] = dict()
+        for line in lines[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+        length: int = int(headers.get('content-length', '0'))
+        if length > MAX_BODY_LENGTH:
+            raise ValueError('Body too long: %s' % length)
+        body: bytes = await reader.readexactly(length) if length > 0 else b''
+        return _HttpRequest(parts[0].upper(), parts[1].split('?')[0], headers, body)
+
+    def __is_allowed(self, request: _HttpRequest) -> bool:
+        # Requests without origin are not sent by web pages, a browser always gives it for cross-site requests
+        origin: str = request.headers.get('origin')
+        return not origin or origin in self.__allowed_origins
+
+    @staticmethod
+    def __write_response(writer: asyncio.StreamWriter, status: int, value: Any = None, keep_alive: bool = True, origin: str = None) -> None:
+        body: bytes = b''
+        if value is not None:
+            body = json.dumps(value, separators=(',', ':')).encode('utf-8')
+        headers: List[str] = [
+            'HTTP/1.1 %s %s' % (status, HTTP_REASONS.get(status, '')),
+            'Content-Type: application/json',
+            'Content-Length: %s' % len(body)
+        ]
+        if origin:
+            # Remotes can be web pages served by other hosts, only the allowed origin is given
+            headers.extend([
+                'Access-Control-Allow-Origin: ' + origin,
+                'Access-Control-Allow-Methods: GET, POST, OPTIONS',
+                'Access-Control-Allow-Headers: Content-Type',
+                'Vary: Origin'
+            ])
+        headers.append('Connection: ' + ('keep-alive' if keep_alive else 'close'))
+        writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode('iso-8859-1') + body)
+
+    async def __handle_events(self, request: _HttpRequest, address: str) -> Tuple[int, Any]:
+        if request.method != 'POST':
+            return 405, {'error': 'Method not allowed'}
+        if request.headers.get('content-type', '').split(';')[0].strip().lower() != 'application/json':
+            return 415, {'error': 'Content type must be application/json'}
+        try:
+            value: Any = json.loads(request.body.decode('utf-8'))
+            if isinstance(value, list):
+                # All the events are validated before processing the first one, an invalid list has no effect
+                events: List[RemoteControlEvent] = [to_event(item) for item in value]
+                # The events are processed in the order of the list
+                result: List[Dict[str, Any]] = list()
+                for event in events:
+                    result.append(await self.__process(event, address))
+                return 200, result
+            return 200, await self.__process(to_event(value), address)
+        except ValueError as ex:
+            return 400, {'error': str(ex)}
+
+    async def __handle_status(self, request: _HttpRequest) -> Tuple[int, Any]:
+        if request.method != 'GET':
+            return 405, {'error': 'Method not allowed'}
+        return 200, to_json_object(await self.__loop.run_in_executor(None, self.__dispatch, RemoteControlEvent(media_api.CODE_STATUS)))
+
+    async def __handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        address: str = writer.get_extra_info('peername')[0]
+        MediaPlayerHttpController.__logger.debug('Connection started with: %s', address)
+        self.__writers.add(writer)
+        idle_timeout: int = self._config.get_tcp_idle_timeout()
+        try:
+            while self.__active:
+                try:
+                    request: _HttpRequest = await asyncio.wait_for(MediaPlayerHttpController.__read_request(reader), idle_timeout if idle_timeout > 0 else None)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError):
+                    return
+                except (asyncio.LimitOverrunError, ValueError) as ex:
+                    MediaPlayerHttpController.__logger.warning('Invalid request received from %s: %s', address, ex)
+                    MediaPlayerHttpController.__write_response(writer, 400, {'error': str(ex)}, False)
+                    await writer.drain()
+                    return
+                MediaPlayerHttpController.__logger.debug('Request received from %s: %s %s', address, request.method, request.path)
+                keep_alive: bool = request.headers.get('connection', '').lower() != 'close'
+                if not self.__is_allowed(request):
+                    MediaPlayerHttpController.__logger.warning('Request from %s rejected, origin not allowed: %s', address, request.headers.get('origin'))
+                    MediaPlayerHttpController.__write_response(writer, 403, {'error': 'Origin not allowed'}, False)
+                    await writer.drain()
+                    return
+                if request.path == '/ws' and request.headers.get('upgrade', '').lower() == 'websocket':
+                    await self.__handle_websocket(request, reader, writer, address)
+                    return
+                if request.method == 'OPTIONS':
+                    status, value = 204, None
+                elif request.path == '/events':
+                    status, value = await self.__handle_events(request, address)
+                elif request.path == '/status':
+                    status, value = await self.__handle_status(request)
+                else:
+                    status, value = 404, {'error': 'Not found: %s' % request.path}
+                MediaPlayerHttpController.__write_response(writer, status, value, keep_alive, request.headers.get('origin'))
+                await writer.drain()
+                if not keep_alive:
+                    return
+        except (ConnectionError, asyncio.CancelledError):
+            MediaPlayerHttpController.__logger.debug('Client connection closed')
+        finally:
+            self.__writers.discard(writer)
+            writer.close()
+
+    @staticmethod
+    def __write_frame(writer: asyncio.StreamWriter, opcode: int, payload: bytes) -> None:
+        # Frames sent by the server are never masked
+        if len(payload) < 126:
+            header: bytes = struct.pack('>BB', 0x80 | opcode, len(payload))
+        elif len(payload) < 65536:
+            header: bytes = struct.pack('>BBH', 0x80 | opcode, 126, len(payload))
+        else:
+            header: bytes = struct.pack('>BBQ', 0x80 | opcode, 127, len(payload))
+        writer.write(header + payload)
+
+    @staticmethod
+    async def __read_frame(reader: asyncio.StreamReader) -> Tuple[bool, int, bytes]:
+        first, second = struct.unpack('>BB', await reader.readexactly(2))
+        length: int = second & 0x7F
+        if length == 126:
+            length = struct.unpack('>H', await reader.readexactly(2))[0]
+        elif length == 127:
+            length = struct.unpack('>Q', await reader.readexactly(8))[0]
+        if length > MAX_BODY_LENGTH:
+            raise ValueError('Message too long: %s' % length)
+        if not second & 0x80:
+            # The frames sent by the clients must be masked, the connection is closed otherwise (RFC 6455, 5.1)
+            raise ValueError('Unmasked frame')
+        mask: bytes = await reader.readexactly(4)
+        payload: bytes = await reader.readexactly(length)
+        if length > 0:
+            # The whole payload is unmasked at once using the mask repeated to its length
+            mask = (mask * (length // 4 + 1))[:length]
+            payload = (int.from_bytes(payload, 'big') ^ int.from_bytes(mask, 'big')).to_bytes(length, 'big')
+        return (first & 0x80) != 0, first & 0x0F, payload
+
+    def __wake(self, wake: asyncio.Event) -> None:
+        loop: asyncio.AbstractEventLoop = self.__loop
+        try:
+            if loop and not loop.is_closed():
+                loop.call_soon_threadsafe(wake.set)
+        except RuntimeError:
+            # The loop has been closed meanwhile
+            pass
+
+    async def __push(self, subscription: Subscription, wake: asyncio.Event, writer: asyncio.StreamWriter, address: str) -> None:
+        while subscription.is_active() and not writer.is_closing():
+            await wake.wait()
+            wake.clear()
+            # A remote not reading the notifications must not make the data to send grow without limit
+            if writer.transport.get_write_buffer_size() > PUSH_BUFFER_LIMIT:
+                MediaPlayerHttpController.__logger.warning('Notifications not read by: %s, subscription cancelled', address)
+                self.__unsubscribe(subscription)
+                return
+            for notification in subscription.poll():
+                if not writer.is_closing():
+                    MediaPlayerHttpController.__write_frame(writer, WEBSOCKET_TEXT, json.dumps(to_json_object(notification), separators=(',', ':')).encode('utf-8'))
+
+    async def __handle_message(self, payload: bytes, writer: asyncio.StreamWriter, address: str, subscription: Subscription) -> Subscription:
+        # noinspection PyTypeChecker
+        value: Any = None
+        try:
+            value = json.loads(payload.decode('utf-8'))
+            event: RemoteControlEvent = to_event(value)
+            if event.get_code() == media_api.CODE_SUBSCRIBE:
+                broadcaster = self._listener.get_state_broadcaster() if self._listener else None
+                if broadcaster and (not subscription or not subscription.is_active()):
+                    MediaPlayerHttpController.__logger.debug('Subscription of: %s', address)
+                    wake: asyncio.Event = asyncio.Event()
+                    subscription = broadcaster.subscribe(self._config.get_subscription_buffer_size(), lambda: self.__wake(wake))
+                    asyncio.ensure_future(self.__push(subscription, wake, writer, address))
+                result: Dict[str, Any] = to_json_object(media_api.RESPONSE_ACK if subscription else media_api.RESPONSE_NACK)
+            elif event.get_code() == media_api.CODE_UNSUBSCRIBE:
+                self.__unsubscribe(subscription)
+                subscription = None
+                result: Dict[str, Any] = to_json_object(media_api.RESPONSE_ACK)
+            else:
+                result: Dict[str, Any] = await self.__process(event, address)
+        except ValueError as ex:
+            MediaPlayerHttpController.__logger.warning('Invalid message received from %s: %s', address, ex)
+            result: Dict[str, Any] = {'response': 'NACK', 'error': str(ex)}
+        if isinstance(value, dict) and 'id' in value:
+            result['id'] = value.get('id')
+        MediaPlayerHttpController.__write_frame(writer, WEBSOCKET_TEXT, json.dumps(result, separators=(',', ':')).encode('utf-8'))
+        return subscription
+
+    def __unsubscribe(self, subscription: Subscription) -> None:
+        if not subscription:
+            return
+        broadcaster = self._listener.get_state_broadcaster() if self._listener else None
+        if broadcaster:
+            broadcaster.unsubscribe(subscription)
+        else:
+            subscription.close()
+
+    async def __handle_websocket(self, request: _HttpRequest, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, address: str) -> None:
+        key: str = request.headers.get('sec-websocket-key')
+        if not key:
+            MediaPlayerHttpController.__write_response(writer, 400, {'error': 'Missing WebSocket key'}, False)
+            await writer.drain()
+            return
+        accept: str = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode('ascii')).digest()).decode('ascii')
+        writer.write(('HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\nSec-WebSocket-Accept: %s\r\n\r\n' % accept).encode('ascii'))
+        await writer.drain()
+        MediaPlayerHttpController.__logger.debug('WebSocket opened with: %s', address)
+        # noinspection PyTypeChecker
+        subscription: Subscription = None
+        fragments: List[bytes] = list()
+        try:
+            while self.__active:
+                try:
+                    final, opcode, payload = await MediaPlayerHttpController.__read_frame(reader)
+                except asyncio.IncompleteReadError:
+                    return
+                if opcode == WEBSOCKET_CLOSE:
+                    MediaPlayerHttpController.__write_frame(writer, WEBSOCKET_CLOSE, payload[0:2])
+                    await writer.drain()
+                    return
+                if opcode == WEBSOCKET_PING:
+                    MediaPlayerHttpController.__write_frame(writer, WEBSOCKET_PONG, payload)
+                elif opcode in (WEBSOCKET_TEXT, WEBSOCKET_BINARY, WEBSOCKET_CONTINUATION):
+                    fragments.append(payload)
+                    if sum(len(fragment) for fragment in fragments) > MAX_BODY_LENGTH:
+                        raise ValueError('Message too long')
+                    if final:
+                        message: bytes = b''.join(fragments)
+                        fragments = list()
+                        received: float = time.perf_counter()
+                        subscription = await self.__handle_message(message, writer, address, subscription)
+                        MediaPlayerHttpController.__logger.debug('Message processed for %s in %.2f ms', address, (time.perf_counter() - received) * 1000)
+                await writer.drain()
+        except ValueError as ex:
+            MediaPlayerHttpController.__logger.warning('Invalid data received from %s: %s', address, ex)
+        finally:
+            self.__unsubscribe(subscription)
+            MediaPlayerHttpController.__logger.debug('WebSocket closed with: %s', address)
+
+    async def __serve(self) -> None:
+        self.__loop = asyncio.get_running_loop()
+        self.__server = await asyncio.start_server(self.__handle_connection, '0.0.0.0', self._config.get_http_port(), limit=MAX_HEADERS_LENGTH)
+        if not self.__active:
+            # Stop requested before the server was ready, the close scheduled by stop may have been missed
+            MediaPlayerHttpController.__logger.debug('Stop requested during startup')
+            self.__close_server()
+            return
+        async with self.__server:
+            await self.__server.serve_forever()
+
+    def __close_server(self) -> None:
+        if self.__server:
+            self.__server.close()
+        for writer in list(self.__writers):
+            writer.close()
+
+    def __main(self):
+        MediaPlayerHttpController.__logger.info('Starting on port: %s', self._config.get_http_port())
+        self.__allowed_origins = set(origin.strip() for origin in (self._config.get_http_allowed_origins() or '').split(',') if origin.strip())
+        try:
+            asyncio.run(self.__serve())
+        except asyncio.CancelledError:
+            MediaPlayerHttpController.__logger.debug('Server closed')
+        except Exception as ex:
+            MediaPlayerHttpController.__logger.error('Error: %s' % ex)
+            exc_type, exc_value, exc_traceback = sys.exc_info()
+            traceback.print_tb(exc_traceback, limit=6, file=sys.stderr)
+            MediaPlayerHttpController.__logger.error(ex)
+        finally:
+            self.__server = None
+            self.__loop = None
+            self.__active = False
+            MediaPlayerHttpController.__logger.info('Stopped')
+
+    def is_running(self) -> bool:
+        return self.__active
+
+    def start(self) -> None:
+        with self.__lock:
+            if self.__active:
+                return
+            MediaPlayerHttpController.__logger.debug('Starting...')
+            self.__active = True
+            self.__main_task = threading.Thread(target=self.__main, name=self.__class__.__name__, daemon=True)
+            self.__main_task.start()
+
+    def stop(self) -> None:
+        with self.__lock:
+            if not self.__active:
+                return
+            MediaPlayerHttpController.__logger.debug('Stopping...')
+            self.__active = False
+            loop: asyncio.AbstractEventLoop = self.__loop
+            if loop and not loop.is_closed():
+                loop.call_soon_threadsafe(self.__close_server)
+            self.__main_task = None
+
+    def restart(self):
+        self.stop()
+        time.sleep(1)
+        self.start()
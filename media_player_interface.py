@@ -22,7 +22,7 @@ else:
 from typing import Any, List
 from media_player_config import MediaPlayerConfig
 from media_api import RemoteControlEvent, MediaPlayerInterface, Media, MediaSource, ControllerListener
-from canvas_grid import CanvasGrid, CanvasGridListener, CanvasGridCell, CanvasGridRenderer
+from canvas_grid import CanvasGrid, CanvasGridListener, CanvasGridCell, CanvasGridRenderer, PadKey
 from id_network_utils import find_ip_v4
 from id_threading_utils import Executor
 from id_tk import TkClock
@@ -114,6 +114,10 @@ class MediaPlayerInterfaceImpl(MediaPlayerInterface, CanvasGridListener):
         self.__window.update()
         self.__cnv_grid = CanvasGrid(MediaPlayerInterfaceImpl.__logger, self.__window, self.__center_cnv, executor)
         self.__cnv_grid.set_listener(self)
+        self.__cnv_grid.set_prefetch_rows(self._config.get_prefetch_rows())
+        self.__cnv_grid.set_scroll_duration(self._config.get_scroll_duration())
+        CanvasGridRenderer.get_cache().set_max_size(self._config.get_cell_cache_size() * 1024 * 1024)
+        CanvasGridRenderer.get_images_cache().set_max_size(self._config.get_image_cache_size() * 1024 * 1024)
         self.__view: tk.Frame = tk.Frame(self.__window, bg="black", height=h, width=w, borderwidth=0, highlightthickness=0)
         self.__view['background'] = 'black'
         self.__view.bind('<Control-q>', lambda e: self.send_control_event(RemoteControlEvent(media_api.CODE_POWER), e))
@@ -148,6 +152,11 @@ class MediaPlayerInterfaceImpl(MediaPlayerInterface, CanvasGridListener):
     def get_view_width(self) -> int:
         return self.__view.winfo_width()
 
+    def send_pad_key(self, key: PadKey) -> None:
+        if self.__window:
+            # The grid must be updated on the thread of the interface
+            self.__window.after(0, self.__cnv_grid.on_key, key)
+
     def set_grid_visible(self, flag: bool):
         if flag:
             self.__view.after(1, self.__view.place_forget())
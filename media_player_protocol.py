@@ -0,0 +1,436 @@
+# -*- coding: utf-*-
+# Media player control protocol
+import collections
+import socket
+import struct
+import threading
+import time
+
+import media_api
+from typing import Any, Dict, List, Tuple
+from media_api import RemoteControlEvent
+
+FRAME_SEPARATOR: bytes = bytes([0x0D, 0x0A])
+DEFAULT_BUFFER_SIZE: int = 1024
+# First byte sent by the clients using the binary frames, it is sent back by the controller to accept the version
+PROTOCOL_V2: int = 0xF2
+# Binary frames start with the length of the remaining bytes followed by the request identifier, the code (or the status of the response) and the type of payload
+V2_LENGTH: struct.Struct = struct.Struct('>H')
+V2_HEADER: struct.Struct = struct.Struct('>HHBB')
+V2_INT: struct.Struct = struct.Struct('>i')
+PAYLOAD_NONE: int = 0x00
+PAYLOAD_INT: int = 0x01
+PAYLOAD_TEXT: int = 0x02
+
+
+def decode_event(data: bytes) -> RemoteControlEvent:
+    """
+    Build the remote control event described by the content of a frame.
+    :param data: the content of the frame without the separator
+    :return: the event
+    """
+    event: RemoteControlEvent = RemoteControlEvent(data[0])
+    if len(data) > 1:
+        event.set_data(bytes(data[1:]).decode('ascii'))
+    elif 0x20 <= data[0] <= 0x7E:  # A valid ASCII character
+        event.set_data(bytes(data).decode('ascii'))
+    return event
+
+
+def is_ping(event: RemoteControlEvent) -> bool:
+    """
+    Return true if the event is a ping.
+    :param event: the event
+    :return: true if the event is a ping
+    """
+    return event.get_code() == media_api.CODE_PING and event.get_data() is None
+
+
+def set_keep_alive(sock: socket.socket, delay: int) -> None:
+    """
+    Enable TCP keep-alive on the socket.
+    :param sock: the socket
+    :param delay: the delay in seconds of inactivity before the probes are sent, 0 to keep the default settings
+    """
+    if delay <= 0:
+        return
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    # The options are not available on all the platforms
+    if hasattr(socket, 'TCP_KEEPIDLE'):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, delay)
+    if hasattr(socket, 'TCP_KEEPINTVL'):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, max(1, delay // 3))
+    if hasattr(socket, 'TCP_KEEPCNT'):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 3)
+
+
+class ConnectionRegistry(object):
+    def __init__(self, max_connections: int):
+        """
+        Initialize the registry of the connections and of their last activity.
+        :param max_connections: the maximum number of connections
+        """
+        self.__max_connections: int = max_connections
+        self.__connections: Dict[Any, float] = dict()
+        self.__lock: threading.Lock = threading.Lock()
+
+    def add(self, connection: Any) -> Any:
+        """
+        Register the connection, the connection idle for the longest time is evicted if the limit is reached.
+        :param connection: the connection
+        :return: the evicted connection that must be closed by the caller or None
+        """
+        # noinspection PyTypeChecker
+        result: Any = None
+        with self.__lock:
+            if len(self.__connections) >= self.__max_connections:
+                result = min(self.__connections, key=self.__connections.get)
+                del self.__connections[result]
+            self.__connections[connection] = time.monotonic()
+        return result
+
+    def touch(self, connection: Any) -> None:
+        """
+        Update the time of the last activity of the connection.
+        :param connection: the connection
+        """
+        with self.__lock:
+            if connection in self.__connections:
+                self.__connections[connection] = time.monotonic()
+
+    def remove(self, connection: Any) -> None:
+        """
+        Unregister the connection.
+        :param connection: the connection
+        """
+        with self.__lock:
+            self.__connections.pop(connection, None)
+
+    def get_connections(self) -> List[Any]:
+        """
+        Return the registered connections.
+        :return: the connections
+        """
+        with self.__lock:
+            return list(self.__connections)
+
+    def get_count(self) -> int:
+        """
+        Return the number of registered connections.
+        :return: the number of connections
+        """
+        with self.__lock:
+            return len(self.__connections)
+
+
+class ConnectionStatistics(object):
+    def __init__(self):
+        """
+        Initialize the statistics of a connection.
+        """
+        self.__events: int = 0
+        self.__throttled: int = 0
+        self.__total_latency: float = 0
+        self.__max_latency: float = 0
+
+    def add_throttled(self) -> None:
+        self.__throttled = self.__throttled + 1
+
+    def get_events_count(self) -> int:
+        return self.__events
+
+    def record(self, received: float, count: int = 1) -> float:
+        """
+        Record the latency of the events answered.
+        :param received: the performance counter value when the events were received
+        :param count: the number of events
+        :return: the latency in milliseconds
+        """
+        result: float = (time.perf_counter() - received) * 1000
+        self.__events = self.__events + count
+        self.__total_latency = self.__total_latency + result * count
+        self.__max_latency = max(self.__max_latency, result)
+        return result
+
+    def __str__(self):
+        if self.__events == 0:
+            return 'events: 0, throttled: %s' % self.__throttled
+        return 'events: %s, throttled: %s, average latency: %.2f ms, max latency: %.2f ms' % (self.__events, self.__throttled, self.__total_latency / self.__events, self.__max_latency)
+
+
+class TokenBucket(object):
+    def __init__(self, rate: float, capacity: int):
+        """
+        Initialize the bucket, it is full when created.
+        :param rate: the number of tokens added per second
+        :param capacity: the maximum number of tokens
+        """
+        self.__rate: float = rate
+        self.__capacity: int = capacity
+        self.__tokens: float = capacity
+        self.__time: float = time.monotonic()
+
+    def refill(self, now: float) -> float:
+        """
+        Add the tokens accumulated since the last refill.
+        :param now: the current monotonic time
+        :return: the number of available tokens
+        """
+        self.__tokens = min(self.__capacity, self.__tokens + (now - self.__time) * self.__rate)
+        self.__time = now
+        return self.__tokens
+
+    def consume(self) -> None:
+        """
+        Remove one token, the bucket must have been refilled and contain at least one token.
+        """
+        self.__tokens = self.__tokens - 1
+
+    def is_full(self) -> bool:
+        return self.__tokens >= self.__capacity
+
+
+class RateLimiter(object):
+    # Number of client buckets above which the full ones and then the least recently used ones are discarded
+    MAX_CLIENTS: int = 256
+
+    def __init__(self, client_rate: int, client_burst: int, global_rate: int, global_burst: int):
+        """
+        Initialize the limiter using a token bucket for each client and a token bucket for all the clients.
+        :param client_rate: the number of events per second accepted from a client, 0 to disable the limit
+        :param client_burst: the number of events a client can send in a burst
+        :param global_rate: the number of events per second accepted from all the clients, 0 to disable the limit
+        :param global_burst: the number of events all the clients can send in a burst
+        """
+        self.__client_rate: int = client_rate
+        self.__client_burst: int = client_burst
+        # Buckets of the clients ordered from the least recently used to the most recently used
+        self.__clients: collections.OrderedDict = collections.OrderedDict()
+        # noinspection PyTypeChecker
+        self.__global: TokenBucket = None
+        if global_rate > 0:
+            self.__global = TokenBucket(global_rate, global_burst)
+        self.__lock: threading.Lock = threading.Lock()
+        self.__accepted: int = 0
+        self.__throttled: int = 0
+
+    def acquire(self, address: str) -> bool:
+        """
+        Take a token for an event of the client.
+        :param address: the address of the client
+        :return: true if the event can be processed, false if it must be rejected
+        """
+        now: float = time.monotonic()
+        with self.__lock:
+            # noinspection PyTypeChecker
+            client: TokenBucket = None
+            if self.__client_rate > 0:
+                client = self.__clients.get(address)
+                if not client:
+                    if len(self.__clients) >= RateLimiter.MAX_CLIENTS:
+                        # The clients which have not sent events recently are forgotten
+                        for key in list(self.__clients):
+                            self.__clients[key].refill(now)
+                            if self.__clients[key].is_full():
+                                del self.__clients[key]
+                        # The map stays bounded even if all the clients are active
+                        while len(self.__clients) >= RateLimiter.MAX_CLIENTS:
+                            self.__clients.popitem(last=False)
+                    client = TokenBucket(self.__client_rate, self.__client_burst)
+                    self.__clients[address] = client
+                else:
+                    self.__clients.move_to_end(address)
+            # A token is taken only if the event is accepted by the two buckets
+            if (client and client.refill(now) < 1) or (self.__global and self.__global.refill(now) < 1):
+                self.__throttled = self.__throttled + 1
+                return False
+            if client:
+                client.consume()
+            if self.__global:
+                self.__global.consume()
+            self.__accepted = self.__accepted + 1
+        return True
+
+    def get_accepted_count(self) -> int:
+        return self.__accepted
+
+    def get_throttled_count(self) -> int:
+        return self.__throttled
+
+
+class FrameParser(object):
+    def __init__(self, capacity: int = DEFAULT_BUFFER_SIZE):
+        """
+        Initialize the parser and its preallocated buffer.
+        :param capacity: the size of the buffer, it is also the maximum length of a frame
+        """
+        self._buffer: bytearray = bytearray(capacity)
+        self._view: memoryview = memoryview(self._buffer)
+        # Position of the first byte not parsed yet
+        self._start: int = 0
+        # Position following the last received byte
+        self._end: int = 0
+
+    def __compact(self) -> None:
+        if self._start == 0:
+            return
+        pending: int = self._end - self._start
+        if pending > 0:
+            self._buffer[0:pending] = bytes(self._view[self._start:self._end])
+        self._start = 0
+        self._end = pending
+
+    def __reserve(self) -> memoryview:
+        if self._end == len(self._buffer):
+            self.__compact()
+        if self._end == len(self._buffer):
+            # The buffer is full and does not contain any separator
+            self.clear()
+            raise ValueError('Frame exceeds the maximum length: %s' % len(self._buffer))
+        return self._view[self._end:]
+
+    def clear(self) -> None:
+        """
+        Discard the pending data.
+        """
+        self._start = 0
+        self._end = 0
+
+    def get_pending_length(self) -> int:
+        """
+        Return the number of received bytes not yet part of a complete frame.
+        :return: the number of bytes
+        """
+        return self._end - self._start
+
+    def recv_into(self, sock: socket.socket) -> int:
+        """
+        Receive data from the socket directly into the buffer.
+        :param sock: the socket
+        :return: the number of bytes received, 0 if the connection is closed
+        """
+        received: int = sock.recv_into(self.__reserve())
+        self._end = self._end + received
+        return received
+
+    def feed(self, data: bytes) -> None:
+        """
+        Append data to the buffer.
+        :param data: the data
+        """
+        offset: int = 0
+        while offset < len(data):
+            free: memoryview = self.__reserve()
+            length: int = min(len(free), len(data) - offset)
+            free[0:length] = data[offset:offset + length]
+            self._end = self._end + length
+            offset = offset + length
+
+    def is_binary(self) -> bool:
+        """
+        Return true if the frames are binary ones (version 2 of the protocol).
+        :return: true for binary frames, false for the frames terminated by the separator
+        """
+        return False
+
+    def get_request_id(self, frame: memoryview) -> int:
+        """
+        Return the identifier of the request, it is available even if the frame cannot be decoded.
+        :param frame: the frame
+        :return: the identifier of the request (always 0 for the frames terminated by the separator)
+        """
+        return 0
+
+    def decode(self, frame: memoryview) -> Tuple[int, RemoteControlEvent]:
+        """
+        Build the event described by the frame.
+        :param frame: the frame
+        :return: the identifier of the request (always 0 for the frames terminated by the separator) and the event
+        """
+        return 0, decode_event(frame)
+
+    def encode(self, request_id: int, response: bytes) -> bytes:
+        """
+        Build the frame of the response.
+        :param request_id: the identifier of the request
+        :param response: the response given by the listener
+        :return: the frame
+        """
+        return response
+
+    def frames(self) -> List[memoryview]:
+        """
+        Extract all the complete frames available in the buffer.
+        The frames are views on the buffer and are only valid until the next call to recv_into or feed.
+        Empty frames are ignored.
+        :return: the content of the frames without the separators
+        """
+        result: List[memoryview] = list()
+        index: int = self._buffer.find(FRAME_SEPARATOR, self._start, self._end)
+        while index >= 0:
+            if index > self._start:
+                result.append(self._view[self._start:index])
+            self._start = index + len(FRAME_SEPARATOR)
+            index = self._buffer.find(FRAME_SEPARATOR, self._start, self._end)
+        if self._start == self._end:
+            self.clear()
+        return result
+
+
+class BinaryFrameParser(FrameParser):
+    def frames(self) -> List[memoryview]:
+        """
+        Extract all the complete binary frames available in the buffer.
+        The frames are views on the buffer and are only valid until the next call to recv_into or feed.
+        :return: the content of the frames without their lengths
+        """
+        result: List[memoryview] = list()
+        while self._end - self._start >= V2_LENGTH.size:
+            length: int = V2_LENGTH.unpack_from(self._buffer, self._start)[0]
+            if length + V2_LENGTH.size > len(self._buffer) or length < V2_HEADER.size - V2_LENGTH.size:
+                self.clear()
+                raise ValueError('Invalid frame length: %s' % length)
+            end: int = self._start + V2_LENGTH.size + length
+            if end > self._end:
+                break
+            result.append(self._view[self._start:end])
+            self._start = end
+        if self._start == self._end:
+            self.clear()
+        return result
+
+    def is_binary(self) -> bool:
+        return True
+
+    def get_request_id(self, frame: memoryview) -> int:
+        return V2_HEADER.unpack_from(frame)[1]
+
+    def decode(self, frame: memoryview) -> Tuple[int, RemoteControlEvent]:
+        length, request_id, code, payload_type = V2_HEADER.unpack_from(frame)
+        event: RemoteControlEvent = RemoteControlEvent(code)
+        if payload_type == PAYLOAD_INT:
+            event.set_data(V2_INT.unpack_from(frame, V2_HEADER.size)[0])
+        elif payload_type == PAYLOAD_TEXT:
+            event.set_data(bytes(frame[V2_HEADER.size:]).decode('utf-8'))
+        elif payload_type != PAYLOAD_NONE:
+            raise ValueError('Invalid payload type: %s' % payload_type)
+        return request_id, event
+
+    def encode(self, request_id: int, response: bytes) -> bytes:
+        # The responses are made of the status byte, an optional text and the end of message
+        payload: bytes = response[1:]
+        if payload.endswith(media_api.CONTROLLER_EOM):
+            payload = payload[:-len(media_api.CONTROLLER_EOM)]
+        payload_type: int = PAYLOAD_TEXT if len(payload) > 0 else PAYLOAD_NONE
+        return V2_HEADER.pack(V2_HEADER.size - V2_LENGTH.size + len(payload), request_id, response[0], payload_type) + payload
+
+
+def create_parser(data: bytes) -> Tuple[FrameParser, int]:
+    """
+    Create the parser according to the first bytes received on a connection.
+    :param data: the first bytes received
+    :return: the parser and the number of bytes used by the negotiation of the version
+    """
+    if len(data) > 0 and data[0] == PROTOCOL_V2:
+        return BinaryFrameParser(), 1
+    return FrameParser(), 0
@@ -0,0 +1,217 @@
+# -*- coding: utf-*-
+# Media player state
+import collections
+import json
+import threading
+
+import media_api
+from typing import Any, Callable, Dict, List
+from media_api import Media
+
+
+class PlayerState(object):
+    def __init__(self):
+        """
+        Initialize the state, it is updated by the listeners of the sources and read by the remotes.
+        """
+        self.__lock: threading.Lock = threading.Lock()
+        # noinspection PyTypeChecker
+        self.__source: str = None
+        # noinspection PyTypeChecker
+        self.__media: Dict[str, Any] = None
+        self.__volume: int = -1
+        self.__playing: bool = False
+        # The response is built once for each change of the state
+        # noinspection PyTypeChecker
+        self.__response: bytes = None
+
+    def __changed(self) -> None:
+        self.__response = None
+
+    def set_source(self, name: str) -> None:
+        """
+        Set the name of the active source.
+        :param name: the name of the source or None
+        """
+        with self.__lock:
+            self.__source = name
+            self.__changed()
+
+    def set_media(self, media: Media) -> None:
+        """
+        Set the current media, its properties are copied.
+        :param media: the media or None
+        """
+        with self.__lock:
+            # noinspection PyTypeChecker
+            self.__media = None
+            if media:
+                self.__media = {
+                    'name': media.get_name(),
+                    'channel': media.get_channel(),
+                    'title': media.get_title()
+                }
+            self.__changed()
+
+    def set_volume(self, value: int) -> None:
+        """
+        Set the volume of the active source.
+        :param value: the volume between 0 and 100, -1 if unknown
+        """
+        with self.__lock:
+            self.__volume = value
+            self.__changed()
+
+    def set_playing(self, flag: bool) -> None:
+        """
+        Set the flag indicating if a media is played.
+        :param flag: true if a media is played
+        """
+        with self.__lock:
+            self.__playing = flag
+            self.__changed()
+
+    def __snapshot(self) -> Dict[str, Any]:
+        return {
+            'source': self.__source,
+            'media': dict(self.__media) if self.__media else None,
+            'volume': self.__volume,
+            'playing': self.__playing
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Return a snapshot of the state.
+        :return: the snapshot
+        """
+        with self.__lock:
+            return self.__snapshot()
+
+    def to_response(self) -> bytes:
+        """
+        Return the response to the status command, made of the query byte, the compact JSON snapshot and the end of message.
+        :return: the response
+        """
+        with self.__lock:
+            if self.__response is None:
+                self.__response = media_api.RESPONSE_QRY[0:1] + json.dumps(self.__snapshot(), separators=(',', ':')).encode('ascii') + media_api.CONTROLLER_EOM
+            return self.__response
+
+
+class Subscription(object):
+    def __init__(self, capacity: int, callback: Callable[[], None] = None):
+        """
+        Initialize the subscription and its bounded buffer of notifications.
+        :param capacity: the maximum number of notifications kept, the oldest ones are dropped
+        :param callback: the function invoked from the publishing thread when a notification is available
+        """
+        self.__notifications: collections.deque = collections.deque(maxlen=capacity)
+        self.__condition: threading.Condition = threading.Condition()
+        self.__callback: Callable[[], None] = callback
+        self.__active: bool = True
+        self.__dropped: int = 0
+
+    def is_active(self) -> bool:
+        return self.__active
+
+    def get_dropped_count(self) -> int:
+        return self.__dropped
+
+    def offer(self, notification: bytes) -> None:
+        """
+        Add the notification, it never blocks.
+        :param notification: the notification
+        """
+        with self.__condition:
+            if not self.__active:
+                return
+            if len(self.__notifications) == self.__notifications.maxlen:
+                self.__dropped = self.__dropped + 1
+            self.__notifications.append(notification)
+            self.__condition.notify()
+        if self.__callback:
+            self.__callback()
+
+    def poll(self) -> List[bytes]:
+        """
+        Remove the available notifications.
+        :return: the notifications, the list is empty if no notification is available
+        """
+        with self.__condition:
+            result: List[bytes] = list(self.__notifications)
+            self.__notifications.clear()
+            return result
+
+    def wait(self, timeout: float) -> List[bytes]:
+        """
+        Wait for notifications and remove them.
+        :param timeout: the maximum time to wait in seconds
+        :return: the notifications, the list is empty if no notification is available or if the subscription is closed
+        """
+        with self.__condition:
+            if self.__active and len(self.__notifications) == 0:
+                self.__condition.wait(timeout)
+            return self.poll()
+
+    def close(self) -> None:
+        """
+        Close the subscription and wake up the waiting thread.
+        """
+        with self.__condition:
+            self.__active = False
+            self.__notifications.clear()
+            self.__condition.notify_all()
+        if self.__callback:
+            self.__callback()
+
+
+class StateBroadcaster(object):
+    def __init__(self, state: PlayerState):
+        """
+        Initialize the broadcaster sending the state to the subscriptions when it changes.
+        :param state: the state
+        """
+        self.__state: PlayerState = state
+        self.__subscriptions: List[Subscription] = list()
+        self.__lock: threading.Lock = threading.Lock()
+
+    def get_subscriptions_count(self) -> int:
+        with self.__lock:
+            return len(self.__subscriptions)
+
+    def subscribe(self, capacity: int, callback: Callable[[], None] = None) -> Subscription:
+        """
+        Create a subscription.
+        :param capacity: the maximum number of notifications kept for the subscription
+        :param callback: the function invoked from the publishing thread when a notification is available
+        :return: the subscription
+        """
+        result: Subscription = Subscription(capacity, callback)
+        with self.__lock:
+            self.__subscriptions.append(result)
+        return result
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """
+        Remove and close the subscription.
+        :param subscription: the subscription
+        """
+        with self.__lock:
+            if subscription in self.__subscriptions:
+                self.__subscriptions.remove(subscription)
+        subscription.close()
+
+    def publish(self, event: str) -> None:
+        """
+        Send the state to all the subscriptions, the notification is encoded once and the call never blocks.
+        :param event: the name of the event which changed the state
+        """
+        with self.__lock:
+            subscriptions: List[Subscription] = list(self.__subscriptions)
+        if len(subscriptions) == 0:
+            return
+        data: Dict[str, Any] = self.__state.to_dict()
+        data['event'] = event
+        notification: bytes = bytes([media_api.NOTIFICATION]) + json.dumps(data, separators=(',', ':')).encode('ascii') + media_api.CONTROLLER_EOM
+        for subscription in subscriptions:
+            subscription.offer(notification)
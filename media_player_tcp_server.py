@@ -12,9 +12,13 @@ import threading
 import time
 import traceback
 
+from typing import List
+
 import media_api
 from media_player_config import MediaPlayerConfig
-from media_api import MediaPlayerController, ControllerListener, RemoteControlEvent
+from media_api import MediaPlayerController, ControllerListener
+from media_player_state import Subscription
+from media_player_protocol import PROTOCOL_V2, ConnectionRegistry, ConnectionStatistics, FrameParser, RateLimiter, create_parser, is_ping, set_keep_alive
 
 SENDING_MSG: str = 'Sending: '
 EVENT_NOT_VALID: str = 'Event is not valid'
@@ -24,80 +28,204 @@ CHARSET: str = 'utf-8'
 class _TcpHandler(socketserver.BaseRequestHandler):
     def __init__(self, request, client_address, server, controller, logger):
         self.__controller = controller
-        self.__pending_data: bytearray = bytearray()
+        # The parser is created when the version of the protocol is known
+        # noinspection PyTypeChecker
+        self.__parser: FrameParser = None
         self.__logger: logging.Logger = logger
         self.__logger.info('Initializing %s', self.__class__.__name__)
+        self.__statistics: ConnectionStatistics = ConnectionStatistics()
+        # Responses and notifications are sent by different threads
+        self.__send_lock: threading.Lock = threading.Lock()
+        # noinspection PyTypeChecker
+        self.__subscription: Subscription = None
         super().__init__(request, client_address, server)
 
     def setup(self):
         self.__logger.debug('Setup')
         return socketserver.BaseRequestHandler.setup(self)
 
+    def finish(self):
+        self.__unsubscribe()
+        if self.__statistics.get_events_count() > 0:
+            self.__logger.info('Connection closed with: %s, %s', self.client_address[0], self.__statistics)
+        return socketserver.BaseRequestHandler.finish(self)
+
+    def __negotiate(self) -> bool:
+        # The first byte is only read if it is the one used to select the version 2 of the protocol
+        data: bytes = self.request.recv(1, socket.MSG_PEEK)
+        if len(data) == 0:
+            return False
+        self.__parser, used = create_parser(data)
+        if used > 0:
+            self.request.recv(used)
+            self.request.sendall(bytes([PROTOCOL_V2]))
+            self.__logger.debug('Binary frames used by: %s', self.client_address[0])
+        return True
+
+    def __send(self, data: bytes) -> None:
+        with self.__send_lock:
+            self.request.sendall(data)
+
+    def __push(self, subscription: Subscription) -> None:
+        # A slow remote only blocks this thread, the notifications are dropped by its subscription when it is full
+        # noinspection PyBroadException
+        try:
+            while subscription.is_active():
+                notifications: List[bytes] = subscription.wait(1)
+                if len(notifications) > 0:
+                    self.__send(b''.join(self.__parser.encode(0, notification) for notification in notifications))
+                    # A remote receiving notifications is active even if it does not send anything
+                    self.server.touch_connection(self.request)
+        except Exception as ex:
+            self.__logger.debug('Notifications not sent to %s: %s', self.client_address[0], ex)
+        if subscription.get_dropped_count() > 0:
+            self.__logger.info('Notifications dropped for: %s: %s', self.client_address[0], subscription.get_dropped_count())
+
+    def __subscribe(self) -> bytes:
+        broadcaster = self.__controller.get_listener().get_state_broadcaster() if self.__controller.get_listener() else None
+        if not broadcaster:
+            self.__logger.warning('Notifications not supported by the listener')
+            return media_api.RESPONSE_NACK
+        if not self.__subscription:
+            self.__logger.debug('Subscription of: %s', self.client_address[0])
+            self.__subscription = broadcaster.subscribe(self.__controller.get_config().get_subscription_buffer_size())
+            threading.Thread(target=self.__push, args=[self.__subscription], name='Push-' + self.client_address[0], daemon=True).start()
+        return media_api.RESPONSE_ACK
+
+    def __unsubscribe(self) -> bytes:
+        if self.__subscription:
+            self.__logger.debug('End of subscription of: %s', self.client_address[0])
+            broadcaster = self.__controller.get_listener().get_state_broadcaster() if self.__controller.get_listener() else None
+            if broadcaster:
+                broadcaster.unsubscribe(self.__subscription)
+            else:
+                self.__subscription.close()
+            self.__subscription = None
+        return media_api.RESPONSE_ACK
+
+    def __dispatch(self, frame: memoryview) -> bytes:
+        request_id: int = self.__parser.get_request_id(frame)
+        response: bytes = media_api.RESPONSE_NACK
+        # noinspection PyBroadException
+        try:
+            request_id, event = self.__parser.decode(frame)
+            self.__logger.debug('Control event received from %s: %s', self.client_address[0], event)
+            if is_ping(event):
+                response = media_api.RESPONSE_ACK
+            elif event.get_code() == media_api.CODE_SUBSCRIBE:
+                response = self.__subscribe()
+            elif event.get_code() == media_api.CODE_UNSUBSCRIBE:
+                response = self.__unsubscribe()
+            elif not self.__controller.get_rate_limiter().acquire(self.client_address[0]):
+                self.__logger.debug('Too many events received from %s, control event rejected: %s', self.client_address[0], event)
+                self.__statistics.add_throttled()
+                response = media_api.RESPONSE_BUSY
+            elif self.__controller.get_listener():
+                self.__logger.debug('Dispatching control event: %s', event)
+                response = self.__controller.get_listener().on_control_event(event)
+            else:
+                self.__logger.warning('No listener, control event not processed')
+        except Exception as ex:
+            self.__logger.error('Error: %s' % ex)
+            exc_type, exc_value, exc_traceback = sys.exc_info()
+            traceback.print_tb(exc_traceback, limit=6, file=sys.stderr)
+            self.__logger.error(ex)
+        if not response:
+            response = media_api.RESPONSE_NACK
+        return self.__parser.encode(request_id, response)
+
     def handle(self):
-        self.request.settimeout(2)
-        self.request.setblocking(True)
         while self.__controller.is_running():
-            response: bytes = b''
             try:
-                packet: bytearray = self.__pending_data + self.request.recv(128)
-                if not packet:
+                if not self.__parser and not self.__negotiate():
                     return
-                length: int = len(packet)
-                if length == 0:
+                if self.__parser.recv_into(self.request) == 0:
                     return
-                data: bytearray = bytearray()
-                for i, val in enumerate(packet):
-                    if val == 0x0A and i > 1 and packet[i - 1] == 0x0D:
-                        data.extend(packet[0:i - 1])
-                        self.__pending_data.clear()
-                        self.__pending_data.extend(packet[i + 1:])
-                        break
-                if len(data) == 0:
-                    return
-                self.__logger.debug('Control event received from {}: {}'.format(self.client_address[0], data))
-                code: int
-                event: RemoteControlEvent = RemoteControlEvent(data[0])
-                if len(data) > 1:
-                    event.set_data(data[1:].decode('ascii'))
-                elif 0x20 <= data[0] <= 0x7E:  # A valid ASCII character
-                    event.set_data(data.decode('ascii'))
-                if self.__controller.get_listener():
-                    self.__logger.debug('Dispatching control event: %s', event)
-                    response = self.__controller.get_listener().on_control_event(event)
-                else:
-                    self.__logger.warning('No listener, control event not processed')
-                    response = media_api.RESPONSE_NACK
+                frames: List[memoryview] = self.__parser.frames()
             except socket.timeout:
-                self.__logger.warning('Client connection timeout')
+                if self.__subscription:
+                    # The subscribed remotes only receive data
+                    continue
+                self.__logger.info('Closing idle connection with: %s', self.client_address[0])
                 return
             except ConnectionResetError:
                 self.__logger.warning('Client connection closed')
                 return
-            except Exception as ex:
-                self.__logger.error('Error: %s' % ex)
-                exc_type, exc_value, exc_traceback = sys.exc_info()
-                traceback.print_tb(exc_traceback, limit=6, file=sys.stderr)
-                self.__logger.error(ex)
-                response = media_api.RESPONSE_NACK
-            if not response and len(response) == 0:
-                response = media_api.RESPONSE_NACK
-            self.__logger.debug('Sending response: %s', response)
-            self.request.send(response)
+            except ValueError as ex:
+                self.__logger.warning('Invalid data received from %s: %s', self.client_address[0], ex)
+                self.__send(self.__parser.encode(0, media_api.RESPONSE_NACK))
+                continue
+            received: float = time.perf_counter()
+            self.server.touch_connection(self.request)
+            # All the frames received in a single read are dispatched in order and answered with a single write
+            responses: List[bytes] = list()
+            for frame in frames:
+                responses.append(self.__dispatch(frame))
+            if len(responses) == 0:
+                continue
+            self.__logger.debug('Sending %s response(s): %s', len(responses), responses)
+            self.__send(b''.join(responses))
+            self.__logger.debug('Events processed for %s in %.2f ms', self.client_address[0], self.__statistics.record(received, len(responses)))
 
 
-class _TcpServer(socketserver.TCPServer):
-    def __init__(self, server_address, controller, logger):
+class _TcpServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    block_on_close = False
+
+    def __init__(self, server_address, controller, logger, max_connections: int, idle_timeout: int, keep_alive: int):
         self.__controller = controller
         self.__logger: logging.Logger = logger
+        self.__max_connections: int = max_connections
+        self.__idle_timeout: int = idle_timeout
+        self.__keep_alive: int = keep_alive
+        self.__connections: ConnectionRegistry = ConnectionRegistry(max_connections)
         socketserver.TCPServer.allow_reuse_address = False
         socketserver.TCPServer.timeout = 2
-        socketserver.TCPServer.request_queue_size = 5
+        self.request_queue_size = max(5, max_connections)
         super().__init__(server_address, _TcpHandler)
 
+    def get_connections_count(self) -> int:
+        return self.__connections.get_count()
+
+    def touch_connection(self, request) -> None:
+        self.__connections.touch(request)
+
+    def verify_request(self, request, client_address) -> bool:
+        # noinspection PyBroadException
+        try:
+            set_keep_alive(request, self.__keep_alive)
+            request.settimeout(self.__idle_timeout if self.__idle_timeout > 0 else None)
+        except Exception as ex:
+            self.__logger.warning('Cannot configure the connection with: %s: %s', client_address[0], ex)
+        evicted = self.__connections.add(request)
+        if evicted:
+            self.__logger.warning('Limit reached: %s, closing the connection idle for the longest time', self.__max_connections)
+            # The handler of the evicted connection is unblocked and ends
+            # noinspection PyBroadException
+            try:
+                evicted.shutdown(socket.SHUT_RDWR)
+            except:  # catch all
+                pass
+        return True
+
     def finish_request(self, request, client_address):
-        self.__logger.debug('Connection started with: %s', client_address[0])
+        self.__logger.debug('Connection started with: %s (%s active)', client_address[0], self.get_connections_count())
         _TcpHandler(request, client_address, self, self.__controller, self.__logger)
 
+    def shutdown_request(self, request):
+        self.__connections.remove(request)
+        super().shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        for request in self.__connections.get_connections():
+            # Unblock the handlers still waiting for data
+            # noinspection PyBroadException
+            try:
+                request.shutdown(socket.SHUT_RDWR)
+            except:  # catch all
+                pass
+
     def handle_error(self, request, client_address):
         super().handle_error(request, client_address)
         self.__logger.warning('Error')
@@ -134,11 +262,16 @@ class MediaPlayerTcpController(MediaPlayerController):
         signal.signal(signal.SIGINT, self.stop)
         # noinspection PyTypeChecker
         self.__server: _TcpServer = None
+        # Created once to be shared with the other controllers and kept when restarting
+        self.__rate_limiter: RateLimiter = RateLimiter(self._config.get_tcp_client_rate(), self._config.get_tcp_client_burst(), self._config.get_tcp_global_rate(), self._config.get_tcp_global_burst())
+
+    def get_rate_limiter(self) -> RateLimiter:
+        return self.__rate_limiter
 
     def __main(self):
         MediaPlayerTcpController.__logger.info('Starting on port: %s', self._config.get_tcp_port())
         try:
-            with _TcpServer(('0.0.0.0', self._config.get_tcp_port()), self, MediaPlayerTcpController.__logger) as server:
+            with _TcpServer(('0.0.0.0', self._config.get_tcp_port()), self, MediaPlayerTcpController.__logger, self._config.get_tcp_max_connections(), self._config.get_tcp_idle_timeout(), self._config.get_tcp_keep_alive()) as server:
                 self.__active = True
                 self.__server = server
                 while self.__active:
@@ -151,7 +284,7 @@ class MediaPlayerTcpController(MediaPlayerController):
         finally:
             self.__server = None
             self.__active = False
-            MediaPlayerTcpController.__logger.info('Stopped')
+            MediaPlayerTcpController.__logger.info('Stopped, events accepted: %s, throttled: %s', self.__rate_limiter.get_accepted_count(), self.__rate_limiter.get_throttled_count())
 
     def is_running(self) -> bool:
         return self.__active
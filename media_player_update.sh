@@ -89,7 +89,6 @@ sudo python3 -m pip install --upgrade pip
 sudo pip3 install requests flask-cors expiringdict PIL
 sudo pip3 install numpy --upgrade
 sudo pip3 install pillow --upgrade
-sudo pip3 install pyautogui
 sudo pip3 install netifaces
 sudo pip3 install zeroconf
 sudo pip3 install python-vlc
@@ -4,18 +4,20 @@ import urllib
 
 import cv2
 import datetime
+import io
 import json
 import logging
 import os
 import time
 import traceback
 import requests
-from typing import Any, Dict, List
+import media_api
+from typing import Any, Dict, List, Tuple
 from PIL import Image
 from canvas_grid import CanvasGridRenderer
-from media_api import MediaPlayerInterface, Media
+from media_api import MediaPlayerInterface, Media, RemoteControlEvent
 from media_player_config import MediaPlayerConfig
-from id_threading_utils import Executor
+from id_threading_utils import Executor, LANE_BACKGROUND
 from vlc_media_source import VlcMediaSource
 
 # URL to use:
@@ -64,30 +66,64 @@ class FreeboxMediaCellRenderer(CanvasGridRenderer):
                 FreeboxMediaCellRenderer.__logger.addHandler(handler)
             FreeboxMediaCellRenderer.__logger.setLevel(parent_logger.level)
         self.__config: MediaPlayerConfig = config
+        # End of the current program of each stream, the rendered cells are cached until then
+        self.__program_ends: Dict[int, int] = dict()
+        # URL of the picture of the current program of each stream, loaded by fetch
+        self.__pictures: Dict[int, str] = dict()
         cv2.setLogLevel(0)
 
-    def render_image(self, value: Any) -> Image:
+    def get_version(self, value: Any) -> Any:
         if not isinstance(value, Media):
             return None
+        end: int = self.__program_ends.get(value.get_stream_id())
+        if end is None or end <= time.time():
+            return None
+        return end
+
+    @staticmethod
+    def __download(url: str) -> io.BytesIO:
+        FreeboxMediaCellRenderer.__logger.debug('Loading image from url: %s', url)
+        with requests.get(url, stream=False, timeout=0.5) as binary_response:
+            return io.BytesIO(binary_response.content)
+
+    def needs_fetch(self, value: Any, size: Tuple[int, int] = None) -> bool:
+        if not isinstance(value, Media):
+            return False
+        # The program is loaded again when the known one has ended, the images when they have been evicted from the cache
+        if self.get_version(value) is None:
+            return True
+        if _IMAGE_URL_PROPERTY in value.get_properties() and not CanvasGridRenderer.is_image_cached(value.get_properties()[_IMAGE_URL_PROPERTY], size):
+            return True
+        picture_url: str = self.__pictures.get(value.get_stream_id())
+        return picture_url is not None and not CanvasGridRenderer.is_image_cached(picture_url, size)
+
+    def fetch(self, value: Any, size: Tuple[int, int] = None) -> None:
+        if not isinstance(value, Media):
+            return
         media: Media = value
-        # noinspection PyTypeChecker
-        result: Image = None
-        # Loading media image if not already done
-        if media.get_image() is None and _IMAGE_URL_PROPERTY in media.get_properties():
-            url: str = media.get_properties()[_IMAGE_URL_PROPERTY]
-            FreeboxMediaCellRenderer.__logger.debug('Loading media image for: %s from url: %s', media.get_name(), url)
+        # Downloading media image, it is decoded and kept in the cache for render_image
+        if _IMAGE_URL_PROPERTY in media.get_properties():
+            logo_url: str = media.get_properties()[_IMAGE_URL_PROPERTY]
             # noinspection PyBroadException
             try:
-                with requests.get(url, stream=True, timeout=0.5) as binary_response:
-                    media.set_image(Image.open(binary_response.raw))
+                CanvasGridRenderer.load_image(logo_url, size, lambda: FreeboxMediaCellRenderer.__download(logo_url))
             except:  # catch all
                 FreeboxMediaCellRenderer.__logger.error(traceback.format_exc())
-                # noinspection PyTypeChecker
-                media.set_image(None)
+        if self.get_version(media) is not None:
+            # The program is still the current one, only its picture is loaded again if it has been evicted
+            picture_url: str = self.__pictures.get(media.get_stream_id())
+            if picture_url:
+                # noinspection PyBroadException
+                try:
+                    CanvasGridRenderer.load_image(picture_url, size, lambda: FreeboxMediaCellRenderer.__download(picture_url))
+                except:  # catch all
+                    FreeboxMediaCellRenderer.__logger.error(traceback.format_exc())
+            return
         # Loading media title
         epoch_time: int = int(time.time())
         url: str = _FREEBOX_CHANNEL_DESCRIPTION_PATTTERN % (media.get_stream_id(), str(epoch_time))
         FreeboxMediaCellRenderer.__logger.debug('Loading media information for: %s from url: %s', media.get_name(), url)
+        self.__pictures.pop(media.get_stream_id(), None)
         # noinspection PyBroadException
         try:
             with requests.get(url, stream=False, timeout=0.5) as json_response:
@@ -97,30 +133,43 @@ class FreeboxMediaCellRenderer(CanvasGridRenderer):
                         results.append(v)
                 results.sort(key=lambda d: d[_DATE_KEY])
             # noinspection PyTypeChecker
-            result: dict = None
+            program: dict = None
             for v in results:
                 if v[_DATE_KEY] <= epoch_time:
-                    result = v
+                    program = v
                 else:
                     break
-            if result and _TITLE_KEY in result:
-                media.set_title(result[_TITLE_KEY])
-                if _DURATION_KEY in result:
-                    media.set_duration(result[_DURATION_KEY])
-                if _PICTURE_BIG_KEY in result:
-                    with requests.get(_HTTP_PREFIX + _FREEBOX_HOST + result[_PICTURE_BIG_KEY], stream=True, timeout=0.5) as binary_response:
-                        result = Image.open(binary_response.raw)
-                elif _PICTURE_KEY in result:
-                    with requests.get(_HTTP_PREFIX + _FREEBOX_HOST + result[_PICTURE_KEY], stream=True, timeout=0.5) as binary_response:
-                        result = Image.open(binary_response.raw)
+            if program and _TITLE_KEY in program:
+                media.set_title(program[_TITLE_KEY])
+                if _DURATION_KEY in program:
+                    media.set_duration(program[_DURATION_KEY])
+                    self.__program_ends[media.get_stream_id()] = program[_DATE_KEY] + program[_DURATION_KEY]
+                picture: str = program.get(_PICTURE_BIG_KEY, program.get(_PICTURE_KEY))
+                if picture:
+                    picture_url: str = _HTTP_PREFIX + _FREEBOX_HOST + picture
+                    CanvasGridRenderer.load_image(picture_url, size, lambda: FreeboxMediaCellRenderer.__download(picture_url))
+                    self.__pictures[media.get_stream_id()] = picture_url
         except:  # catch all
             FreeboxMediaCellRenderer.__logger.error(traceback.format_exc())
             # noinspection PyTypeChecker
             media.set_title(None)
             # noinspection PyTypeChecker
             media.set_duration(None)
+
+    def render_image(self, value: Any, size: Tuple[int, int] = None) -> Image:
+        if not isinstance(value, Media):
+            return None
+        media: Media = value
+        # The images are only taken from the cache, they are downloaded by fetch on the network lane
+        # noinspection PyTypeChecker
+        result: Image = None
+        picture_url: str = self.__pictures.get(media.get_stream_id())
+        if picture_url:
+            result = CanvasGridRenderer.get_cached_image(picture_url, size)
+        if result is None and _IMAGE_URL_PROPERTY in media.get_properties():
+            result = CanvasGridRenderer.get_cached_image(media.get_properties()[_IMAGE_URL_PROPERTY], size)
         if result is None:
-            result = media.get_image()
+            FreeboxMediaCellRenderer.__logger.debug('No cached image for: %s, only the label is rendered', media.get_name())
         return result
 
 
@@ -143,6 +192,8 @@ class FreeboxMediaSource(VlcMediaSource):
         self.__load_freebox_config()
         self.__build_media_list()
         self._media_list.sort(key=lambda v: v.get_channel())
+        self.register_command(media_api.CODE_SEARCH, self.search)
+        self.register_command(media_api.CODE_INFORMATION, self.display_information)
 
     def get_name(self) -> str:
         """
@@ -154,11 +205,41 @@ class FreeboxMediaSource(VlcMediaSource):
     def get_image_path(self) -> str:
         return 'sources' + os.sep + 'images' + os.sep + 'freebox.jpg'
 
+    def search(self, event: RemoteControlEvent) -> None:
+        """
+        Play the first media having a name containing the text of the event.
+        :param event: the event
+        """
+        text: str = str(event.get_data()).strip().lower() if event.get_data() is not None else ''
+        if len(text) > 0:
+            for media in self._media_list:
+                if media.get_name() and text in media.get_name().lower():
+                    FreeboxMediaSource.__logger.debug('Media found for: %s: %s', text, media.get_name())
+                    self.play(media=media)
+                    return
+        FreeboxMediaSource.__logger.warning('No media found for: %s', text)
+        self._interface.display_warning(media_api.MEDIA_NOT_AVAILABLE)
+
+    def display_information(self, event: RemoteControlEvent) -> None:
+        """
+        Display the information about the current media.
+        :param event: the event
+        """
+        if not self._media:
+            self._interface.display_notice(self.get_name())
+            return
+        text: str = self._media.get_name()
+        if self._media.get_title():
+            text = text + ' - ' + self._media.get_title()
+        if self._media.get_duration() and self._media.get_duration() > 0:
+            text = text + ' - ' + "{:0>8}".format(str(datetime.timedelta(seconds=self._media.get_duration())))
+        self._interface.display_notice(text)
+
     def refresh_interface(self) -> None:
         if self._instance and self._interface and not self.is_playing():
             self._interface.refresh()
         if self._instance:
-            self._executor.schedule(60, self.refresh_interface)
+            self._executor.schedule(60, self.refresh_interface, lane=LANE_BACKGROUND)
 
     def open(self) -> None:
         super().open()
@@ -168,7 +249,7 @@ class FreeboxMediaSource(VlcMediaSource):
         for media in self._media_list:
             self._interface.add_grid_cell(position=position, value=media, render=False)
             position = position + 1
-        self._executor.schedule(3, self.refresh_interface)
+        self._executor.schedule(3, self.refresh_interface, lane=LANE_BACKGROUND)
 
     def __load_freebox_config(self) -> None:
         path: str = self.get_config().get_root_path() + os.sep + 'freebox_media_source.json'
@@ -7,6 +7,7 @@ import media_api
 import os
 import platform
 import sys
+import urllib.parse
 
 from typing import Any, Dict
 from media_api import MediaSource, MediaPlayerInterface, RemoteControlEvent
@@ -21,8 +22,10 @@ if platform.system() in ("Linux", "Darwin"):
     WindowUtils.InstallX11ErrorHandlers()
 
 URL_KEY: str = "URL"
+SEARCH_URL_KEY: str = "search_url"
 LANGUAGES_KEY: str = "accept_languages"
 DEFAULT_URL: str = "https://www.google.com"
+DEFAULT_SEARCH_URL: str = "https://www.google.com/search?q=%s"
 DEFAULT_LANGUAGES: str = "it-IT,fr-FR"
 
 
@@ -125,6 +128,12 @@ class WebBrowserMediaSource(MediaSource):
         # noinspection PyTypeChecker
         self._instance: cef.PyBrowser = None
         self.__playing: bool = False
+        self.register_command(media_api.CODE_SEARCH, self.search)
+        self.register_command(media_api.CODE_TEXT, self.type_text)
+        self.register_command(media_api.CODE_INFORMATION, self.display_information)
+        # The grid is hidden while the browser is displayed, navigation keys are sent to the page
+        for code, key_code in ((media_api.CODE_OK, cef.VK_RETURN), (media_api.CODE_LEFT, cef.VK_LEFT), (media_api.CODE_RIGHT, cef.VK_RIGHT), (media_api.CODE_UP, cef.VK_UP), (media_api.CODE_DOWN, cef.VK_DOWN)):
+            self.register_command(code, lambda e, k=key_code: self.press_key(k))
 
     def get_image_path(self) -> str:
         return 'sources' + os.sep + 'images' + os.sep + 'web.jpg'
@@ -153,6 +162,8 @@ class WebBrowserMediaSource(MediaSource):
             self.__web_browser_config[URL_KEY] = DEFAULT_URL
         if LANGUAGES_KEY not in self.__web_browser_config:
             self.__web_browser_config[LANGUAGES_KEY] = DEFAULT_LANGUAGES
+        if SEARCH_URL_KEY not in self.__web_browser_config:
+            self.__web_browser_config[SEARCH_URL_KEY] = DEFAULT_SEARCH_URL
 
     def open(self) -> None:
         super().open()
@@ -199,6 +210,52 @@ class WebBrowserMediaSource(MediaSource):
         view: tk.Widget = self._interface.get_view()
         view.after(200, self.__work)
 
+    def search(self, event: RemoteControlEvent) -> None:
+        """
+        Load the results of the search of the text of the event.
+        :param event: the event
+        """
+        if self._instance and event.get_data():
+            url: str = self.__web_browser_config[SEARCH_URL_KEY] % urllib.parse.quote_plus(str(event.get_data()))
+            WebBrowserMediaSource.__logger.debug('Loading: %s', url)
+            self._instance.LoadUrl(url)
+
+    def type_text(self, event: RemoteControlEvent) -> None:
+        """
+        Send the text of the event to the focused element of the page.
+        :param event: the event
+        """
+        if self._instance and event.get_data():
+            for c in str(event.get_data()):
+                self._instance.SendKeyEvent({
+                    'type': cef.KEYEVENT_CHAR,
+                    'windows_key_code': ord(c),
+                    'character': ord(c),
+                    'unmodified_character': ord(c),
+                    'modifiers': 0
+                })
+
+    def press_key(self, key_code: int) -> None:
+        """
+        Send the key to the page.
+        :param key_code: the windows code of the key
+        """
+        if self._instance:
+            for event_type in (cef.KEYEVENT_RAWKEYDOWN, cef.KEYEVENT_KEYUP):
+                self._instance.SendKeyEvent({
+                    'type': event_type,
+                    'windows_key_code': key_code,
+                    'modifiers': 0
+                })
+
+    def display_information(self, event: RemoteControlEvent) -> None:
+        """
+        Display the URL of the current page.
+        :param event: the event
+        """
+        if self._instance:
+            self._interface.display_notice(self._instance.GetUrl())
+
     def close(self):
         if self._instance:
             self._instance.CloseBrowser(True)